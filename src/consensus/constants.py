@@ -34,6 +34,9 @@ constants: Dict[str, Any] = {
     "TX_PER_SEC": 20,
     # Size of mempool = 10x the size of block
     "MEMPOOL_BLOCK_BUFFER": 10,
+    # Max number of unconfirmed ancestors and descendants of a mempool item, including itself
+    "MEMPOOL_MAX_ANCESTORS": 25,
+    "MEMPOOL_MAX_DESCENDANTS": 25,
     # Coinbase rewards are not spendable for 200 blocks
     "COINBASE_FREEZE_PERIOD": 200,
     # Max coin amount uint(1 << 64)
@@ -1,6 +1,6 @@
 import logging
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Mapping, Optional, Tuple
 import blspy
 
 from src.consensus.block_rewards import calculate_block_reward
@@ -23,7 +23,7 @@ log = logging.getLogger(__name__)
 async def validate_unfinished_block_header(
     constants: Dict,
     headers: Dict[bytes32, Header],
-    height_to_hash: Dict[uint32, bytes32],
+    height_to_hash: Mapping[uint32, bytes32],
     block_header: Header,
     proof_of_space: ProofOfSpace,
     prev_header_block: Optional[HeaderBlock],
@@ -171,7 +171,7 @@ async def validate_unfinished_block_header(
 async def validate_finished_block_header(
     constants: Dict,
     headers: Dict[bytes32, Header],
-    height_to_hash: Dict[uint32, bytes32],
+    height_to_hash: Mapping[uint32, bytes32],
     block: HeaderBlock,
     prev_header_block: Optional[HeaderBlock],
     genesis: bool,
@@ -1,31 +1,65 @@
 import logging
 import aiosqlite
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from src.types.full_block import FullBlock
 from src.types.header import Header
+from src.types.proof_of_space import ProofOfSpace
+from src.types.proof_of_time import ProofOfTime
 from src.types.sized_bytes import bytes32
+from src.util.db_migration import MIGRATION_BATCH_SIZE, get_column_types
+from src.util.db_wrapper import DBWrapper
 from src.util.hash import std_hash
 from src.util.ints import uint32, uint64
+from src.util.npc_cache import npc_cache, npc_list_to_bytes
 
 log = logging.getLogger(__name__)
 
+# The fields of a block which light clients need: the proofs, the header and the filter. These are
+# read without the transactions generator, which is most of the size of a block.
+HeaderBlockParts = Tuple[ProofOfSpace, ProofOfTime, Header, Optional[bytes]]
+
+BLOCKS_TABLE = (
+    "CREATE TABLE IF NOT EXISTS blocks(height bigint, header_hash text PRIMARY KEY, "
+    "proof_of_space blob, proof_of_time blob, transactions_filter blob)"
+)
+GENERATORS_TABLE = "CREATE TABLE IF NOT EXISTS generators(header_hash text PRIMARY KEY, generator blob)"
+# The columns of a FullBlock, in the order in which they are serialized
+FULL_BLOCK_COLUMNS = (
+    "blocks.proof_of_space, blocks.proof_of_time, headers.header, generators.generator, "
+    "blocks.transactions_filter, generator_hash, cost, npc_list from blocks "
+    "JOIN headers USING(header_hash) LEFT JOIN generators USING(header_hash) "
+    "LEFT JOIN npc_results USING(header_hash)"
+)
+# The number of header blocks read by each query of get_header_blocks_in_range
+HEADER_BLOCKS_PAGE_SIZE = 100
+
+HEADER_BLOCK_COLUMNS = (
+    "blocks.proof_of_space, blocks.proof_of_time, headers.header, "
+    "blocks.transactions_filter from headers JOIN blocks USING(header_hash)"
+)
+
 
 class BlockStore:
     db: aiosqlite.Connection
+    db_wrapper: Optional[DBWrapper]
     proof_of_time_heights: Dict[Tuple[bytes32, uint64], uint32]
     challenge_hash_dict: Dict[bytes32, bytes32]
     seen_compact_proofs: set
 
     @classmethod
-    async def create(cls, connection):
+    async def create(cls, connection, db_wrapper: Optional[DBWrapper] = None):
         self = cls()
 
-        # All full blocks which have been added to the blockchain. Header_hash -> block
         self.db = connection
-        await self.db.execute(
-            "CREATE TABLE IF NOT EXISTS blocks(height bigint, header_hash text PRIMARY KEY, block blob)"
-        )
+        # The read only connections of the wrapper serve the blocks requested by peers and the RPC
+        self.db_wrapper = db_wrapper
+        await self._migrate_blocks_table()
+
+        # All full blocks which have been added to the blockchain, split in the proofs and filter,
+        # the header (in the headers table), and the transactions generator, if any
+        await self.db.execute(BLOCKS_TABLE)
+        await self.db.execute(GENERATORS_TABLE)
 
         # Headers
         await self.db.execute(
@@ -34,6 +68,13 @@ class BlockStore:
             "blob, is_lca tinyint, is_tip tinyint)"
         )
 
+        # NPC results of the transactions generators of validated blocks, so that generators
+        # are not run again for blocks which are read from the database
+        await self.db.execute(
+            "CREATE TABLE IF NOT EXISTS npc_results(header_hash text PRIMARY KEY, "
+            "generator_hash text, cost bigint, npc_list blob)"
+        )
+
         # Height index so we can look up in order of height for sync purposes
         await self.db.execute(
             "CREATE INDEX IF NOT EXISTS block_height on blocks(height)"
@@ -53,6 +94,89 @@ class BlockStore:
 
         return self
 
+    async def _migrate_blocks_table(self) -> None:
+        """
+        Splits the full blocks of a database which stores them in one blob. Like the other
+        migrations, this happens in one transaction.
+        """
+        if len(await get_column_types(self.db, "blocks")) != 3:
+            return
+        log.info("Migrating the blocks table to separate generators")
+        await self.db.execute("BEGIN")
+        try:
+            await self.db.execute("ALTER TABLE blocks RENAME TO blocks_old")
+            await self.db.execute(BLOCKS_TABLE)
+            await self.db.execute(GENERATORS_TABLE)
+            cursor = await self.db.execute("SELECT block from blocks_old")
+            migrated = 0
+            while True:
+                rows = await cursor.fetchmany(MIGRATION_BATCH_SIZE)
+                if len(rows) == 0:
+                    break
+                blocks = [FullBlock.from_bytes(row[0]) for row in rows]
+                await self.db.executemany(
+                    "INSERT INTO blocks VALUES(?, ?, ?, ?, ?)",
+                    [self._block_row(block) for block in blocks],
+                )
+                await self.db.executemany(
+                    "INSERT INTO generators VALUES(?, ?)",
+                    [
+                        (block.header_hash.hex(), bytes(block.transactions_generator))
+                        for block in blocks
+                        if block.transactions_generator is not None
+                    ],
+                )
+                migrated += len(rows)
+            await cursor.close()
+            await self.db.execute("DROP TABLE blocks_old")
+            await self.db.commit()
+        except BaseException:
+            await self.db.rollback()
+            raise
+        log.info(f"Migrated {migrated} blocks")
+
+    @staticmethod
+    def _block_row(block: FullBlock) -> Tuple:
+        assert block.proof_of_time is not None
+        return (
+            block.height,
+            block.header_hash.hex(),
+            bytes(block.proof_of_space),
+            bytes(block.proof_of_time),
+            block.transactions_filter,
+        )
+
+    @staticmethod
+    def _full_block_bytes(row: Tuple) -> bytes:
+        """
+        Serializes a block from the columns of FULL_BLOCK_COLUMNS, without decoding them. The
+        proof of time and the header are never None, and the generator and filter are optional.
+        """
+        proof_of_space, proof_of_time, header, generator, transactions_filter = row[:5]
+        parts = [proof_of_space, bytes([1]), proof_of_time, header]
+        if generator is None:
+            parts.append(bytes([0]))
+        else:
+            parts += [bytes([1]), generator]
+        if transactions_filter is None:
+            parts.append(bytes([0]))
+        else:
+            parts += [
+                bytes([1]),
+                uint32(len(transactions_filter)).to_bytes(4, "big"),
+                transactions_filter,
+            ]
+        return b"".join(parts)
+
+    @staticmethod
+    def _header_block_parts(row: Tuple) -> HeaderBlockParts:
+        return (
+            ProofOfSpace.from_bytes(row[0]),
+            ProofOfTime.from_bytes(row[1]),
+            Header.from_bytes(row[2]),
+            row[3],
+        )
+
     async def get_lca(self) -> Optional[Header]:
         cursor = await self.db.execute("SELECT header from headers WHERE is_lca=1")
         row = await cursor.fetchone()
@@ -89,8 +213,8 @@ class BlockStore:
     async def add_block(self, block: FullBlock) -> None:
         assert block.proof_of_time is not None
         cursor_1 = await self.db.execute(
-            "INSERT OR REPLACE INTO blocks VALUES(?, ?, ?)",
-            (block.height, block.header_hash.hex(), bytes(block)),
+            "INSERT OR REPLACE INTO blocks VALUES(?, ?, ?, ?, ?)",
+            self._block_row(block),
         )
         await cursor_1.close()
         proof_hash = std_hash(
@@ -107,31 +231,142 @@ class BlockStore:
             ),
         )
         await cursor_2.close()
+        self.challenge_hash_dict[
+            block.header_hash
+        ] = block.proof_of_space.challenge_hash
+        if block.transactions_generator is not None:
+            cursor_generator = await self.db.execute(
+                "INSERT OR REPLACE INTO generators VALUES(?, ?)",
+                (block.header_hash.hex(), bytes(block.transactions_generator)),
+            )
+            await cursor_generator.close()
+            # The result is in the cache if the block was validated by this node
+            generator_hash = block.transactions_generator.get_tree_hash()
+            npc_result = npc_cache.get(generator_hash)
+            if npc_result is not None and npc_result[0] is None:
+                cursor_3 = await self.db.execute(
+                    "INSERT OR REPLACE INTO npc_results VALUES(?, ?, ?, ?)",
+                    (
+                        block.header_hash.hex(),
+                        generator_hash.hex(),
+                        npc_result[2],
+                        npc_list_to_bytes(npc_result[1]),
+                    ),
+                )
+                await cursor_3.close()
         await self.db.commit()
 
-    async def get_block(self, header_hash: bytes32) -> Optional[FullBlock]:
-        cursor = await self.db.execute(
-            "SELECT block from blocks WHERE header_hash=?", (header_hash.hex(),)
+    def _cache_npc_result(self, row: Tuple) -> None:
+        # Rows end with the generator_hash, cost and npc_list of the npc_results table
+        if row[-3] is not None:
+            npc_cache.put_serialized(bytes.fromhex(row[-3]), row[-1], uint64(row[-2]))
+
+    async def _fetch(self, query: str, params: Tuple, use_reader: bool) -> List[Tuple]:
+        if not use_reader or self.db_wrapper is None:
+            cursor = await self.db.execute(query, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return rows
+        async with self.db_wrapper.reader() as reader:
+            cursor = await reader.execute(query, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+            return rows
+
+    async def get_block(
+        self, header_hash: bytes32, use_reader: bool = False
+    ) -> Optional[FullBlock]:
+        """
+        If use_reader is set, the block is read from a read only connection, which only sees
+        committed blocks. Blocks are committed when they are added.
+        """
+        rows = await self._fetch(
+            f"SELECT {FULL_BLOCK_COLUMNS} WHERE header_hash=?",
+            (header_hash.hex(),),
+            use_reader,
         )
-        row = await cursor.fetchone()
-        await cursor.close()
+        row = rows[0] if len(rows) > 0 else None
         if row is not None:
-            return FullBlock.from_bytes(row[0])
+            self._cache_npc_result(row)
+            # Most callers only use a few fields of the block, so fields are only decoded
+            # when they are accessed
+            return FullBlock.from_bytes_lazy(self._full_block_bytes(row))
         return None
 
-    async def get_blocks_at(self, heights: List[uint32]) -> List[FullBlock]:
+    async def get_blocks_at(
+        self, heights: List[uint32], use_reader: bool = False
+    ) -> List[FullBlock]:
         if len(heights) == 0:
             return []
 
         heights_db = tuple(heights)
-        formatted_str = f'SELECT block from blocks WHERE height in ({"?," * (len(heights_db) - 1)}?)'
-        cursor = await self.db.execute(formatted_str, heights_db)
-        rows = await cursor.fetchall()
-        await cursor.close()
-        return [FullBlock.from_bytes(row[0]) for row in rows]
+        formatted_str = (
+            f"SELECT {FULL_BLOCK_COLUMNS} "
+            f'WHERE blocks.height in ({"?," * (len(heights_db) - 1)}?)'
+        )
+        rows = await self._fetch(formatted_str, heights_db, use_reader)
+        for row in rows:
+            self._cache_npc_result(row)
+        return [FullBlock.from_bytes_lazy(self._full_block_bytes(row)) for row in rows]
 
-    async def get_headers(self) -> Dict[bytes32, Header]:
-        cursor = await self.db.execute("SELECT header_hash, header from headers")
+    async def get_header_block_parts(
+        self, header_hash: bytes32, use_reader: bool = False
+    ) -> Optional[HeaderBlockParts]:
+        """
+        Returns the proofs, header and filter of a block, without reading its generator.
+        """
+        rows = await self._fetch(
+            f"SELECT {HEADER_BLOCK_COLUMNS} WHERE header_hash=?",
+            (header_hash.hex(),),
+            use_reader,
+        )
+        if len(rows) == 0:
+            return None
+        return self._header_block_parts(rows[0])
+
+    async def get_header_blocks_in_range(
+        self,
+        start: uint32,
+        end: uint32,
+        use_reader: bool = False,
+        page_size: int = HEADER_BLOCKS_PAGE_SIZE,
+    ) -> AsyncIterator[HeaderBlockParts]:
+        """
+        Yields the proofs, headers and filters of the blocks from height start to end included,
+        ordered by height and header hash, without reading their generators. Blocks of all
+        forks are included. The rows are read in pages of page_size, from the height index of
+        the headers, each page starting after the last block of the previous one.
+        """
+        assert page_size >= 1
+        after: Optional[Tuple[int, str]] = None
+        while True:
+            if after is None:
+                condition = "headers.height>=?"
+                params: Tuple = (start,)
+            else:
+                condition = (
+                    "(headers.height>? OR (headers.height=? AND headers.header_hash>?))"
+                )
+                params = (after[0], after[0], after[1])
+            rows = await self._fetch(
+                f"SELECT headers.height, headers.header_hash, {HEADER_BLOCK_COLUMNS} "
+                f"WHERE {condition} AND headers.height<=? "
+                "ORDER BY headers.height, headers.header_hash LIMIT ?",
+                (*params, end, page_size),
+                use_reader,
+            )
+            for row in rows:
+                yield self._header_block_parts(row[2:])
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][0], rows[-1][1])
+
+    async def get_headers(
+        self, min_height: uint32 = uint32(0)
+    ) -> Dict[bytes32, Header]:
+        cursor = await self.db.execute(
+            "SELECT header_hash, header from headers WHERE height>=?", (min_height,)
+        )
         rows = await cursor.fetchall()
         await cursor.close()
         return {bytes.fromhex(row[0]): Header.from_bytes(row[1]) for row in rows}
@@ -142,9 +377,10 @@ class BlockStore:
         await cursor.close()
         return {bytes.fromhex(row[0]): bytes.fromhex(row[1]) for row in rows}
 
-    async def init_challenge_hashes(self) -> None:
+    async def init_challenge_hashes(self, min_height: uint32 = uint32(0)) -> None:
         cursor = await self.db.execute(
-            "SELECT header_hash, challenge_hash from headers"
+            "SELECT header_hash, challenge_hash from headers WHERE height>=?",
+            (min_height,),
         )
         rows = await cursor.fetchall()
         await cursor.close()
@@ -152,6 +388,24 @@ class BlockStore:
             bytes.fromhex(row[0]): bytes.fromhex(row[1]) for row in rows
         }
 
+    async def load_challenge_hashes(self, header_hashes: List[bytes32]) -> None:
+        """
+        Adds the challenge hashes of the blocks to challenge_hash_dict, for blocks below the
+        height it was initialized from.
+        """
+        # SQLite limits the number of parameters of a query to 999
+        for i in range(0, len(header_hashes), 900):
+            batch = [h.hex() for h in header_hashes[i : i + 900]]
+            cursor = await self.db.execute(
+                "SELECT header_hash, challenge_hash from headers WHERE header_hash in "
+                f"({', '.join(['?'] * len(batch))})",
+                batch,
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+            for row in rows:
+                self.challenge_hash_dict[bytes.fromhex(row[0])] = bytes.fromhex(row[1])
+
     def get_challenge_hash(self, header_hash: bytes32) -> bytes32:
         return self.challenge_hash_dict[header_hash]
 
@@ -168,9 +422,7 @@ class BlockStore:
             return self.proof_of_time_heights[pot_tuple]
         return None
 
-    def seen_compact_proof(
-        self, challenge: bytes32, iter: uint64
-    ) -> bool:
+    def seen_compact_proof(self, challenge: bytes32, iter: uint64) -> bool:
         pot_tuple = (challenge, iter)
         if pot_tuple in self.seen_compact_proofs:
             return True
@@ -4,7 +4,8 @@ import logging
 from enum import Enum
 import multiprocessing
 import concurrent
-from typing import Dict, List, Optional, Set, Tuple
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 
 from chiabip158 import PyBIP158
 from clvm.casts import int_from_bytes
@@ -17,8 +18,15 @@ from src.full_node.block_header_validation import (
     pre_validate_finished_block_header,
 )
 from src.full_node.block_store import BlockStore
+from src.full_node.chain_snapshot import (
+    SnapshotRecord,
+    SnapshotRecords,
+    read_chain_snapshot,
+    write_chain_snapshot,
+)
 from src.full_node.coin_store import CoinStore
 from src.full_node.difficulty_adjustment import get_next_difficulty, get_next_min_iters
+from src.full_node.height_to_hash import HeightToHash
 from src.types.challenge import Challenge
 from src.types.coin import Coin, hash_coin_list
 from src.types.coin_record import CoinRecord
@@ -27,6 +35,8 @@ from src.types.condition_var_pair import ConditionVarPair
 from src.types.full_block import FullBlock, additions_for_npc
 from src.types.header import Header
 from src.types.header_block import HeaderBlock
+from src.types.proof_of_space import ProofOfSpace
+from src.types.proof_of_time import ProofOfTime
 from src.types.sized_bytes import bytes32
 from src.util.blockchain_check_conditions import blockchain_check_conditions_dict
 from src.util.condition_tools import hash_key_pairs_for_conditions_dict
@@ -63,7 +73,7 @@ class Blockchain:
     # Least common ancestor of tips
     lca_block: Header
     # Defines the path from genesis to the lca
-    height_to_hash: Dict[uint32, bytes32]
+    height_to_hash: HeightToHash
     # All headers (but not orphans) from genesis to the tip are guaranteed to be in headers
     headers: Dict[bytes32, Header]
     # Genesis block
@@ -74,8 +84,16 @@ class Blockchain:
     block_store: BlockStore
     # Coinbase freeze period
     coinbase_freeze: uint32
-    # Used to verify blocks in parallel
+    # Used to verify blocks (and the signatures of transactions) in parallel
     pool: concurrent.futures.ProcessPoolExecutor
+    num_workers: int
+    # Where the snapshot of the chain of the LCA is written every snapshot_interval blocks, if set
+    snapshot_path: Optional[Path]
+    snapshot_interval: int
+    # The records of the blocks of the chain of the LCA, from genesis, for the snapshot
+    snapshot_records: SnapshotRecords
+    snapshot_height: int
+    _snapshot_task: Optional[asyncio.Task]
 
     # Whether blockchain is shut down or not
     _shut_down: bool
@@ -85,30 +103,39 @@ class Blockchain:
 
     @staticmethod
     async def create(
-        coin_store: CoinStore, block_store: BlockStore, override_constants: Dict = {},
+        coin_store: CoinStore,
+        block_store: BlockStore,
+        override_constants: Dict = {},
+        snapshot_path: Optional[Path] = None,
+        snapshot_interval: int = 1000,
     ):
         """
         Initializes a blockchain with the header blocks from disk, assuming they have all been
         validated. Uses the genesis block given in override_constants, or as a fallback,
-        in the consensus constants config.
+        in the consensus constants config. If snapshot_path is set, the chain is loaded from
+        the snapshot there, and the snapshot is written again as the LCA moves.
         """
         self = Blockchain()
         self.lock = asyncio.Lock()  # External lock handled by full node
         cpu_count = multiprocessing.cpu_count()
-        self.pool = concurrent.futures.ProcessPoolExecutor(
-            max_workers=max(cpu_count - 1, 1)
-        )
+        self.num_workers = max(cpu_count - 1, 1)
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers)
         self.constants = consensus_constants.copy()
         for key, value in override_constants.items():
             self.constants[key] = value
         self.tips = []
-        self.height_to_hash = {}
+        self.height_to_hash = HeightToHash()
         self.headers = {}
         self.coin_store = coin_store
         self.block_store = block_store
         self._shut_down = False
         self.genesis = FullBlock.from_bytes(self.constants["GENESIS_BLOCK"])
         self.coinbase_freeze = self.constants["COINBASE_FREEZE_PERIOD"]
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_records = SnapshotRecords()
+        self.snapshot_height = 0
+        self._snapshot_task = None
         await self._load_chain_from_store()
         return self
 
@@ -123,9 +150,8 @@ class Blockchain:
         """
         lca_db: Optional[Header] = await self.block_store.get_lca()
         tips_db: List[Header] = await self.block_store.get_tips()
-        headers_db: Dict[bytes32, Header] = await self.block_store.get_headers()
 
-        assert (lca_db is None) == (len(tips_db) == 0) == (len(headers_db) == 0)
+        assert (lca_db is None) == (len(tips_db) == 0)
         if lca_db is None:
             result, removed, error_code = await self.receive_block(
                 self.genesis, sync_mode=False
@@ -137,12 +163,93 @@ class Blockchain:
                     raise RuntimeError(f"Invalid genesis block {self.genesis}")
             return
 
-        await self.block_store.init_challenge_hashes()
-
         # Set the state (lca block and tips)
         self.lca_block = lca_db
         self.tips = tips_db
 
+        snapshot: Optional[Tuple[List[SnapshotRecord], List[Header]]] = None
+        if self.snapshot_path is not None:
+            snapshot = read_chain_snapshot(self.snapshot_path, self.genesis.header_hash)
+        if snapshot is None or not await self._load_chain_from_snapshot(*snapshot):
+            headers_db: Dict[bytes32, Header] = await self.block_store.get_headers()
+            await self.block_store.init_challenge_hashes()
+            records: List[SnapshotRecord] = []
+            genesis: Header = self._load_chain_to_height(headers_db, 0, records)
+            self.headers[genesis.header_hash] = genesis
+            records.append(
+                (
+                    genesis.header_hash,
+                    self.block_store.get_challenge_hash(genesis.header_hash),
+                    uint64(genesis.data.total_iters),
+                )
+            )
+            self.snapshot_records = SnapshotRecords(reversed(records))
+
+            # Asserts that the DB genesis block is correct
+            assert genesis == self.genesis.header
+        # The records are the blocks of the chain of the LCA, from genesis up
+        self.height_to_hash = HeightToHash(
+            record[0] for record in self.snapshot_records
+        )
+        self.snapshot_height = len(self.snapshot_records) - 1
+
+        # Adds the blocks to the db between LCA and tip
+        await self.recreate_diff_stores()
+
+    async def _load_chain_from_snapshot(
+        self, records: List[SnapshotRecord], headers: List[Header]
+    ) -> bool:
+        """
+        Loads the blocks up to the height of the snapshot (or of the LCA, if it is lower) from
+        the snapshot, and only the blocks above it from the database. Returns False if the chain
+        of the LCA does not include the block of the snapshot at that height.
+        """
+        base_height = min(len(records) - 1, self.lca_block.height)
+        headers_db: Dict[bytes32, Header] = await self.block_store.get_headers(
+            uint32(base_height)
+        )
+        cur: Header = self.lca_block
+        while cur.height > base_height:
+            if cur.prev_header_hash not in headers_db:
+                return False
+            cur = headers_db[cur.prev_header_hash]
+        if cur.header_hash != records[base_height][0]:
+            log.warning(
+                f"Ignoring the chain snapshot, which is not in the chain of the LCA at height "
+                f"{base_height}"
+            )
+            return False
+
+        await self.block_store.init_challenge_hashes(uint32(base_height))
+        for height in range(base_height + 1):
+            header_hash, challenge_hash, iterations = records[height]
+            self.headers[header_hash] = headers[height]
+            if height > 0:
+                self.block_store.add_proof_of_time(
+                    challenge_hash, iterations, uint32(height)
+                )
+        records_db: List[SnapshotRecord] = []
+        self._load_chain_to_height(headers_db, base_height, records_db)
+        self.snapshot_records = SnapshotRecords(records[: base_height + 1])
+        self.snapshot_records.extend(reversed(records_db))
+        log.info(
+            f"Loaded {base_height + 1} blocks from the chain snapshot, and "
+            f"{self.lca_block.height - base_height} blocks from the database"
+        )
+        return True
+
+    def _load_chain_to_height(
+        self,
+        headers_db: Dict[bytes32, Header],
+        min_height: int,
+        records: List[SnapshotRecord],
+    ) -> Header:
+        """
+        Adds the blocks from the tips to the LCA, and from the LCA down to min_height excluded,
+        to headers, and adds their proofs of time. The blocks of the chain of
+        the LCA are appended to records, from the LCA down. Returns the block at
+        min_height.
+        """
         # Find the common ancestor of the tips, and add intermediate blocks to headers
         cur: List[Header] = self.tips[:]
         while any(b.header_hash != cur[0].header_hash for b in cur):
@@ -161,27 +268,19 @@ class Blockchain:
         # Consistency check, tips should have an LCA equal to the DB LCA
         assert cur[0] == self.lca_block
 
-        # Sets the header for remaining blocks, and height_to_hash dict
+        # Sets the header for remaining blocks
         cur_b: Header = self.lca_block
-        while True:
+        while cur_b.height > min_height:
             self.headers[cur_b.header_hash] = cur_b
-            self.height_to_hash[cur_b.height] = cur_b.header_hash
-            if cur_b.height == 0:
-                break
             prev_b: Header = headers_db[cur_b.prev_header_hash]
             challenge_hash = self.block_store.get_challenge_hash(cur_b.header_hash)
+            iterations = uint64(cur_b.data.total_iters - prev_b.data.total_iters)
             self.block_store.add_proof_of_time(
-                challenge_hash,
-                uint64(cur_b.data.total_iters - prev_b.data.total_iters),
-                cur_b.data.height,
+                challenge_hash, iterations, cur_b.data.height,
             )
+            records.append((cur_b.header_hash, challenge_hash, iterations))
             cur_b = prev_b
-
-        # Asserts that the DB genesis block is correct
-        assert cur_b == self.genesis.header
-
-        # Adds the blocks to the db between LCA and tip
-        await self.recreate_diff_stores()
+        return cur_b
 
     def get_current_tips(self) -> List[Header]:
         """
@@ -214,36 +313,74 @@ class Blockchain:
     def get_challenge(self, block: FullBlock) -> Optional[Challenge]:
         if block.proof_of_time is None:
             return None
-        if block.prev_header_hash not in self.headers and block.height > 0:
+        return self._get_challenge(
+            block.proof_of_space, block.proof_of_time, block.header
+        )
+
+    def _get_challenge(
+        self, proof_of_space: ProofOfSpace, proof_of_time: ProofOfTime, header: Header
+    ) -> Optional[Challenge]:
+        if header.prev_header_hash not in self.headers and header.height > 0:
             return None
 
-        prev_challenge_hash = block.proof_of_space.challenge_hash
+        prev_challenge_hash = proof_of_space.challenge_hash
 
         new_difficulty: Optional[uint64]
-        if (block.height + 1) % self.constants["DIFFICULTY_EPOCH"] == self.constants[
+        if (header.height + 1) % self.constants["DIFFICULTY_EPOCH"] == self.constants[
             "DIFFICULTY_DELAY"
         ]:
             new_difficulty = get_next_difficulty(
-                self.constants, self.headers, self.height_to_hash, block.header
+                self.constants, self.headers, self.height_to_hash, header
             )
         else:
             new_difficulty = None
         return Challenge(
             prev_challenge_hash,
-            std_hash(
-                block.proof_of_space.get_hash() + block.proof_of_time.output.get_hash()
-            ),
+            std_hash(proof_of_space.get_hash() + proof_of_time.output.get_hash()),
             new_difficulty,
         )
 
     def get_header_block(self, block: FullBlock) -> Optional[HeaderBlock]:
-        challenge: Optional[Challenge] = self.get_challenge(block)
-        if challenge is None or block.proof_of_time is None:
+        if block.proof_of_time is None:
+            return None
+        return self.get_header_block_from_parts(
+            block.proof_of_space, block.proof_of_time, block.header
+        )
+
+    def get_header_block_from_parts(
+        self, proof_of_space: ProofOfSpace, proof_of_time: ProofOfTime, header: Header
+    ) -> Optional[HeaderBlock]:
+        challenge: Optional[Challenge] = self._get_challenge(
+            proof_of_space, proof_of_time, header
+        )
+        if challenge is None:
             return None
-        return HeaderBlock(
-            block.proof_of_space, block.proof_of_time, challenge, block.header
+        # All fields come from an already constructed block, so type checking is skipped
+        return HeaderBlock.construct_trusted(
+            proof_of_space, proof_of_time, challenge, header
         )
 
+    async def get_header_blocks_in_range(
+        self, start: uint32, end: uint32, use_reader: bool = False
+    ) -> AsyncIterator[HeaderBlock]:
+        """
+        Yields the header blocks of the chain of the LCA from height start to end included, in
+        order, without reading the generators of the blocks.
+        """
+        async for (
+            proof_of_space,
+            proof_of_time,
+            header,
+            _,
+        ) in self.block_store.get_header_blocks_in_range(start, end, use_reader):
+            if self.height_to_hash.get(header.height) != header.header_hash:
+                continue
+            header_block = self.get_header_block_from_parts(
+                proof_of_space, proof_of_time, header
+            )
+            if header_block is not None:
+                yield header_block
+
     def get_header_hashes(self, tip_header_hash: bytes32) -> List[bytes32]:
         if tip_header_hash not in self.headers:
             raise ValueError("Invalid tip requested")
@@ -414,13 +551,92 @@ class Blockchain:
             fork_hash = self.height_to_hash[fork_h]
             fork_head = self.headers[fork_hash]
             await self._from_fork_to_lca(fork_head, self.lca_block)
-            if not sync_mode:
+            if fork_h == old_lca.height:
+                # The LCA moved forward, so the DiffStores above it can be kept
+                self.coin_store.trim_diffs(self.lca_block)
+                if not sync_mode:
+                    await self._create_diffs_for_tips(self.lca_block)
+            elif not sync_mode:
                 await self.recreate_diff_stores()
+            else:
+                self.coin_store.nuke_diffs()
         else:
             # If LCA has not changed just update the difference
-            self.coin_store.nuke_diffs()
-            # Create DiffStore
             await self._create_diffs_for_tips(self.lca_block)
+        await self._maybe_write_snapshot()
+
+    async def _maybe_write_snapshot(self) -> None:
+        """
+        Writes the snapshot of the chain of the LCA in the background, once the LCA is
+        snapshot_interval blocks above the previous snapshot. Only the records of the blocks which
+        were added to the chain of the LCA since then are computed, and the headers are
+        serialized in the executor.
+        """
+        if self.snapshot_path is None or (
+            self._snapshot_task is not None and not self._snapshot_task.done()
+        ):
+            return
+        if self.lca_block.height < self.snapshot_height + self.snapshot_interval:
+            return
+        records = self.snapshot_records
+        # Removes the blocks which are not in the chain of the LCA anymore, after a reorg
+        height = min(len(records), self.lca_block.height + 1)
+        while (
+            height > 0
+            and records[height - 1][0] != self.height_to_hash[uint32(height - 1)]
+        ):
+            height -= 1
+        records.truncate(height)
+        new_headers: List[Header] = [
+            self.headers[self.height_to_hash[uint32(height)]]
+            for height in range(len(records), self.lca_block.height + 1)
+        ]
+        # The challenge hashes are only loaded from the height of the chain snapshot up, so a
+        # reorg onto a fork below it needs the hashes of the blocks of the fork
+        missing: List[bytes32] = [
+            header.header_hash
+            for header in new_headers
+            if header.header_hash not in self.block_store.challenge_hash_dict
+        ]
+        if len(missing) > 0:
+            await self.block_store.load_challenge_hashes(missing)
+        for header in new_headers:
+            iterations: int = header.data.total_iters
+            if header.height > 0:
+                iterations -= self.headers[header.prev_header_hash].data.total_iters
+            records.append(
+                (
+                    header.header_hash,
+                    self.block_store.get_challenge_hash(header.header_hash),
+                    uint64(iterations),
+                )
+            )
+        headers: List[Header] = [
+            self.headers[header_hash]
+            for header_hash in self.height_to_hash.get_hashes(0, len(records))
+        ]
+        self.snapshot_height = self.lca_block.height
+        self._snapshot_task = asyncio.create_task(
+            self._write_snapshot(records.copy(), headers)
+        )
+
+    async def _write_snapshot(
+        self, records: SnapshotRecords, headers: List[Header]
+    ) -> None:
+        assert self.snapshot_path is not None
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                write_chain_snapshot,
+                self.snapshot_path,
+                self.genesis.header_hash,
+                records,
+                headers,
+            )
+        except Exception as e:
+            log.warning(f"Could not write the chain snapshot: {e}")
+            return
+        log.info(f"Wrote the chain snapshot at height {len(records) - 1}")
 
     async def recreate_diff_stores(self):
         # Nuke DiffStore
@@ -430,27 +646,24 @@ class Blockchain:
 
     def _reconsider_heights(self, old_lca: Optional[Header], new_lca: Header):
         """
-        Update the mapping from height to block hash, when the lca changes.
+        Update the mapping from height to block hash, when the lca changes. The hashes above the
+        fork point of the old and new LCA are truncated, and the blocks of the new chain are
+        appended from the fork point up.
         """
-        curr_old: Optional[Header] = old_lca if old_lca else None
+        new_chain: List[Header] = []
         curr_new: Header = new_lca
-        while True:
-            fetched: Optional[Header]
-            if not curr_old or curr_old.height < curr_new.height:
-                self.height_to_hash[uint32(curr_new.height)] = curr_new.header_hash
-                self.headers[curr_new.header_hash] = curr_new
-                if curr_new.height == 0:
-                    return
-                curr_new = self.headers[curr_new.prev_header_hash]
-            elif curr_old.height > curr_new.height:
-                del self.height_to_hash[uint32(curr_old.height)]
-                curr_old = self.headers[curr_old.prev_header_hash]
-            else:
-                if curr_new.header_hash == curr_old.header_hash:
-                    return
-                self.height_to_hash[uint32(curr_new.height)] = curr_new.header_hash
-                curr_new = self.headers[curr_new.prev_header_hash]
-                curr_old = self.headers[curr_old.prev_header_hash]
+        while self.height_to_hash.get(curr_new.height) != curr_new.header_hash:
+            new_chain.append(curr_new)
+            self.headers[curr_new.header_hash] = curr_new
+            if curr_new.height == 0:
+                break
+            curr_new = self.headers[curr_new.prev_header_hash]
+        if len(new_chain) > 0:
+            self.height_to_hash.truncate(new_chain[-1].height)
+        else:
+            self.height_to_hash.truncate(new_lca.height + 1)
+        for header in reversed(new_chain):
+            self.height_to_hash.append(header.header_hash)
 
     def _find_fork_point_in_chain(self, block_1: Header, block_2: Header) -> uint32:
         """ Tries to find height where new chain (block_2) diverged from block_1 (assuming prev blocks
@@ -472,13 +685,15 @@ class Blockchain:
         """ Adds to unspent store from tips down to target"""
         for tip in self.tips:
             await self._from_tip_to_lca_unspent(tip, target)
+        self.coin_store.set_heads(self.tips)
 
     async def _from_tip_to_lca_unspent(self, head: Header, target: Header):
-        """ Adds diffs to unspent store, from tip to lca target"""
+        """ Adds diffs to unspent store, from tip to lca target, or to the first block which
+        already has diffs"""
         blocks: List[FullBlock] = []
         tip_hash: bytes32 = head.header_hash
         while True:
-            if tip_hash == target.header_hash:
+            if tip_hash == target.header_hash or self.coin_store.has_diffs(tip_hash):
                 break
             full = await self.block_store.get_block(tip_hash)
             if full is None:
@@ -653,7 +868,9 @@ class Blockchain:
         if not block.transactions_generator:
             return Err.UNKNOWN
         # Get List of names removed, puzzles hashes for removed coins and conditions crated
-        error, npc_list, cost = calculate_cost_of_program(block.transactions_generator)
+        error, npc_list, cost = calculate_cost_of_program(
+            block.transactions_generator, cache=True
+        )
 
         # 2. Check that cost <= MAX_BLOCK_COST_CLVM
         if cost > self.constants["MAX_BLOCK_COST_CLVM"]:
@@ -745,6 +962,13 @@ class Blockchain:
             curr = await self.block_store.get_block(curr.prev_header_hash)
             assert curr is not None
 
+        # The coins which are not created in this block are read at once
+        coin_records: Dict[
+            bytes32, CoinRecord
+        ] = await self.coin_store.get_coin_records(
+            [rem for rem in removals if rem not in additions_dic], prev_header
+        )
+
         removal_coin_records: Dict[bytes32, CoinRecord] = {}
         for rem in removals:
             if rem in additions_dic:
@@ -755,8 +979,7 @@ class Blockchain:
                 )
                 removal_coin_records[new_unspent.name] = new_unspent
             else:
-                assert prev_header is not None
-                unspent = await self.coin_store.get_coin_record(rem, prev_header)
+                unspent = coin_records.get(rem)
                 if unspent is not None and unspent.confirmed_block_index <= fork_h:
                     # Spending something in the current chain, confirmed before fork
                     # (We ignore all coins confirmed after fork)
@@ -0,0 +1,175 @@
+import logging
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union, overload
+
+from src.types.header import Header
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint64
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"CHIASNAP"
+SNAPSHOT_VERSION = 1
+# Magic, version, genesis header hash, number of blocks, and checksum of the rest of the file.
+# The checksum only detects corruption, so it is a CRC, which is much faster than a hash.
+SNAPSHOT_PREFIX = struct.Struct(">8sI32sII")
+# Header hash, challenge hash, iterations of the proof of time, offset and size of the header
+SNAPSHOT_RECORD = struct.Struct(">32s32sQQI")
+
+# The header hash, challenge hash and proof of time iterations of the block at a height
+SnapshotRecord = Tuple[bytes32, bytes32, uint64]
+# A SnapshotRecord in SnapshotRecords
+PACKED_RECORD = struct.Struct(">32s32sQ")
+
+
+class SnapshotRecords(Sequence[SnapshotRecord]):
+    """
+    The records of the blocks of the chain of the LCA, indexed by height. Like HeightToHash,
+    the records are packed one after the other in a bytearray, so each height costs 72 bytes
+    instead of a tuple of three objects. Records are only added at the top, and a reorg
+    truncates the records above the fork point.
+    """
+
+    def __init__(self, records: Iterable[SnapshotRecord] = ()):
+        self._data = bytearray()
+        self.extend(records)
+
+    def __len__(self) -> int:
+        return len(self._data) // PACKED_RECORD.size
+
+    @overload
+    def __getitem__(self, index: int) -> SnapshotRecord:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "SnapshotRecords":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            assert step == 1
+            records = SnapshotRecords()
+            records._data = self._data[
+                start * PACKED_RECORD.size : max(start, stop) * PACKED_RECORD.size
+            ]
+            return records
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        header_hash, challenge_hash, iterations = PACKED_RECORD.unpack_from(
+            self._data, index * PACKED_RECORD.size
+        )
+        return bytes32(header_hash), bytes32(challenge_hash), uint64(iterations)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, SnapshotRecords):
+            return self._data == other._data
+        return isinstance(other, list) and list(self) == other
+
+    def __repr__(self) -> str:
+        return f"SnapshotRecords({len(self)} heights)"
+
+    def append(self, record: SnapshotRecord) -> None:
+        self._data += PACKED_RECORD.pack(*record)
+
+    def extend(self, records: Iterable[SnapshotRecord]) -> None:
+        self._data += b"".join(PACKED_RECORD.pack(*record) for record in records)
+
+    def truncate(self, height: int) -> None:
+        """
+        Removes the records of height and above.
+        """
+        del self._data[height * PACKED_RECORD.size :]
+
+    def copy(self) -> "SnapshotRecords":
+        return self[:]
+
+
+def write_chain_snapshot(
+    path: Path,
+    genesis_hash: bytes32,
+    records: Sequence[SnapshotRecord],
+    headers: List[Header],
+) -> None:
+    """
+    Writes the blocks of the chain of the LCA, from genesis up, to path. The fixed size records
+    come first, so that the record of a height is found without reading the headers. The file is
+    replaced atomically, so a node which stops while writing keeps the previous snapshot. The
+    headers are serialized here, since it runs in the executor.
+    """
+    assert len(records) == len(headers)
+    offset = SNAPSHOT_PREFIX.size + SNAPSHOT_RECORD.size * len(records)
+    parts: List[bytes] = []
+    serialized: List[bytes] = [bytes(header) for header in headers]
+    for (header_hash, challenge_hash, iterations), header in zip(records, serialized):
+        parts.append(
+            SNAPSHOT_RECORD.pack(
+                header_hash, challenge_hash, iterations, offset, len(header)
+            )
+        )
+        offset += len(header)
+    body = b"".join(parts + serialized)
+    prefix = SNAPSHOT_PREFIX.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, genesis_hash, len(records), zlib.crc32(body)
+    )
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as f:
+        f.write(prefix)
+        f.write(body)
+    os.replace(temp_path, path)
+
+
+def read_chain_snapshot(
+    path: Path, genesis_hash: bytes32
+) -> Optional[Tuple[List[SnapshotRecord], List[Header]]]:
+    """
+    Returns the records and headers of a snapshot, or None if there is no snapshot, or if it was
+    written by another version or for another chain, or is corrupted. Headers are decoded lazily.
+    """
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < SNAPSHOT_PREFIX.size:
+            log.warning(f"Ignoring the truncated chain snapshot {path}")
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            (
+                magic,
+                version,
+                snapshot_genesis,
+                count,
+                checksum,
+            ) = SNAPSHOT_PREFIX.unpack_from(data)
+            if (
+                magic != SNAPSHOT_MAGIC
+                or version != SNAPSHOT_VERSION
+                or snapshot_genesis != genesis_hash
+            ):
+                log.warning(f"Ignoring the chain snapshot {path} of another version")
+                return None
+            if zlib.crc32(data[SNAPSHOT_PREFIX.size :]) != checksum:
+                log.warning(f"Ignoring the corrupted chain snapshot {path}")
+                return None
+            records: List[SnapshotRecord] = []
+            headers: List[Header] = []
+            for i in range(count):
+                (
+                    header_hash,
+                    challenge_hash,
+                    iterations,
+                    offset,
+                    size,
+                ) = SNAPSHOT_RECORD.unpack_from(
+                    data, SNAPSHOT_PREFIX.size + i * SNAPSHOT_RECORD.size
+                )
+                records.append(
+                    (bytes32(header_hash), bytes32(challenge_hash), uint64(iterations))
+                )
+                headers.append(Header.from_bytes_lazy(data[offset : offset + size]))
+    return records, headers
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32
+
+
+class CoinRecordCache:
+    """
+    A bounded LRU cache of the CoinRecords which are in the coin store (up to the LCA). Coin names
+    which are not in the store are cached too (negative entries), since the mempool looks up the
+    coins of every spend it receives, including the ones which do not exist. Records are also
+    indexed by the heights at which they were confirmed and spent, so that a rollback only visits
+    the records of the blocks which are removed.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # coin name -> CoinRecord, or None if the coin is not in the store
+        self.cache: OrderedDict = OrderedDict()
+        self.confirmed_at: Dict[int, Set[bytes32]] = {}
+        self.spent_at: Dict[int, Set[bytes32]] = {}
+        self.max_height = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def get(self, name: bytes32) -> Tuple[bool, Optional[CoinRecord]]:
+        """
+        Returns whether the name is cached, and the record, which is None if the coin is known
+        not to be in the store.
+        """
+        if name not in self.cache:
+            self.misses += 1
+            return False, None
+        self.cache.move_to_end(name)
+        record: Optional[CoinRecord] = self.cache[name]
+        self.hits += 1
+        if record is None:
+            self.negative_hits += 1
+        return True, record
+
+    def put(self, name: bytes32, record: CoinRecord) -> None:
+        self._set(name, record)
+        self._evict()
+
+    def put_missing(self, name: bytes32) -> None:
+        self._set(name, None)
+        self._evict()
+
+    def update(self, records: Dict[bytes32, CoinRecord]) -> None:
+        for name, record in records.items():
+            self._set(name, record)
+        self._evict()
+
+    def rollback(self, height: uint32) -> None:
+        """
+        Updates the cache like CoinStore.rollback_lca_to_block updates the store: coins confirmed
+        after the height are removed, and coins spent after it become unspent.
+        """
+        removed: Set[bytes32] = set()
+        unspent: Set[bytes32] = set()
+        for h in range(height + 1, self.max_height + 1):
+            removed.update(self.confirmed_at.get(h, ()))
+            unspent.update(self.spent_at.get(h, ()))
+        for name in removed:
+            self._unindex(name, self.cache.pop(name))
+        for name in unspent - removed:
+            record: CoinRecord = self.cache[name]
+            self._unindex(name, record)
+            # Assigning an existing key keeps its position in the LRU order
+            self.cache[name] = CoinRecord.construct_trusted(
+                record.coin,
+                record.confirmed_block_index,
+                uint32(0),
+                False,
+                record.coinbase,
+            )
+            self._index(name, self.cache[name])
+        self.max_height = min(self.max_height, height)
+
+    def clear(self) -> None:
+        self.cache.clear()
+        self.confirmed_at.clear()
+        self.spent_at.clear()
+        self.max_height = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _set(self, name: bytes32, record: Optional[CoinRecord]) -> None:
+        old: Optional[CoinRecord] = self.cache.pop(name, None)
+        if old is not None:
+            self._unindex(name, old)
+        self.cache[name] = record
+        if record is not None:
+            self._index(name, record)
+
+    def _evict(self) -> None:
+        while len(self.cache) > self.max_size:
+            name, record = self.cache.popitem(last=False)
+            if record is not None:
+                self._unindex(name, record)
+            self.evictions += 1
+
+    def _index(self, name: bytes32, record: CoinRecord) -> None:
+        self.confirmed_at.setdefault(record.confirmed_block_index, set()).add(name)
+        self.max_height = max(self.max_height, record.confirmed_block_index)
+        if record.spent:
+            self.spent_at.setdefault(record.spent_block_index, set()).add(name)
+            self.max_height = max(self.max_height, record.spent_block_index)
+
+    def _unindex(self, name: bytes32, record: Optional[CoinRecord]) -> None:
+        if record is None:
+            return
+        self._discard(self.confirmed_at, record.confirmed_block_index, name)
+        if record.spent:
+            self._discard(self.spent_at, record.spent_block_index, name)
+
+    @staticmethod
+    def _discard(index: Dict[int, Set[bytes32]], height: int, name: bytes32) -> None:
+        names = index.get(height)
+        if names is not None:
+            names.discard(name)
+            if len(names) == 0:
+                del index[height]
@@ -1,36 +1,121 @@
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List, Set, Tuple
 import aiosqlite
+from src.full_node.coin_record_cache import CoinRecordCache
 from src.types.full_block import FullBlock
 from src.types.coin import Coin
 from src.types.coin_record import CoinRecord
 from src.types.sized_bytes import bytes32
 from src.types.header import Header
-from src.util.ints import uint32
+from src.util.db_migration import migrate_hex_columns_to_blob
+from src.util.ints import uint32, uint64
 
 
 class DiffStore:
+    """
+    The coin records which are changed by one block above the LCA. Each DiffStore points to the
+    DiffStore of the previous block, or to None if the previous block is the LCA, so the changes
+    from the LCA to a tip are read by following the parents, and tips which have blocks in common
+    share their DiffStores. The coin names are also indexed by puzzle hash.
+    """
+
     header: Header
     diffs: Dict[bytes32, CoinRecord]
+    parent: Optional["DiffStore"]
+    puzzle_hash_index: Dict[bytes32, Set[bytes32]]
 
     @staticmethod
-    async def create(header: Header, diffs: Dict[bytes32, CoinRecord]):
+    async def create(
+        header: Header,
+        diffs: Dict[bytes32, CoinRecord],
+        parent: Optional["DiffStore"] = None,
+    ):
         self = DiffStore()
         self.header = header
-        self.diffs = diffs
+        self.diffs = dict()
+        self.parent = parent
+        self.puzzle_hash_index = dict()
+        for record in diffs.values():
+            self.add(record)
         return self
 
+    def add(self, record: CoinRecord) -> None:
+        self.diffs[record.name] = record
+        self.puzzle_hash_index.setdefault(record.coin.puzzle_hash, set()).add(
+            record.name
+        )
+
+    def get(self, coin_name: bytes32) -> Optional[CoinRecord]:
+        diff_store: Optional[DiffStore] = self
+        while diff_store is not None:
+            record = diff_store.diffs.get(coin_name)
+            if record is not None:
+                return record
+            diff_store = diff_store.parent
+        return None
+
+    def get_all(self) -> Dict[bytes32, CoinRecord]:
+        """
+        Returns the latest record of each coin changed between the LCA and this block.
+        """
+        records: Dict[bytes32, CoinRecord] = {}
+        diff_store: Optional[DiffStore] = self
+        while diff_store is not None:
+            for name, record in diff_store.diffs.items():
+                records.setdefault(name, record)
+            diff_store = diff_store.parent
+        return records
+
+    def get_by_puzzle_hashes(
+        self, puzzle_hashes: Set[bytes32]
+    ) -> Dict[bytes32, CoinRecord]:
+        """
+        Returns the latest record of each coin with one of the puzzle hashes, which was changed
+        between the LCA and this block.
+        """
+        records: Dict[bytes32, CoinRecord] = {}
+        diff_store: Optional[DiffStore] = self
+        while diff_store is not None:
+            for puzzle_hash in puzzle_hashes:
+                for name in diff_store.puzzle_hash_index.get(puzzle_hash, ()):
+                    records.setdefault(name, diff_store.diffs[name])
+            diff_store = diff_store.parent
+        return records
+
+
+# SQLite limits the number of parameters of a query to 999
+QUERY_BATCH_SIZE = 900
+
+# The confirmed height and name of the last coin record of a page
+CoinRecordCursor = Tuple[uint32, bytes32]
+
+# Hashes are stored as 32 byte blobs, and the table is clustered by coin name
+COIN_RECORD_TABLE = (
+    "CREATE TABLE IF NOT EXISTS coin_record("
+    "coin_name blob PRIMARY KEY,"
+    " confirmed_index bigint,"
+    " spent_index bigint,"
+    " spent tinyint,"
+    " coinbase tinyint,"
+    " puzzle_hash blob,"
+    " coin_parent blob,"
+    " amount bigint) WITHOUT ROWID"
+)
+
 
 class CoinStore:
     """
     This object handles CoinRecords in DB.
-    Coins from genesis to LCA are stored on disk db, coins from lca to head are stored in DiffStore object for each tip.
-    When blockchain notifies UnspentStore of new LCA, LCA is added to the disk db,
-    DiffStores are updated/recreated. (managed by blockchain.py)
+    Coins from genesis to LCA are stored on disk db, coins from lca to head are stored in DiffStore objects,
+    one for each block above the LCA. When blockchain notifies UnspentStore of new LCA, LCA is added to the disk db,
+    and the DiffStores up to the LCA are removed. (managed by blockchain.py)
     """
 
     coin_record_db: aiosqlite.Connection
-    lca_coin_records: Dict[str, CoinRecord]
+    lca_coin_records: CoinRecordCache
+    # DiffStores of the tips
     head_diffs: Dict[bytes32, DiffStore]
+    # DiffStores of all blocks above the LCA which are in the chain of a tip
+    block_diffs: Dict[bytes32, DiffStore]
     cache_size: uint32
 
     @classmethod
@@ -41,19 +126,11 @@ class CoinStore:
 
         self.cache_size = cache_size
         self.coin_record_db = connection
-        await self.coin_record_db.execute(
-            (
-                "CREATE TABLE IF NOT EXISTS coin_record("
-                "coin_name text PRIMARY KEY,"
-                " confirmed_index bigint,"
-                " spent_index bigint,"
-                " spent int,"
-                " coinbase int,"
-                " puzzle_hash text,"
-                " coin_parent text,"
-                " amount bigint)"
-            )
+        # Databases from before the binary schema are migrated in place
+        await migrate_hex_columns_to_blob(
+            self.coin_record_db, "coin_record", COIN_RECORD_TABLE, [0, 5, 6]
         )
+        await self.coin_record_db.execute(COIN_RECORD_TABLE)
 
         # Useful for reorg lookups
         await self.coin_record_db.execute(
@@ -68,53 +145,142 @@ class CoinStore:
             "CREATE INDEX IF NOT EXISTS coin_spent on coin_record(spent)"
         )
 
+        # Finds the (unspent) coins of a puzzle hash, ordered by height
         await self.coin_record_db.execute(
-            "CREATE INDEX IF NOT EXISTS coin_spent on coin_record(puzzle_hash)"
+            "CREATE INDEX IF NOT EXISTS coin_puzzle_hash on coin_record(puzzle_hash, spent, confirmed_index)"
         )
 
         await self.coin_record_db.commit()
-        self.lca_coin_records = dict()
+        self.lca_coin_records = CoinRecordCache(cache_size)
         self.head_diffs = dict()
+        self.block_diffs = dict()
         return self
 
     async def add_lcas(self, blocks: List[FullBlock]):
-        for block in blocks:
-            await self.new_lca(block)
-
-    async def new_lca(self, block: FullBlock):
-        removals, additions = await block.tx_removals_and_additions()
-
-        for coin in additions:
-            record: CoinRecord = CoinRecord(coin, block.height, uint32(0), False, False)
-            await self.add_coin_record(record)
+        """
+        Adds the coins of the blocks to the DB, and marks the coins they spend as spent. All
+        changes are computed in memory first, and then written in one transaction, so either
+        all blocks are applied, or none of them are.
+        """
+        block_changes = [
+            (block, await block.tx_removals_and_additions()) for block in blocks
+        ]
+        # The spent coins which are in the DB are read at once
+        existing: Dict[bytes32, CoinRecord] = await self.get_coin_records(
+            [name for _, (removals, _) in block_changes for name in removals]
+        )
+        changed: Dict[bytes32, CoinRecord] = {}
+        for block, (removals, additions) in block_changes:
+            for coin in additions:
+                record: CoinRecord = CoinRecord.construct_trusted(
+                    coin, block.height, uint32(0), False, False
+                )
+                changed[coin.name()] = record
+
+            for coin_name in removals:
+                current: Optional[CoinRecord] = changed.get(coin_name)
+                if current is None:
+                    current = existing.get(coin_name)
+                if current is None:
+                    continue
+                changed[coin_name] = CoinRecord.construct_trusted(
+                    current.coin,
+                    current.confirmed_block_index,
+                    block.height,
+                    True,
+                    current.coinbase,
+                )
 
-        for coin_name in removals:
-            await self.set_spent(coin_name, block.height)
+            for reward in [block.header.data.coinbase, block.header.data.fees_coin]:
+                changed[reward.name()] = CoinRecord.construct_trusted(
+                    reward, block.height, uint32(0), False, True
+                )
 
-        coinbase: CoinRecord = CoinRecord(
-            block.header.data.coinbase, block.height, uint32(0), False, True
-        )
-        fees_coin: CoinRecord = CoinRecord(
-            block.header.data.fees_coin, block.height, uint32(0), False, True
-        )
+        try:
+            cursor = await self.coin_record_db.executemany(
+                "INSERT OR REPLACE INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    self.coin_record_to_row(name, record)
+                    for name, record in changed.items()
+                ],
+            )
+            await cursor.close()
+            await self.coin_record_db.commit()
+        except BaseException:
+            # The ram cache is only updated after the commit, so it is still consistent
+            await self.coin_record_db.rollback()
+            raise
+        self.lca_coin_records.update(changed)
 
-        await self.add_coin_record(coinbase)
-        await self.add_coin_record(fees_coin)
+    async def new_lca(self, block: FullBlock):
+        await self.add_lcas([block])
 
     def nuke_diffs(self):
         self.head_diffs.clear()
+        self.block_diffs.clear()
+
+    def has_diffs(self, header_hash: bytes32) -> bool:
+        return header_hash in self.block_diffs
 
     # Received new tip, just update diffs
     async def new_heads(self, blocks: List[FullBlock]):
-        last: FullBlock = blocks[-1]
-        diff_store: DiffStore = await DiffStore.create(last.header, dict())
-
+        """
+        Adds the DiffStores of the blocks, which are consecutive, and start at a child of the
+        LCA or of a block which already has a DiffStore. DiffStores which already exist are reused.
+        """
+        diff_store: Optional[DiffStore] = self.block_diffs.get(
+            blocks[0].prev_header_hash
+        )
         block: FullBlock
         for block in blocks:
+            existing = self.block_diffs.get(block.header_hash)
+            if existing is not None:
+                diff_store = existing
+                continue
+            new_diff_store: DiffStore = await DiffStore.create(
+                block.header, dict(), diff_store
+            )
             removals, additions = await block.tx_removals_and_additions()
-            await self.add_diffs(removals, additions, block, diff_store)
-
-        self.head_diffs[last.header_hash] = diff_store
+            await self.add_diffs(removals, additions, block, new_diff_store)
+            self.block_diffs[block.header_hash] = new_diff_store
+            diff_store = new_diff_store
+
+        assert diff_store is not None
+        self.head_diffs[blocks[-1].header_hash] = diff_store
+
+    def set_heads(self, tips: List[Header]):
+        """
+        Sets the DiffStores of the tips, and removes the DiffStores which are not in the chain of
+        any tip.
+        """
+        self.head_diffs = {
+            tip.header_hash: self.block_diffs[tip.header_hash]
+            for tip in tips
+            if tip.header_hash in self.block_diffs
+        }
+        used: Dict[bytes32, DiffStore] = {}
+        for head in self.head_diffs.values():
+            diff_store: Optional[DiffStore] = head
+            while diff_store is not None and diff_store.header.header_hash not in used:
+                used[diff_store.header.header_hash] = diff_store
+                diff_store = diff_store.parent
+        self.block_diffs = used
+
+    def trim_diffs(self, lca: Header):
+        """
+        Removes the DiffStores of the blocks up to the new LCA, which is a descendant of the
+        previous one, after the blocks were added to the DB with add_lcas. The DiffStores
+        above the LCA stay valid, since they only contain the changes of their own block.
+        """
+        for header_hash, diff_store in list(self.block_diffs.items()):
+            if diff_store.header.height <= lca.height:
+                del self.block_diffs[header_hash]
+                self.head_diffs.pop(header_hash, None)
+            elif (
+                diff_store.parent is not None
+                and diff_store.parent.header.height <= lca.height
+            ):
+                diff_store.parent = None
 
     async def add_diffs(
         self,
@@ -125,62 +291,54 @@ class CoinStore:
     ):
 
         for coin in additions:
-            added: CoinRecord = CoinRecord(coin, block.height, 0, 0, 0)  # type: ignore # noqa
-            diff_store.diffs[added.name.hex()] = added
+            added: CoinRecord = CoinRecord.construct_trusted(
+                coin, block.height, uint32(0), False, False
+            )
+            diff_store.add(added)
 
-        coinbase: CoinRecord = CoinRecord(block.header.data.coinbase, block.height, 0, 0, 1)  # type: ignore # noqa
-        diff_store.diffs[coinbase.name.hex()] = coinbase
-        fees_coin: CoinRecord = CoinRecord(block.header.data.fees_coin, block.height, 0, 0, 1)  # type: ignore # noqa
-        diff_store.diffs[fees_coin.name.hex()] = fees_coin
+        coinbase: CoinRecord = CoinRecord.construct_trusted(
+            block.header.data.coinbase, block.height, uint32(0), False, True
+        )
+        diff_store.add(coinbase)
+        fees_coin: CoinRecord = CoinRecord.construct_trusted(
+            block.header.data.fees_coin, block.height, uint32(0), False, True
+        )
+        diff_store.add(fees_coin)
 
         for coin_name in removals:
-            removed: Optional[CoinRecord] = None
-            if coin_name.hex() in diff_store.diffs:
-                removed = diff_store.diffs[coin_name.hex()]
+            removed: Optional[CoinRecord] = diff_store.get(coin_name)
             if removed is None:
                 removed = await self.get_coin_record(coin_name)
             if removed is None:
                 raise Exception
-            spent = CoinRecord(
+            spent = CoinRecord.construct_trusted(
                 removed.coin,
                 removed.confirmed_block_index,
                 block.height,
                 True,
                 removed.coinbase,
-            )  # type: ignore # noqa
-            diff_store.diffs[spent.name.hex()] = spent
+            )
+            diff_store.add(spent)
 
     # Store CoinRecord in DB and ram cache
     async def add_coin_record(self, record: CoinRecord) -> None:
+        name = record.coin.name()
         cursor = await self.coin_record_db.execute(
             "INSERT OR REPLACE INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                record.coin.name().hex(),
-                record.confirmed_block_index,
-                record.spent_block_index,
-                int(record.spent),
-                int(record.coinbase),
-                str(record.coin.puzzle_hash.hex()),
-                str(record.coin.parent_coin_info.hex()),
-                record.coin.amount,
-            ),
+            self.coin_record_to_row(name, record),
         )
         await cursor.close()
         await self.coin_record_db.commit()
-        self.lca_coin_records[record.coin.name().hex()] = record
-        if len(self.lca_coin_records) > self.cache_size:
-            while len(self.lca_coin_records) > self.cache_size:
-                first_in = list(self.lca_coin_records.keys())[0]
-                del self.lca_coin_records[first_in]
+        self.lca_coin_records.put(name, record)
 
     # Update coin_record to be spent in DB
     async def set_spent(self, coin_name: bytes32, index: uint32):
         current: Optional[CoinRecord] = await self.get_coin_record(coin_name)
         if current is None:
             return
-        spent: CoinRecord = CoinRecord(
+        spent: CoinRecord = CoinRecord.construct_trusted(
             current.coin, current.confirmed_block_index, index, True, current.coinbase,
-        )  # type: ignore # noqa
+        )
         await self.add_coin_record(spent)
 
     # Checks DB and DiffStores for CoinRecord with coin_name and returns it
@@ -188,63 +346,164 @@ class CoinStore:
         self, coin_name: bytes32, header: Header = None
     ) -> Optional[CoinRecord]:
         if header is not None and header.header_hash in self.head_diffs:
-            diff_store = self.head_diffs[header.header_hash]
-            if coin_name.hex() in diff_store.diffs:
-                return diff_store.diffs[coin_name.hex()]
-        if coin_name.hex() in self.lca_coin_records:
-            return self.lca_coin_records[coin_name.hex()]
+            diff_record = self.head_diffs[header.header_hash].get(coin_name)
+            if diff_record is not None:
+                return diff_record
+        cached, record = self.lca_coin_records.get(coin_name)
+        if cached:
+            return record
         cursor = await self.coin_record_db.execute(
-            "SELECT * from coin_record WHERE coin_name=?", (coin_name.hex(),)
+            "SELECT * from coin_record WHERE coin_name=?", (coin_name,)
         )
         row = await cursor.fetchone()
         await cursor.close()
-        if row is not None:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
+        if row is None:
+            self.lca_coin_records.put_missing(coin_name)
+            return None
+        record = self.row_to_coin_record(row)
+        self.lca_coin_records.put(coin_name, record)
+        return record
+
+    async def get_coin_records(
+        self, coin_names: List[bytes32], header: Header = None
+    ) -> Dict[bytes32, CoinRecord]:
+        """
+        Same as get_coin_record for many coins, but the coins which are not in the DiffStores or
+        in the cache are read from the DB with one query per batch. Coins which do not exist are
+        not in the result.
+        """
+        records: Dict[bytes32, CoinRecord] = {}
+        diff_store: Optional[DiffStore] = None
+        if header is not None:
+            diff_store = self.head_diffs.get(header.header_hash)
+        missing: List[bytes32] = []
+        for coin_name in coin_names:
+            record: Optional[CoinRecord] = None
+            if diff_store is not None:
+                record = diff_store.get(coin_name)
+            if record is None:
+                cached, record = self.lca_coin_records.get(coin_name)
+                if not cached:
+                    missing.append(coin_name)
+            if record is not None:
+                records[coin_name] = record
+
+        for i in range(0, len(missing), QUERY_BATCH_SIZE):
+            batch = missing[i : i + QUERY_BATCH_SIZE]
+            cursor = await self.coin_record_db.execute(
+                f"SELECT * from coin_record WHERE coin_name in ({', '.join(['?'] * len(batch))})",
+                batch,
             )
-            return CoinRecord(coin, row[1], row[2], row[3], row[4])
-        return None
+            rows = await cursor.fetchall()
+            await cursor.close()
+            for row in rows:
+                coin_name = bytes32(row[0])
+                records[coin_name] = self.row_to_coin_record(row)
+                self.lca_coin_records.put(coin_name, records[coin_name])
+            for coin_name in batch:
+                if coin_name not in records:
+                    self.lca_coin_records.put_missing(coin_name)
+        return records
 
     # Checks DB and DiffStores for CoinRecords with puzzle_hash and returns them
     async def get_coin_records_by_puzzle_hash(
         self, puzzle_hash: bytes32, header: Header = None
     ) -> List[CoinRecord]:
-        coins = set()
+        records, _ = await self.get_coin_records_by_puzzle_hashes([puzzle_hash], header)
+        return records
+
+    async def get_coin_records_by_puzzle_hashes(
+        self,
+        puzzle_hashes: List[bytes32],
+        header: Header = None,
+        include_spent_coins: bool = True,
+        start_height: uint32 = uint32(0),
+        end_height: uint32 = uint32((2 ** 32) - 1),
+        limit: Optional[int] = None,
+        start_after: Optional[CoinRecordCursor] = None,
+    ) -> Tuple[List[CoinRecord], Optional[CoinRecordCursor]]:
+        """
+        Returns the CoinRecords with any of the puzzle hashes, which were confirmed in
+        [start_height, end_height), as seen from the header if it is a tip, or from the LCA
+        otherwise. The records are ordered by confirmed height and coin name. At most limit
+        records are returned, after the start_after cursor, with the cursor of the next page,
+        or None if there are no more records.
+        """
+        conditions = "confirmed_index>=? AND confirmed_index<?"
+        parameters: List[Any] = [start_height, end_height]
+        if not include_spent_coins:
+            conditions += " AND spent=0"
+        if start_after is not None:
+            conditions += (
+                " AND (confirmed_index>? OR (confirmed_index=? AND coin_name>?))"
+            )
+            parameters += [start_after[0], start_after[0], start_after[1]]
+        order = " ORDER BY confirmed_index, coin_name"
+        if limit is not None:
+            assert limit >= 1
+            order += f" LIMIT {int(limit)}"
+
+        records: Dict[bytes32, CoinRecord] = {}
+        for i in range(0, len(puzzle_hashes), QUERY_BATCH_SIZE):
+            batch = puzzle_hashes[i : i + QUERY_BATCH_SIZE]
+            cursor = await self.coin_record_db.execute(
+                f"SELECT * from coin_record WHERE puzzle_hash in ({', '.join(['?'] * len(batch))})"
+                f" AND {conditions}{order}",
+                (*batch, *parameters),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+            for row in rows:
+                records[bytes32(row[0])] = self.row_to_coin_record(row)
         if header is not None and header.header_hash in self.head_diffs:
             diff_store = self.head_diffs[header.header_hash]
-            for _, record in diff_store.diffs.items():
-                if record.coin.puzzle_hash == puzzle_hash:
-                    coins.add(record)
-        cursor = await self.coin_record_db.execute(
-            "SELECT * from coin_record WHERE puzzle_hash=?", (puzzle_hash.hex(),)
+            # Coins spent above the LCA are replaced by their spent record
+            for name, record in diff_store.get_by_puzzle_hashes(
+                set(puzzle_hashes)
+            ).items():
+                key = (record.confirmed_block_index, name)
+                if start_height <= key[0] < end_height and (
+                    start_after is None or key > start_after
+                ):
+                    records[name] = record
+
+        # Sorts by the names which are already computed, since CoinRecord.name hashes the coin
+        items = sorted(
+            records.items(), key=lambda i: (i[1].confirmed_block_index, i[0])
+        )
+        next_cursor: Optional[CoinRecordCursor] = None
+        if limit is not None and len(items) >= limit:
+            items = items[:limit]
+            next_cursor = (items[-1][1].confirmed_block_index, items[-1][0])
+        return (
+            [r for _, r in items if include_spent_coins or not r.spent],
+            next_cursor,
+        )
+
+    @staticmethod
+    def coin_record_to_row(name: bytes32, record: CoinRecord) -> Tuple:
+        return (
+            name,
+            record.confirmed_block_index,
+            record.spent_block_index,
+            int(record.spent),
+            int(record.coinbase),
+            record.coin.puzzle_hash,
+            record.coin.parent_coin_info,
+            record.coin.amount,
+        )
+
+    @staticmethod
+    def row_to_coin_record(row) -> CoinRecord:
+        # Values are converted to the exact field types, so type checking can be skipped
+        coin = Coin.construct_trusted(bytes32(row[6]), bytes32(row[5]), uint64(row[7]),)
+        return CoinRecord.construct_trusted(
+            coin, uint32(row[1]), uint32(row[2]), bool(row[3]), bool(row[4])
         )
-        rows = await cursor.fetchall()
-        await cursor.close()
-        for row in rows:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-            )
-            coins.add(CoinRecord(coin, row[1], row[2], row[3], row[4]))
-        return list(coins)
 
     async def rollback_lca_to_block(self, block_index):
         # Update memory cache
-        delete_queue: bytes32 = []
-        for coin_name, coin_record in self.lca_coin_records.items():
-            if coin_record.spent_block_index > block_index:
-                new_record = CoinRecord(
-                    coin_record.coin,
-                    coin_record.confirmed_block_index,
-                    coin_record.spent_block_index,
-                    False,
-                    coin_record.coinbase,
-                )
-                self.lca_coin_records[coin_record.coin.name().hex()] = new_record
-            if coin_record.confirmed_block_index > block_index:
-                delete_queue.append(coin_name)
-
-        for coin_name in delete_queue:
-            del self.lca_coin_records[coin_name]
+        self.lca_coin_records.rollback(block_index)
 
         # Delete from storage
         c1 = await self.coin_record_db.execute(
@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Union
+from typing import Dict, Mapping, Optional, Union
 
 from src.consensus.pot_iterations import calculate_min_iters_from_iterations
 from src.types.full_block import FullBlock
@@ -15,7 +15,7 @@ from src.util.significant_bits import (
 def get_next_difficulty(
     constants: Dict,
     headers: Dict[bytes32, Header],
-    height_to_hash: Dict[uint32, bytes32],
+    height_to_hash: Mapping[uint32, bytes32],
     block: Header,
 ) -> uint64:
     """
@@ -153,7 +153,7 @@ def get_next_difficulty(
 def get_next_min_iters(
     constants: Dict,
     headers: Dict[bytes32, Header],
-    height_to_hash: Dict[uint32, bytes32],
+    height_to_hash: Mapping[uint32, bytes32],
     block: Union[FullBlock, HeaderBlock],
 ) -> uint64:
     """
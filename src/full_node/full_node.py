@@ -22,6 +22,7 @@ from src.full_node.mempool_manager import MempoolManager
 from src.full_node.sync_blocks_processor import SyncBlocksProcessor
 from src.full_node.sync_peers_handler import SyncPeersHandler
 from src.full_node.sync_store import SyncStore
+from src.full_node.transaction_queue import TransactionQueue
 from src.protocols import (
     introducer_protocol,
     farmer_protocol,
@@ -48,11 +49,13 @@ from src.types.spend_bundle import SpendBundle
 from src.util.api_decorators import api_request
 from src.util.bundle_tools import best_solution_program
 from src.util.cost_calculator import calculate_cost_of_program
+from src.util.db_wrapper import DBWrapper
 from src.util.errors import ConsensusError, Err
 from src.util.hash import std_hash
 from src.util.ints import uint32, uint64, uint128
 from src.util.merkle_set import MerkleSet
 from src.util.path import mkdir, path_from_root
+from src.util.streamable import cache_hit_rates, cache_stats, reset_cache_stats
 
 OutboundMessageGenerator = AsyncGenerator[OutboundMessage, None]
 
@@ -64,6 +67,7 @@ class FullNode:
     coin_store: CoinStore
     mempool_manager: MempoolManager
     connection: aiosqlite.Connection
+    db_wrapper: DBWrapper
     sync_peers_handler: Optional[SyncPeersHandler]
     blockchain: Blockchain
     config: Dict
@@ -104,15 +108,27 @@ class FullNode:
 
     async def start(self):
         # create the store (db) and full node instance
-        self.connection = await aiosqlite.connect(self.db_path)
-        self.block_store = await BlockStore.create(self.connection)
+        self.db_wrapper = await DBWrapper.create(
+            self.db_path,
+            self.config.get("db_read_connections", 4),
+            self.config.get("db_synchronous", "NORMAL"),
+            self.config.get("db_cache_size_mb", 64),
+            self.config.get("db_mmap_size_mb", 256),
+        )
+        self.connection = self.db_wrapper.db
+        self.block_store = await BlockStore.create(self.connection, self.db_wrapper)
         self.full_node_store = await FullNodeStore.create(self.connection)
         self.sync_store = await SyncStore.create()
         self.coin_store = await CoinStore.create(self.connection)
 
         self.log.info("Initializing blockchain from disk")
+        snapshot_interval: int = self.config.get("chain_snapshot_interval", 1000)
         self.blockchain = await Blockchain.create(
-            self.coin_store, self.block_store, self.constants
+            self.coin_store,
+            self.block_store,
+            self.constants,
+            self.db_path.with_suffix(".snapshot") if snapshot_interval > 0 else None,
+            snapshot_interval,
         )
         self.log.info(
             f"Blockchain initialized to tips at {[t.height for t in self.blockchain.get_current_tips()]}"
@@ -120,6 +136,14 @@ class FullNode:
 
         self.mempool_manager = MempoolManager(self.coin_store, self.constants)
         await self.mempool_manager.new_tips(await self.blockchain.get_full_tips())
+        self.transaction_queue = TransactionQueue(
+            self.mempool_manager,
+            self.blockchain.lock,
+            self.blockchain.pool,
+            self.blockchain.num_workers,
+            self.config.get("transaction_batch_size", 100),
+            self.config.get("transaction_batch_latency_ms", 10) / 1000,
+        )
         self.state_changed_callback = None
 
     def set_global_connections(self, global_connections: PeerConnections):
@@ -270,10 +294,11 @@ class FullNode:
 
     def _close(self):
         self._shut_down = True
+        self.transaction_queue.close()
         self.blockchain.shut_down()
 
     async def _await_closed(self):
-        await self.connection.close()
+        await self.db_wrapper.close()
 
     async def _sync(self) -> OutboundMessageGenerator:
         """
@@ -296,6 +321,7 @@ class FullNode:
         tip_block: FullBlock
         tip_height = 0
         sync_start_time = time.time()
+        reset_cache_stats()
 
         # Based on responses from peers about the current heads, see which head is the heaviest
         # (similar to longest chain rule).
@@ -440,6 +466,12 @@ class FullNode:
             f"Finished sync up to height {tip_height}. Total time: "
             f"{round((time.time() - sync_start_time)/60, 2)} minutes."
         )
+        rates = cache_hit_rates()
+        self.log.info(
+            f"Streamable cache hit rates during sync: bytes {round(rates['bytes'] * 100, 1)}% "
+            f"({cache_stats['bytes_hits']} hits), hash {round(rates['hash'] * 100, 1)}% "
+            f"({cache_stats['hash_hits']} hits)"
+        )
 
     async def _finish_sync(self) -> OutboundMessageGenerator:
         """
@@ -565,27 +597,26 @@ class FullNode:
         # Ignore if syncing
         if self.sync_store.get_sync_mode():
             return
-        async with self.blockchain.lock:
-            cost, status, error = await self.mempool_manager.add_spendbundle(
-                tx.transaction
+        cost, status, error = await self.transaction_queue.add_spendbundle(
+            tx.transaction
+        )
+        if status == MempoolInclusionStatus.SUCCESS:
+            fees = tx.transaction.fees()
+            assert fees >= 0
+            assert cost is not None
+            new_tx = full_node_protocol.NewTransaction(
+                tx.transaction.name(), cost, uint64(tx.transaction.fees()),
             )
-            if status == MempoolInclusionStatus.SUCCESS:
-                fees = tx.transaction.fees()
-                assert fees >= 0
-                assert cost is not None
-                new_tx = full_node_protocol.NewTransaction(
-                    tx.transaction.name(), cost, uint64(tx.transaction.fees()),
-                )
-                yield OutboundMessage(
-                    NodeType.FULL_NODE,
-                    Message("new_transaction", new_tx),
-                    Delivery.BROADCAST_TO_OTHERS,
-                )
-            else:
-                self.log.warning(
-                    f"Wasn't able to add transaction with id {tx.transaction.name()}, {status} error: {error}"
-                )
-                return
+            yield OutboundMessage(
+                NodeType.FULL_NODE,
+                Message("new_transaction", new_tx),
+                Delivery.BROADCAST_TO_OTHERS,
+            )
+        else:
+            self.log.warning(
+                f"Wasn't able to add transaction with id {tx.transaction.name()}, {status} error: {error}"
+            )
+            return
 
     @api_request
     async def reject_transaction_request(
@@ -1088,12 +1119,15 @@ class FullNode:
         """
         A peer requests a list of header blocks, by height. Used for syncing or light clients.
         """
-        full_block: Optional[FullBlock] = await self.block_store.get_block(
-            request.header_hash
+        parts = await self.block_store.get_header_block_parts(
+            request.header_hash, use_reader=True
         )
-        if full_block is not None:
-            header_block: Optional[HeaderBlock] = self.blockchain.get_header_block(
-                full_block
+        if parts is not None:
+            proof_of_space, proof_of_time, header, transactions_filter = parts
+            header_block: Optional[
+                HeaderBlock
+            ] = self.blockchain.get_header_block_from_parts(
+                proof_of_space, proof_of_time, header
             )
             if header_block is not None and header_block.height == request.height:
                 response = full_node_protocol.RespondHeaderBlock(header_block)
@@ -1195,7 +1229,8 @@ class FullNode:
         # Calculate the cost of transactions
         cost = uint64(0)
         if solution_program:
-            _, _, cost = calculate_cost_of_program(solution_program)
+            # Cached, so that the generator does not run again when the block is validated
+            _, _, cost = calculate_cost_of_program(solution_program, cache=True)
 
         extension_data: bytes32 = bytes32([0] * 32)
 
@@ -1393,7 +1428,7 @@ class FullNode:
         self, request_block: full_node_protocol.RequestBlock
     ) -> OutboundMessageGenerator:
         block: Optional[FullBlock] = await self.block_store.get_block(
-            request_block.header_hash
+            request_block.header_hash, use_reader=True
         )
         if block is not None:
             yield OutboundMessage(
@@ -1701,29 +1736,28 @@ class FullNode:
             status = MempoolInclusionStatus.FAILED
             error: Optional[Err] = Err.UNKNOWN
         else:
-            async with self.blockchain.lock:
-                cost, status, error = await self.mempool_manager.add_spendbundle(
-                    tx.transaction
+            cost, status, error = await self.transaction_queue.add_spendbundle(
+                tx.transaction
+            )
+            if status == MempoolInclusionStatus.SUCCESS:
+                # Only broadcast successful transactions, not pending ones. Otherwise it's a DOS
+                # vector.
+                fees = tx.transaction.fees()
+                assert fees >= 0
+                assert cost is not None
+                new_tx = full_node_protocol.NewTransaction(
+                    tx.transaction.name(), cost, uint64(tx.transaction.fees()),
+                )
+                yield OutboundMessage(
+                    NodeType.FULL_NODE,
+                    Message("new_transaction", new_tx),
+                    Delivery.BROADCAST_TO_OTHERS,
+                )
+            else:
+                self.log.warning(
+                    f"Wasn't able to add transaction with id {tx.transaction.name()}, "
+                    f"status {status} error: {error}"
                 )
-                if status == MempoolInclusionStatus.SUCCESS:
-                    # Only broadcast successful transactions, not pending ones. Otherwise it's a DOS
-                    # vector.
-                    fees = tx.transaction.fees()
-                    assert fees >= 0
-                    assert cost is not None
-                    new_tx = full_node_protocol.NewTransaction(
-                        tx.transaction.name(), cost, uint64(tx.transaction.fees()),
-                    )
-                    yield OutboundMessage(
-                        NodeType.FULL_NODE,
-                        Message("new_transaction", new_tx),
-                        Delivery.BROADCAST_TO_OTHERS,
-                    )
-                else:
-                    self.log.warning(
-                        f"Wasn't able to add transaction with id {tx.transaction.name()}, "
-                        f"status {status} error: {error}"
-                    )
 
         error_name = error.name if error is not None else None
         if status == MempoolInclusionStatus.SUCCESS:
@@ -1800,7 +1834,9 @@ class FullNode:
                 Delivery.RESPOND,
             )
             return
-        block: Optional[FullBlock] = await self.block_store.get_block(header_hash)
+        block: Optional[FullBlock] = await self.block_store.get_block(
+            header_hash, use_reader=True
+        )
         header_hash_again: Optional[bytes32] = self.blockchain.height_to_hash.get(
             request.starting_height, None
         )
@@ -1819,11 +1855,10 @@ class FullNode:
                 Delivery.RESPOND,
             )
             return
-        header_hashes: List[bytes32] = []
-        for height in range(
+        # One slice of the contiguous hashes, instead of one lookup per height
+        header_hashes: List[bytes32] = self.blockchain.height_to_hash.get_hashes(
             request.starting_height, self.blockchain.lca_block.height + 1
-        ):
-            header_hashes.append(self.blockchain.height_to_hash[uint32(height)])
+        )
         response = wallet_protocol.RespondAllHeaderHashesAfter(
             request.starting_height, request.previous_challenge_hash, header_hashes
         )
@@ -1837,16 +1872,19 @@ class FullNode:
     async def request_header(
         self, request: wallet_protocol.RequestHeader
     ) -> OutboundMessageGenerator:
-        full_block: Optional[FullBlock] = await self.block_store.get_block(
-            request.header_hash
+        parts = await self.block_store.get_header_block_parts(
+            request.header_hash, use_reader=True
         )
-        if full_block is not None:
-            header_block: Optional[HeaderBlock] = self.blockchain.get_header_block(
-                full_block
+        if parts is not None:
+            proof_of_space, proof_of_time, header, transactions_filter = parts
+            header_block: Optional[
+                HeaderBlock
+            ] = self.blockchain.get_header_block_from_parts(
+                proof_of_space, proof_of_time, header
             )
             if header_block is not None and header_block.height == request.height:
                 response = wallet_protocol.RespondHeader(
-                    header_block, full_block.transactions_filter
+                    header_block, transactions_filter
                 )
                 yield OutboundMessage(
                     NodeType.WALLET,
@@ -1866,7 +1904,7 @@ class FullNode:
         self, request: wallet_protocol.RequestRemovals
     ) -> OutboundMessageGenerator:
         block: Optional[FullBlock] = await self.block_store.get_block(
-            request.header_hash
+            request.header_hash, use_reader=True
         )
         if (
             block is None
@@ -1901,8 +1939,9 @@ class FullNode:
                 block.height, block.header_hash, [], proofs
             )
         elif request.coin_names is None or len(request.coin_names) == 0:
+            coin_records = await self.coin_store.get_coin_records(all_removals)
             for removal in all_removals:
-                cr = await self.coin_store.get_coin_record(removal)
+                cr = coin_records.get(removal)
                 assert cr is not None
                 coins_map.append((cr.coin.name(), cr.coin))
             response = wallet_protocol.RespondRemovals(
@@ -1914,11 +1953,14 @@ class FullNode:
             for coin_name in all_removals:
                 removal_merkle_set.add_already_hashed(coin_name)
             assert removal_merkle_set.get_root() == block.header.data.removals_root
+            coin_records = await self.coin_store.get_coin_records(
+                [name for name in request.coin_names if name in all_removals]
+            )
             for coin_name in request.coin_names:
                 result, proof = removal_merkle_set.is_included_already_hashed(coin_name)
                 proofs_map.append((coin_name, proof))
                 if coin_name in all_removals:
-                    cr = await self.coin_store.get_coin_record(coin_name)
+                    cr = coin_records.get(coin_name)
                     assert cr is not None
                     coins_map.append((coin_name, cr.coin))
                     assert result
@@ -1938,7 +1980,7 @@ class FullNode:
         self, request: wallet_protocol.RequestAdditions
     ) -> OutboundMessageGenerator:
         block: Optional[FullBlock] = await self.block_store.get_block(
-            request.header_hash
+            request.header_hash, use_reader=True
         )
         if (
             block is None
@@ -0,0 +1,80 @@
+from typing import Any, Iterable, Iterator, List, Mapping, Optional
+
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32
+
+
+def _make_hash(slot: Any) -> bytes32:
+    # Slots are always 32 bytes, so the validation in bytes32.__new__ can be skipped
+    return bytes.__new__(bytes32, slot)  # type: ignore
+
+
+class HeightToHash(Mapping[uint32, bytes32]):
+    """
+    The header hashes of the blocks of the chain of the LCA, indexed by height. The hashes are
+    stored one after the other in a bytearray, so each height costs 32 bytes instead of a dict
+    entry with two objects, and a range of hashes is one slice of the buffer. Heights are only
+    added at the top, and a reorg truncates the hashes above the fork point.
+    """
+
+    def __init__(self, hashes: Iterable[bytes32] = ()):
+        self._data = bytearray(b"".join(hashes))
+
+    def __len__(self) -> int:
+        return len(self._data) // 32
+
+    def __getitem__(self, height: int) -> bytes32:
+        if not 0 <= height < len(self):
+            raise KeyError(height)
+        return _make_hash(self._data[height * 32 : (height + 1) * 32])
+
+    def __contains__(self, height: Any) -> bool:
+        return isinstance(height, int) and 0 <= height < len(self)
+
+    def __iter__(self) -> Iterator[uint32]:
+        return (uint32(height) for height in range(len(self)))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, HeightToHash):
+            return self._data == other._data
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"HeightToHash({len(self)} heights)"
+
+    def get(self, height: int, default: Optional[bytes32] = None) -> Optional[bytes32]:
+        if height not in self:
+            return default
+        return self[height]
+
+    def __setitem__(self, height: int, header_hash: bytes32) -> None:
+        """
+        Replaces the hash at a height, or adds the hash of the next height.
+        """
+        if height == len(self):
+            self._data += header_hash
+        elif 0 <= height < len(self):
+            self._data[height * 32 : (height + 1) * 32] = header_hash
+        else:
+            raise IndexError(f"Height {height} is not next to the top {len(self) - 1}")
+
+    def append(self, header_hash: bytes32) -> None:
+        self._data += header_hash
+
+    def truncate(self, height: int) -> None:
+        """
+        Removes the hashes of height and above, for example when the LCA moves to another fork.
+        """
+        del self._data[height * 32 :]
+
+    def get_range(self, start: int, end: int) -> memoryview:
+        """
+        Returns the concatenated hashes from height start to end excluded, without copying them.
+        The view must be released before the hashes change, since the buffer can not be resized
+        while it is exported.
+        """
+        return memoryview(self._data)[start * 32 : end * 32]
+
+    def get_hashes(self, start: int, end: int) -> List[bytes32]:
+        with self.get_range(start, end) as view:
+            return [_make_hash(view[i : i + 32]) for i in range(0, len(view), 32)]
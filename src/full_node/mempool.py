@@ -1,6 +1,8 @@
-from typing import List, Dict
+import heapq
+from dataclasses import dataclass
+from typing import List, Dict, Iterable, Optional, Set, Tuple
 
-from sortedcontainers import SortedDict
+from sortedcontainers import SortedDict, SortedList
 
 from src.types.coin import Coin
 from src.types.mempool_item import MempoolItem
@@ -8,15 +10,59 @@ from src.types.sized_bytes import bytes32
 from src.util.ints import uint32, uint64
 from src.types.header import Header
 
+# The key of an item in sorted_spends: the fee rate of the item and its descendants, and the
+# opposite of the order in which it was added. Of the items with the same fee rate, the last one
+# added is evicted first, and the first one added is included in a block first.
+SortKey = Tuple[float, int]
+
+
+@dataclass
+class MempoolPackage:
+    """
+    The place of an item in the dependency graph of a mempool: the items whose additions it
+    spends, the items which spend its additions, and the total fee, cost and number of items of
+    its ancestors and of its descendants, both including the item itself.
+    """
+
+    parents: Set[bytes32]
+    children: Set[bytes32]
+    added_count: int
+    ancestor_fee: int
+    ancestor_cost: int
+    ancestor_count: int
+    descendant_fee: int
+    descendant_cost: int
+    descendant_count: int
+
 
 class Mempool:
+    """
+    The view of the mempool from one tip: the items which are valid on top of it, indexed by
+    fee rate, and the coins they add and remove. The items are shared between the views of the
+    tips, see MempoolManager.items.
+
+    An item can spend the additions of other items, so the items form a graph, where a package
+    is an item with its ancestors or with its descendants. Items are evicted with their
+    descendants, from the lowest fee rate of the package down, and are included in a block with
+    their ancestors, from the highest fee rate of the package down.
+    """
+
     header: Header
     spends: Dict[bytes32, MempoolItem]
+    # SortKey -> MempoolItem, from the lowest fee rate of the item and its descendants up
     sorted_spends: SortedDict
+    sort_keys: Dict[bytes32, SortKey]
+    # SortKey of the fee rate of the item and its ancestors -> MempoolItem. The ancestors of an
+    # item do not change, since the descendants of an item are removed with it
+    sorted_packages: SortedDict
+    # The costs of the items, to stop filling a block when no item fits anymore
+    sorted_costs: SortedList
     additions: Dict[bytes32, MempoolItem]
     removals: Dict[bytes32, MempoolItem]
+    packages: Dict[bytes32, MempoolPackage]
     min_fee: uint64
     size: uint32
+    added_count: int
 
     # if new min fee is added
     @staticmethod
@@ -26,30 +72,142 @@ class Mempool:
         self.spends = {}
         self.additions = {}
         self.removals = {}
+        self.packages = {}
         self.min_fee = uint64(0)
         self.sorted_spends = SortedDict()
+        self.sort_keys = {}
+        self.sorted_packages = SortedDict()
+        self.sorted_costs = SortedList()
         self.size = size
+        self.added_count = 0
         return self
 
     def get_min_fee_rate(self) -> float:
         if self.at_full_capacity():
-            fee_per_cost, val = self.sorted_spends.peekitem(index=0)
+            (fee_per_cost, _), val = self.sorted_spends.peekitem(index=0)
             return fee_per_cost
         else:
             return 0
 
-    def remove_spend(self, item: MempoolItem):
-        removals: List[Coin] = item.spend_bundle.removals()
-        additions: List[Coin] = item.spend_bundle.additions()
-        for rem in removals:
-            del self.removals[rem.name()]
-        for add in additions:
+    def get_addition(self, name: bytes32) -> Optional[Coin]:
+        """
+        Returns the coin with this name if it is added by an item of the mempool.
+        """
+        item = self.additions.get(name)
+        if item is None:
+            return None
+        for coin in item.additions:
+            if coin.name() == name:
+                return coin
+        return None
+
+    def get_parents(self, removal_names: Iterable[bytes32]) -> Set[bytes32]:
+        """
+        Returns the names of the items which add the coins of removal_names.
+        """
+        return {
+            self.additions[name].name
+            for name in removal_names
+            if name in self.additions
+        }
+
+    def get_ancestors(self, names: Iterable[bytes32]) -> Set[bytes32]:
+        """
+        Returns the names of the items, and of all the items whose additions they spend,
+        directly or not.
+        """
+        ancestors: Set[bytes32] = set()
+        stack: List[bytes32] = list(names)
+        while len(stack) > 0:
+            name = stack.pop()
+            if name not in ancestors:
+                ancestors.add(name)
+                stack.extend(self.packages[name].parents)
+        return ancestors
+
+    def get_descendants(self, names: Iterable[bytes32]) -> Set[bytes32]:
+        """
+        Returns the names of the items, and of all the items which spend their additions,
+        directly or not.
+        """
+        descendants: Set[bytes32] = set()
+        stack: List[bytes32] = list(names)
+        while len(stack) > 0:
+            name = stack.pop()
+            if name not in descendants:
+                descendants.add(name)
+                stack.extend(self.packages[name].children)
+        return descendants
+
+    def remove_spend(self, item: MempoolItem) -> List[MempoolItem]:
+        """
+        Removes the item and its descendants, which spend coins that do not exist without it.
+        Returns the removed items, descendants first.
+        """
+        removed: List[MempoolItem] = []
+        for name in self._descendants_first(item.name):
+            removed.append(self.spends[name])
+            self._remove_item(self.spends[name])
+        return removed
+
+    def _descendants_first(self, name: bytes32) -> List[bytes32]:
+        """
+        Returns the item and its descendants, each after all of its own descendants.
+        """
+        order: List[bytes32] = []
+        visited: Set[bytes32] = set()
+        stack: List[Tuple[bytes32, bool]] = [(name, False)]
+        while len(stack) > 0:
+            name, expanded = stack.pop()
+            if expanded:
+                order.append(name)
+                continue
+            if name in visited:
+                continue
+            visited.add(name)
+            stack.append((name, True))
+            for child in self.packages[name].children:
+                if child not in visited:
+                    stack.append((child, False))
+        return order
+
+    def _remove_item(self, item: MempoolItem):
+        """
+        Removes an item which has no descendants left.
+        """
+        package = self.packages.pop(item.name)
+        assert len(package.children) == 0
+        for name in self.get_ancestors(package.parents):
+            ancestor = self.packages[name]
+            ancestor.descendant_fee -= item.fee
+            ancestor.descendant_cost -= item.cost
+            ancestor.descendant_count -= 1
+            self._update_sort_key(name)
+        for name in package.parents:
+            self.packages[name].children.discard(item.name)
+
+        for name in item.removal_names:
+            del self.removals[name]
+        for add in item.additions:
             del self.additions[add.name()]
         del self.spends[item.name]
-        del self.sorted_spends[item.fee_per_cost][item.name]
-        dic = self.sorted_spends[item.fee_per_cost]
-        if len(dic.values()) == 0:
-            del self.sorted_spends[item.fee_per_cost]
+        del self.sorted_spends[self.sort_keys.pop(item.name)]
+        del self.sorted_packages[self._package_key(package)]
+        self.sorted_costs.remove(item.cost)
+
+    @staticmethod
+    def _package_key(package: MempoolPackage) -> SortKey:
+        return (package.ancestor_fee / package.ancestor_cost, -package.added_count)
+
+    def _update_sort_key(self, name: bytes32):
+        package = self.packages[name]
+        item = self.sorted_spends.pop(self.sort_keys[name])
+        sort_key: SortKey = (
+            package.descendant_fee / package.descendant_cost,
+            -package.added_count,
+        )
+        self.sort_keys[name] = sort_key
+        self.sorted_spends[sort_key] = item
 
     def add_to_pool(
         self,
@@ -57,25 +215,153 @@ class Mempool:
         additions: List[Coin],
         removals_dic: Dict[bytes32, Coin],
     ):
+        parents = self.get_parents(removals_dic.keys())
+        ancestors = self.get_ancestors(parents)
         if self.at_full_capacity():
-            # Val is Dict[hash, MempoolItem]
-            fee_per_cost, val = self.sorted_spends.peekitem(index=0)
-            to_remove = list(val.values())[0]
-            self.remove_spend(to_remove)
+            self._evict(ancestors)
 
         self.spends[item.name] = item
+        self.added_count += 1
+        package = MempoolPackage(
+            parents,
+            set(),
+            self.added_count,
+            item.fee + sum(self.spends[name].fee for name in ancestors),
+            item.cost + sum(self.spends[name].cost for name in ancestors),
+            len(ancestors) + 1,
+            item.fee,
+            item.cost,
+            1,
+        )
+        self.packages[item.name] = package
+        for name in parents:
+            self.packages[name].children.add(item.name)
+        for name in ancestors:
+            ancestor = self.packages[name]
+            ancestor.descendant_fee += item.fee
+            ancestor.descendant_cost += item.cost
+            ancestor.descendant_count += 1
+            self._update_sort_key(name)
 
-        # sorted_spends is Dict[float, Dict[bytes32, MempoolItem]]
-        if item.fee_per_cost in self.sorted_spends:
-            self.sorted_spends[item.fee_per_cost][item.name] = item
-        else:
-            self.sorted_spends[item.fee_per_cost] = {}
-            self.sorted_spends[item.fee_per_cost][item.name] = item
+        sort_key: SortKey = (item.fee_per_cost, -self.added_count)
+        self.sort_keys[item.name] = sort_key
+        self.sorted_spends[sort_key] = item
+        self.sorted_packages[self._package_key(package)] = item
+        self.sorted_costs.add(item.cost)
 
         for add in additions:
             self.additions[add.name()] = item
         for key in removals_dic.keys():
             self.removals[key] = item
 
+    def get_eviction_candidate(
+        self, protected: Set[bytes32]
+    ) -> Optional[Tuple[SortKey, MempoolItem]]:
+        """
+        Returns the item which is evicted to add an item whose ancestors are protected, with its
+        sort key: the item with the lowest fee rate of the item and its descendants, which is not
+        protected. Returns None if all the items are protected.
+        """
+        for sort_key, item in self.sorted_spends.items():
+            if item.name not in protected:
+                return sort_key, item
+        return None
+
+    def _evict(self, protected: Set[bytes32]):
+        """
+        Removes the eviction candidate and its descendants. The caller checks that there is one,
+        so that the mempool does not grow over its size.
+        """
+        candidate = self.get_eviction_candidate(protected)
+        assert candidate is not None
+        self.remove_spend(candidate[1])
+
     def at_full_capacity(self) -> bool:
         return len(self.spends.keys()) >= self.size
+
+    def get_items_for_block(self, max_cost: int) -> List[MempoolItem]:
+        """
+        Returns the items to include in a block of at most max_cost, greedily from the highest
+        fee rate of the item and its ancestors which are not included yet down, each after its
+        ancestors. Packages which do not fit are skipped, and the search stops as soon as the
+        remaining cost is less than the cost of the cheapest item.
+        """
+        items: List[MempoolItem] = []
+        if len(self.sorted_costs) == 0:
+            return items
+        min_cost = self.sorted_costs[0]
+        remaining = max_cost
+
+        included: Set[bytes32] = set()
+        # The fee and cost of the ancestors which are not included yet, for the items with some
+        # included ancestors, which are taken from modified instead of sorted_packages
+        package_fees: Dict[bytes32, Tuple[int, int]] = {}
+        modified: List[Tuple[float, int, bytes32]] = []
+        keys = reversed(self.sorted_packages)
+        key: Optional[SortKey] = next(keys, None)
+        while remaining >= min_cost:
+            while len(modified) > 0 and (
+                modified[0][2] in included
+                or -modified[0][0]
+                != package_fees[modified[0][2]][0] / package_fees[modified[0][2]][1]
+            ):
+                # Included, or pushed again when more ancestors were included
+                heapq.heappop(modified)
+            while key is not None and (
+                self.sorted_packages[key].name in included
+                or self.sorted_packages[key].name in package_fees
+            ):
+                key = next(keys, None)
+
+            if len(modified) > 0 and (
+                key is None or (-modified[0][0], -modified[0][1]) > key
+            ):
+                name = heapq.heappop(modified)[2]
+                fee, cost = package_fees[name]
+            elif key is not None:
+                name = self.sorted_packages[key].name
+                package = self.packages[name]
+                fee, cost = package.ancestor_fee, package.ancestor_cost
+                key = next(keys, None)
+            else:
+                break
+            if cost > remaining:
+                continue
+
+            to_include = sorted(
+                self.get_ancestors([name]) - included,
+                key=lambda n: self.packages[n].added_count,
+            )
+            for ancestor_name in to_include:
+                ancestor = self.spends[ancestor_name]
+                included.add(ancestor_name)
+                items.append(ancestor)
+                remaining -= ancestor.cost
+            updated: Set[bytes32] = set()
+            for ancestor_name in to_include:
+                ancestor = self.spends[ancestor_name]
+                for descendant in self.get_descendants(
+                    self.packages[ancestor_name].children
+                ):
+                    if descendant in included:
+                        continue
+                    descendant_package = self.packages[descendant]
+                    fee, cost = package_fees.get(
+                        descendant,
+                        (
+                            descendant_package.ancestor_fee,
+                            descendant_package.ancestor_cost,
+                        ),
+                    )
+                    package_fees[descendant] = (
+                        fee - ancestor.fee,
+                        cost - ancestor.cost,
+                    )
+                    updated.add(descendant)
+            for descendant in updated:
+                fee, cost = package_fees[descendant]
+                heapq.heappush(
+                    modified,
+                    (-fee / cost, self.packages[descendant].added_count, descendant),
+                )
+        return items
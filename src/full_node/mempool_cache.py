@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.types.BLSSignature import BLSPublicKey, BLSSignature
+from src.types.coin import Coin
+from src.types.name_puzzle_condition import NPC
+from src.types.sized_bytes import bytes32
+from src.util.errors import Err
+from src.util.hash import std_hash
+from src.util.ints import uint64
+from src.util.npc_cache import npc_list_from_bytes, npc_list_to_bytes
+
+"""
+The mempool receives the same spend bundles many times: they are retried from the potential
+transactions, sent again by peers after they were evicted, and added again after a reorg. Running
+a bundle and verifying its aggregated signature are by far the most expensive parts of adding it,
+and neither depends on the tip, so their results are cached.
+"""
+
+VALIDATION_CACHE_SIZE = 10000
+SIGNATURE_CACHE_SIZE = 50000
+
+# The error of the checks which do not depend on the tip, or None and the NPC list, cost,
+# additions, removal names, and hash key pairs which the aggregated signature must sign
+BundleValidation = Tuple[
+    Optional[Err],
+    List[NPC],
+    uint64,
+    List[Coin],
+    List[bytes32],
+    List[BLSSignature.PkMessagePair],
+]
+
+# A BundleValidation made of builtin types, which is returned from the process pool
+SerializedValidation = Tuple[
+    Optional[Err], bytes, int, List[bytes], List[bytes], List[Tuple[bytes, bytes]]
+]
+
+
+def serialize_validation(validation: BundleValidation) -> SerializedValidation:
+    error, npc_list, cost, additions, removal_names, hash_key_pairs = validation
+    return (
+        error,
+        npc_list_to_bytes(npc_list),
+        int(cost),
+        [bytes(coin) for coin in additions],
+        [bytes(name) for name in removal_names],
+        [(bytes(p.public_key), bytes(p.message_hash)) for p in hash_key_pairs],
+    )
+
+
+def deserialize_validation(serialized: SerializedValidation) -> BundleValidation:
+    error, npc_list_bytes, cost, additions, removal_names, hash_key_pairs = serialized
+    return (
+        error,
+        npc_list_from_bytes(npc_list_bytes),
+        uint64(cost),
+        [Coin.from_bytes(coin) for coin in additions],
+        [bytes32(name) for name in removal_names],
+        [
+            BLSSignature.PkMessagePair(BLSPublicKey(pk), bytes32(message_hash))
+            for pk, message_hash in hash_key_pairs
+        ],
+    )
+
+
+class LRUCache:
+    """
+    A bounded cache which evicts the least recently used entries.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def __contains__(self, key: bytes32) -> bool:
+        return key in self.cache
+
+    def get(self, key: bytes32) -> Optional[Any]:
+        value = self.cache.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return value
+
+    def put(self, key: bytes32, value: Any) -> None:
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"size": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+
+class SignatureCache(LRUCache):
+    """
+    The results of aggregated signature verifications, keyed by the hash of the signature and of
+    the public key and message pairs, so a signature is verified once however many times the same
+    bundle is added.
+    """
+
+    @staticmethod
+    def key(
+        signature: BLSSignature, hash_key_pairs: List[BLSSignature.PkMessagePair],
+    ) -> bytes32:
+        return std_hash(
+            bytes(signature) + b"".join(bytes(pair) for pair in hash_key_pairs)
+        )
+
+    def validate(
+        self, signature: BLSSignature, hash_key_pairs: List[BLSSignature.PkMessagePair],
+    ) -> bool:
+        key = self.key(signature, hash_key_pairs)
+        valid: Optional[bool] = self.get(key)
+        if valid is None:
+            valid = signature.validate(hash_key_pairs)
+            self.put(key, valid)
+        return valid
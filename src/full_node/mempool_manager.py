@@ -1,4 +1,5 @@
 import collections
+import heapq
 import sys
 from typing import Dict, Optional, Tuple, List, Set
 import logging
@@ -16,7 +17,16 @@ from src.types.spend_bundle import SpendBundle
 from src.types.coin_record import CoinRecord
 from src.types.header import Header
 from src.types.mempool_item import MempoolItem
+from src.types.name_puzzle_condition import NPC
 from src.full_node.mempool import Mempool
+from src.full_node.mempool_cache import (
+    SIGNATURE_CACHE_SIZE,
+    VALIDATION_CACHE_SIZE,
+    BundleValidation,
+    LRUCache,
+    SignatureCache,
+)
+from src.types.BLSSignature import BLSSignature
 from src.types.sized_bytes import bytes32
 from src.full_node.coin_store import CoinStore
 from src.util.errors import Err
@@ -31,6 +41,48 @@ from sortedcontainers import SortedDict
 log = logging.getLogger(__name__)
 
 
+def validate_spend_bundle(constants: Dict, new_spend: SpendBundle) -> BundleValidation:
+    """
+    Runs spendbundle, and does the checks which do not depend on the tip. The TransactionQueue
+    runs it in the process pool.
+    """
+    # Calculate the cost and fees
+    program = best_solution_program(new_spend)
+    # npc contains names of the coins removed, puzzle_hashes and their spend conditions
+    fail_reason, npc_list, cost = calculate_cost_of_program(program)
+    if fail_reason:
+        return fail_reason, [], uint64(0), [], [], []
+
+    # build removal list
+    removal_names: List[bytes32] = new_spend.removal_names()
+    additions: List[Coin] = new_spend.additions()
+
+    # Check additions for max coin amount
+    for coin in additions:
+        if coin.amount >= uint64.from_bytes(constants["MAX_COIN_AMOUNT"]):
+            return Err.COIN_AMOUNT_EXCEEDS_MAXIMUM, [], uint64(0), [], [], []
+
+    # Check for duplicate outputs
+    addition_counter = collections.Counter(_.name() for _ in additions)
+    for k, v in addition_counter.items():
+        if v > 1:
+            return Err.DUPLICATE_OUTPUT, [], uint64(0), [], [], []
+
+    # Check for duplicate inputs
+    removal_counter = collections.Counter(name for name in removal_names)
+    for k, v in removal_counter.items():
+        if v > 1:
+            return Err.DOUBLE_SPEND, [], uint64(0), [], [], []
+
+    # Create hash_key list for aggsig check
+    hash_key_pairs: List[BLSSignature.PkMessagePair] = []
+    for npc in npc_list:
+        hash_key_pairs.extend(
+            hash_key_pairs_for_conditions_dict(npc.condition_dict, npc.coin_name)
+        )
+    return None, npc_list, cost, additions, removal_names, hash_key_pairs
+
+
 class MempoolManager:
     def __init__(self, coin_store: CoinStore, override_constants: Dict = {}):
         # Allow passing in custom overrides
@@ -44,6 +96,12 @@ class MempoolManager:
         self.seen_bundle_hashes: Dict[bytes32, bytes32] = {}
         # Mempool for each tip
         self.mempools: Dict[bytes32, Mempool] = {}
+        # The items in the mempool of any tip, which are validated only once, and shared by the
+        # mempools. Items which were removed from every mempool are dropped at the next new_tips
+        self.items: Dict[bytes32, MempoolItem] = {}
+        # Results of running spend bundles and of verifying their signatures
+        self.validation_cache = LRUCache(VALIDATION_CACHE_SIZE)
+        self.signature_cache = SignatureCache(SIGNATURE_CACHE_SIZE)
 
         # old_mempools will contain transactions that were removed in the last 10 blocks
         self.old_mempools: SortedDict[uint32, Dict[bytes32, MempoolItem]] = SortedDict()
@@ -58,6 +116,9 @@ class MempoolManager:
         self.potential_cache_size = 300
         self.seen_cache_size = 10000
         self.coinbase_freeze = self.constants["COINBASE_FREEZE_PERIOD"]
+        # Limits of the number of items of a package, including the item itself
+        self.max_ancestors = self.constants["MEMPOOL_MAX_ANCESTORS"]
+        self.max_descendants = self.constants["MEMPOOL_MAX_DESCENDANTS"]
 
     async def create_bundle_for_tip(self, header: Header) -> Optional[SpendBundle]:
         """
@@ -65,15 +126,12 @@ class MempoolManager:
         """
         if header.header_hash in self.mempools:
             mempool: Mempool = self.mempools[header.header_hash]
-            cost_sum = 0
-            spend_bundles: List[SpendBundle] = []
-            for dic in mempool.sorted_spends.values():
-                for item in dic.values():
-                    if item.cost + cost_sum <= self.constants["MAX_BLOCK_COST_CLVM"]:
-                        spend_bundles.append(item.spend_bundle)
-                        cost_sum += item.cost
-                    else:
-                        break
+            spend_bundles: List[SpendBundle] = [
+                item.spend_bundle
+                for item in mempool.get_items_for_block(
+                    self.constants["MAX_BLOCK_COST_CLVM"]
+                )
+            ]
             if len(spend_bundles) > 0:
                 block_bundle = SpendBundle.aggregate(spend_bundles)
                 return block_bundle
@@ -122,59 +180,62 @@ class MempoolManager:
         self.seen_bundle_hashes[new_spend.name()] = new_spend.name()
         self.maybe_pop_seen()
 
-        # Calculate the cost and fees
-        program = best_solution_program(new_spend)
-        # npc contains names of the coins removed, puzzle_hashes and their spend conditions
-        fail_reason, npc_list, cost = calculate_cost_of_program(program)
-        if fail_reason:
-            return None, MempoolInclusionStatus.FAILED, fail_reason
-
-        # build removal list
-        removal_names: List[bytes32] = new_spend.removal_names()
+        targets: List[Mempool]
+        if to_pool is not None:
+            targets = [to_pool]
+        else:
+            targets = list(self.mempools.values())
+        return await self._add_spendbundle(
+            new_spend, targets, self.items.get(new_spend.name())
+        )
+
+    async def _add_spendbundle(
+        self,
+        new_spend: SpendBundle,
+        targets: List[Mempool],
+        item: Optional[MempoolItem],
+        coin_records: Optional[Dict[bytes32, CoinRecord]] = None,
+    ) -> Tuple[Optional[uint64], MempoolInclusionStatus, Optional[Err]]:
+        """
+        Adds spendbundle to each of the targets where it is valid. If item is the already
+        validated item of the spendbundle, only the checks which depend on the tip of each target
+        (coins, conflicts, capacity, and height and age conditions) are done. coin_records can
+        contain the records of the removals, which are then not looked up.
+        """
+        npc_list: List[NPC]
+        cost: uint64
+        additions: List[Coin]
+        removal_names: List[bytes32]
+        hash_key_pairs: List[BLSSignature.PkMessagePair] = []
+        if item is not None:
+            npc_list, cost = item.npc_list, item.cost
+            additions, removal_names = item.additions, item.removal_names
+        else:
+            (
+                fail_reason,
+                npc_list,
+                cost,
+                additions,
+                removal_names,
+                hash_key_pairs,
+            ) = self.get_validation(new_spend)
+            if fail_reason:
+                return None, MempoolInclusionStatus.FAILED, fail_reason
 
-        additions = new_spend.additions()
         additions_dict: Dict[bytes32, Coin] = {}
+        addition_amount = uint64(0)
         for add in additions:
             additions_dict[add.name()] = add
-
-        addition_amount = uint64(0)
-
-        # Check additions for max coin amount
-        for coin in additions:
-            if coin.amount >= uint64.from_bytes(self.constants["MAX_COIN_AMOUNT"]):
-                return (
-                    None,
-                    MempoolInclusionStatus.FAILED,
-                    Err.COIN_AMOUNT_EXCEEDS_MAXIMUM,
-                )
-            addition_amount = uint64(addition_amount + coin.amount)
-
-        # Check for duplicate outputs
-        addition_counter = collections.Counter(_.name() for _ in additions)
-        for k, v in addition_counter.items():
-            if v > 1:
-                return None, MempoolInclusionStatus.FAILED, Err.DUPLICATE_OUTPUT
-
-        # Check for duplicate inputs
-        removal_counter = collections.Counter(name for name in removal_names)
-        for k, v in removal_counter.items():
-            if v > 1:
-                return None, MempoolInclusionStatus.FAILED, Err.DOUBLE_SPEND
+            addition_amount = uint64(addition_amount + add.amount)
 
         # Spend might be valid for one pool but not for other
         added_count = 0
         errors: List[Err] = []
-        targets: List[Mempool]
 
         # If the transaction is added to potential set (to be retried), this is set.
         added_to_potential: bool = False
         potential_error: Optional[Err] = None
 
-        if to_pool is not None:
-            targets = [to_pool]
-        else:
-            targets = list(self.mempools.values())
-
         for pool in targets:
             # Skip if already added
             if new_spend.name() in pool.spends:
@@ -186,15 +247,22 @@ class MempoolManager:
 
             unknown_unspent_error: bool = False
             removal_amount = uint64(0)
-            for name in removal_names:
-                removal_record = await self.coin_store.get_coin_record(
-                    name, pool.header
+            if coin_records is None:
+                pool_coin_records = await self.coin_store.get_coin_records(
+                    removal_names, pool.header
                 )
-                if removal_record is None and name not in additions_dict:
-                    unknown_unspent_error = True
-                    break
-                elif name in additions_dict:
-                    removal_coin = additions_dict[name]
+            else:
+                pool_coin_records = coin_records
+            for name in removal_names:
+                removal_record = pool_coin_records.get(name)
+                if removal_record is None:
+                    # The coin is added by the bundle itself, or by an item of the pool
+                    removal_coin: Optional[Coin] = additions_dict.get(name)
+                    if removal_coin is None:
+                        removal_coin = pool.get_addition(name)
+                    if removal_coin is None:
+                        unknown_unspent_error = True
+                        break
                     removal_record = CoinRecord(
                         removal_coin,
                         uint32(pool.header.height + 1),
@@ -203,7 +271,6 @@ class MempoolManager:
                         False,
                     )
 
-                assert removal_record is not None
                 removal_amount = uint64(removal_amount + removal_record.coin.amount)
                 removal_record_dict[name] = removal_record
                 removal_coin_dict[name] = removal_record.coin
@@ -212,41 +279,41 @@ class MempoolManager:
                 errors.append(Err.UNKNOWN_UNSPENT)
                 continue
 
-            if addition_amount > removal_amount:
-                return None, MempoolInclusionStatus.FAILED, Err.MINTING_COIN
+            if item is not None:
+                fees: int = item.fee
+                fees_per_cost: float = item.fee_per_cost
+            else:
+                if addition_amount > removal_amount:
+                    return None, MempoolInclusionStatus.FAILED, Err.MINTING_COIN
 
-            fees = removal_amount - addition_amount
-            assert_fee_sum: uint64 = uint64(0)
+                fees = removal_amount - addition_amount
+                assert_fee_sum: uint64 = uint64(0)
 
-            for npc in npc_list:
-                if ConditionOpcode.ASSERT_FEE in npc.condition_dict:
-                    fee_list: List[ConditionVarPair] = npc.condition_dict[
-                        ConditionOpcode.ASSERT_FEE
-                    ]
-                    for cvp in fee_list:
-                        fee = int_from_bytes(cvp.var1)
-                        assert_fee_sum = assert_fee_sum + fee
-
-            if fees < assert_fee_sum:
-                return (
-                    None,
-                    MempoolInclusionStatus.FAILED,
-                    Err.ASSERT_FEE_CONDITION_FAILED,
-                )
+                for npc in npc_list:
+                    if ConditionOpcode.ASSERT_FEE in npc.condition_dict:
+                        fee_list: List[ConditionVarPair] = npc.condition_dict[
+                            ConditionOpcode.ASSERT_FEE
+                        ]
+                        for cvp in fee_list:
+                            fee = int_from_bytes(cvp.var1)
+                            assert_fee_sum = assert_fee_sum + fee
+
+                if fees < assert_fee_sum:
+                    return (
+                        None,
+                        MempoolInclusionStatus.FAILED,
+                        Err.ASSERT_FEE_CONDITION_FAILED,
+                    )
 
-            if cost == 0:
-                return None, MempoolInclusionStatus.FAILED, Err.UNKNOWN
+                if cost == 0:
+                    return None, MempoolInclusionStatus.FAILED, Err.UNKNOWN
 
-            fees_per_cost: float = fees / cost
+                fees_per_cost = fees / cost
 
             # If pool is at capacity check the fee, if not then accept even without the fee
-            if pool.at_full_capacity():
-                if fees == 0:
-                    errors.append(Err.INVALID_FEE_LOW_FEE)
-                    continue
-                if fees_per_cost < pool.get_min_fee_rate():
-                    errors.append(Err.INVALID_FEE_LOW_FEE)
-                    continue
+            if pool.at_full_capacity() and fees == 0:
+                errors.append(Err.INVALID_FEE_LOW_FEE)
+                continue
 
             # Check removals against UnspentDB + DiffStore + Mempool + SpendBundle
             # Use this information later when constructing a block
@@ -260,8 +327,9 @@ class MempoolManager:
                 for conflicting in conflicts:
                     sb: MempoolItem = pool.removals[conflicting.name()]
                     conflicting_pool_items[sb.name] = sb
-                for item in conflicting_pool_items.values():
-                    if item.fee_per_cost >= fees_per_cost:
+                # The descendants of the conflicting items are removed with them
+                for name in pool.get_descendants(conflicting_pool_items.keys()):
+                    if pool.spends[name].fee_per_cost >= fees_per_cost:
                         tmp_error = Err.MEMPOOL_CONFLICT
                         self.add_to_potential_tx_set(new_spend)
                         added_to_potential = True
@@ -275,8 +343,28 @@ class MempoolManager:
                 errors.append(tmp_error)
                 continue
 
-            # Verify conditions, create hash_key list for aggsig check
-            hash_key_pairs = []
+            # The items of the pool whose additions are spent, directly or not
+            ancestors: Set[bytes32] = pool.get_ancestors(
+                pool.get_parents(removal_names)
+            )
+            if any(name in ancestors for name in conflicting_pool_items):
+                errors.append(Err.MEMPOOL_CONFLICT)
+                continue
+            if len(ancestors) + 1 > self.max_ancestors or any(
+                pool.packages[name].descendant_count + 1 > self.max_descendants
+                for name in ancestors
+            ):
+                errors.append(Err.MEMPOOL_PACKAGE_TOO_LARGE)
+                continue
+            if pool.at_full_capacity():
+                # The ancestors are not evicted, so the fee rate is compared to the item which is
+                # evicted instead, and there must be one
+                candidate = pool.get_eviction_candidate(ancestors)
+                if candidate is None or fees_per_cost < candidate[0][0]:
+                    errors.append(Err.INVALID_FEE_LOW_FEE)
+                    continue
+
+            # Verify conditions
             error: Optional[Err] = None
             for npc in npc_list:
                 coin_record: CoinRecord = removal_record_dict[npc.coin_name]
@@ -301,19 +389,29 @@ class MempoolManager:
                         added_to_potential = True
                         potential_error = error
                     break
-
-                hash_key_pairs.extend(
-                    hash_key_pairs_for_conditions_dict(
-                        npc.condition_dict, npc.coin_name
-                    )
-                )
             if error:
                 errors.append(error)
                 continue
 
-            # Verify aggregated signature
-            if not new_spend.aggregated_signature.validate(hash_key_pairs):
-                return None, MempoolInclusionStatus.FAILED, Err.BAD_AGGREGATE_SIGNATURE
+            if item is None:
+                # Verify aggregated signature
+                if not self.signature_cache.validate(
+                    new_spend.aggregated_signature, hash_key_pairs
+                ):
+                    return (
+                        None,
+                        MempoolInclusionStatus.FAILED,
+                        Err.BAD_AGGREGATE_SIGNATURE,
+                    )
+                item = MempoolItem(
+                    new_spend,
+                    fees_per_cost,
+                    uint64(fees),
+                    uint64(cost),
+                    npc_list,
+                    additions,
+                    removal_names,
+                )
 
             # Remove all conflicting Coins and SpendBundles
             if fail_reason:
@@ -321,8 +419,8 @@ class MempoolManager:
                 for mitem in conflicting_pool_items.values():
                     pool.remove_spend(mitem)
 
-            new_item = MempoolItem(new_spend, fees_per_cost, uint64(fees), uint64(cost))
-            pool.add_to_pool(new_item, additions, removal_coin_dict)
+            pool.add_to_pool(item, additions, removal_coin_dict)
+            self.items[item.name] = item
 
             added_count += 1
 
@@ -333,6 +431,18 @@ class MempoolManager:
         else:
             return None, MempoolInclusionStatus.FAILED, errors[0]
 
+    def get_validation(self, new_spend: SpendBundle) -> BundleValidation:
+        """
+        Returns the results of the checks which do not depend on the tip, which are cached.
+        """
+        validation: Optional[BundleValidation] = self.validation_cache.get(
+            new_spend.name()
+        )
+        if validation is None:
+            validation = validate_spend_bundle(self.constants, new_spend)
+            self.validation_cache.put(new_spend.name(), validation)
+        return validation
+
     async def check_removals(
         self, removals: Dict[bytes32, CoinRecord], mempool: Mempool
     ) -> Tuple[Optional[Err], List[Coin]]:
@@ -392,7 +502,9 @@ class MempoolManager:
     async def new_tips(self, new_tips: List[FullBlock]):
         """
         Called when new tips are available, we try to recreate a mempool for each of the new tips.
-        For tip that we already have mempool we don't do anything.
+        For tip that we already have mempool we don't do anything. The items of the current
+        mempools are already validated, so only their coins and conditions are checked against
+        the new tips.
         """
         new_pools: Dict[bytes32, Mempool] = {}
 
@@ -431,6 +543,9 @@ class MempoolManager:
                 )
 
         self.mempools = new_pools
+        self.items = {}
+        for pool in self.mempools.values():
+            self.items.update(pool.spends)
 
     async def create_filter_for_pools(self) -> bytes:
         # Create filter for items in mempools
@@ -488,21 +603,62 @@ class MempoolManager:
             dic_for_height.pop(lowest_h)
 
     async def initialize_pool_from_current_pools(self, pool: Mempool):
-        tried_already: Dict[bytes32, bytes32] = {}
+        items: Dict[bytes32, MempoolItem] = {}
         current_pool: Mempool
         for current_pool in self.mempools.values():
-            for item in current_pool.spends.values():
-                # Don't try to add same mempool item twice
-                if item.name in tried_already:
-                    continue
-                tried_already[item.name] = item.name
-                await self.add_spendbundle(item.spend_bundle, pool)
+            items.update(current_pool.spends)
+        await self.add_items_to_pool(pool, list(items.values()))
 
     async def add_old_spends_to_pool(
         self, pool: Mempool, old_spends: Dict[bytes32, MempoolItem]
     ):
-        for old in old_spends.values():
-            await self.add_spendbundle(old.spend_bundle, pool)
+        await self.add_items_to_pool(pool, list(old_spends.values()))
+
+    async def add_items_to_pool(self, pool: Mempool, items: List[MempoolItem]):
+        """
+        Adds already validated items to pool, from the highest fee rate down, so that the best
+        items are kept when they conflict or the pool is full. An item which spends the
+        additions of other items is added after them. The coins of all the items are looked up
+        at once.
+        """
+        removal_names: List[bytes32] = []
+        added_coins: Set[bytes32] = set()
+        for item in items:
+            removal_names.extend(item.removal_names)
+            added_coins.update(add.name() for add in item.additions)
+        coin_records: Dict[
+            bytes32, CoinRecord
+        ] = await self.coin_store.get_coin_records(removal_names, pool.header)
+
+        # The number of coins of each item which are added by items not tried yet, and the items
+        # which spend each of these coins
+        waiting: Dict[bytes32, int] = {}
+        spenders: Dict[bytes32, List[int]] = {}
+        ready: List[Tuple[float, int]] = []
+        for index, item in enumerate(items):
+            own_additions = {add.name() for add in item.additions}
+            unconfirmed = [
+                name
+                for name in item.removal_names
+                if name in added_coins and name not in own_additions
+            ]
+            waiting[item.name] = len(unconfirmed)
+            for name in unconfirmed:
+                spenders.setdefault(name, []).append(index)
+            if len(unconfirmed) == 0:
+                ready.append((-item.fee_per_cost, index))
+        heapq.heapify(ready)
+
+        while len(ready) > 0:
+            _, index = heapq.heappop(ready)
+            item = items[index]
+            await self._add_spendbundle(item.spend_bundle, [pool], item, coin_records)
+            for add in item.additions:
+                for spender_index in spenders.pop(add.name(), []):
+                    spender = items[spender_index]
+                    waiting[spender.name] -= 1
+                    if waiting[spender.name] == 0:
+                        heapq.heappush(ready, (-spender.fee_per_cost, spender_index))
 
     async def add_potential_spends_to_pool(self, pool: Mempool):
         for tx in self.potential_txs.values():
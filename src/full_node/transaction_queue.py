@@ -0,0 +1,274 @@
+import asyncio
+import concurrent
+import functools
+import logging
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from src.full_node.mempool_cache import (
+    BundleValidation,
+    SerializedValidation,
+    SignatureCache,
+    deserialize_validation,
+    serialize_validation,
+)
+from src.full_node.mempool_manager import MempoolManager, validate_spend_bundle
+from src.types.BLSSignature import BLSPublicKey, BLSSignature
+from src.types.mempool_inclusion_status import MempoolInclusionStatus
+from src.types.sized_bytes import bytes32, bytes96
+from src.types.spend_bundle import SpendBundle
+from src.util.errors import Err
+from src.util.ints import uint64
+
+log = logging.getLogger(__name__)
+
+# The serialized aggregated signature of a bundle, and its public key and message hash pairs
+SignatureJob = Tuple[bytes, List[Tuple[bytes, bytes]]]
+
+AddResult = Tuple[Optional[uint64], MempoolInclusionStatus, Optional[Err]]
+
+# The validation of a bundle, or None and the exception which running it raised
+ValidationResult = Tuple[Optional[SerializedValidation], Optional[str]]
+
+
+def verify_signatures(jobs: List[SignatureJob]) -> List[bool]:
+    """
+    Verifies the aggregated signature of each bundle. Runs in the process pool. The signatures
+    of different bundles are not aggregated together: without a random weight for each bundle,
+    which blspy does not support, invalid signatures could cancel out in the aggregate.
+    """
+    return [
+        BLSSignature(bytes96(signature)).validate(
+            [
+                BLSSignature.PkMessagePair(BLSPublicKey(pk), bytes32(message_hash))
+                for pk, message_hash in pairs
+            ]
+        )
+        for signature, pairs in jobs
+    ]
+
+
+def validate_spend_bundles(
+    constants: Dict, spend_bundles: List[bytes]
+) -> List[ValidationResult]:
+    """
+    Runs the serialized spend bundles, and does the checks which do not depend on the tip. Runs
+    in the process pool. A bundle which raises an exception does not fail the others.
+    """
+    results: List[ValidationResult] = []
+    for spend_bundle in spend_bundles:
+        try:
+            validation = validate_spend_bundle(
+                constants, SpendBundle.from_bytes(spend_bundle)
+            )
+            results.append((serialize_validation(validation), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class TransactionQueue:
+    """
+    Adds the transactions received from peers and wallets to the mempool in batches, so that
+    running them and verifying their signatures does not block the event loop. A batch is
+    collected for up to batch_latency seconds, or until it has batch_size transactions. The
+    bundles of the batch which are not in the validation cache of the mempool are run, and their
+    signatures are verified, in the process pool. They are then added to the mempool in the order
+    they were received, with the results already in the caches. A bundle which raises an
+    exception fails with Err.UNKNOWN, without failing the rest of its batch.
+    """
+
+    def __init__(
+        self,
+        mempool_manager: MempoolManager,
+        lock: asyncio.Lock,
+        executor: Optional[concurrent.futures.Executor],
+        num_workers: int = 1,
+        batch_size: int = 100,
+        batch_latency: float = 0.01,
+    ):
+        self.mempool_manager = mempool_manager
+        self.lock = lock
+        self.executor = executor
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # Set when the queue has enough transactions to complete the batch which is collected
+        self._batch_full = asyncio.Event()
+        self._task: asyncio.Task = asyncio.create_task(self._run())
+
+    async def add_spendbundle(self, spend_bundle: SpendBundle) -> AddResult:
+        """
+        Same as MempoolManager.add_spendbundle, but waits for the batch of spend_bundle.
+        """
+        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        await self.queue.put((spend_bundle, future))
+        if self.queue.qsize() >= self.batch_size - 1:
+            self._batch_full.set()
+        return await future
+
+    def close(self) -> None:
+        self._task.cancel()
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            batch: List[Tuple[SpendBundle, asyncio.Future]] = [await self.queue.get()]
+            if self.queue.qsize() < self.batch_size - 1:
+                self._batch_full.clear()
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.batch_latency)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._add_batch(batch)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                log.error(f"Error adding a batch of {len(batch)} transactions: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _add_batch(self, batch: List[Tuple[SpendBundle, asyncio.Future]]):
+        failed: Set[bytes32] = await self._validate_spend_bundles(
+            [spend_bundle for spend_bundle, _ in batch]
+        )
+
+        signature_cache: SignatureCache = self.mempool_manager.signature_cache
+        keys: List[bytes32] = []
+        jobs: List[SignatureJob] = []
+        for spend_bundle, _ in batch:
+            if spend_bundle.name() in failed:
+                continue
+            try:
+                validation = self.mempool_manager.get_validation(spend_bundle)
+            except Exception as e:
+                log.error(f"Error running transaction {spend_bundle.name()}: {e}")
+                failed.add(spend_bundle.name())
+                continue
+            if validation[0] is not None:
+                continue
+            hash_key_pairs: List[BLSSignature.PkMessagePair] = validation[5]
+            signature = spend_bundle.aggregated_signature
+            key = signature_cache.key(signature, hash_key_pairs)
+            if key in signature_cache or key in keys:
+                continue
+            keys.append(key)
+            jobs.append(
+                (
+                    bytes(signature),
+                    [
+                        (bytes(p.public_key), bytes(p.message_hash))
+                        for p in hash_key_pairs
+                    ],
+                )
+            )
+        for key, valid in zip(keys, await self._run_jobs(verify_signatures, jobs)):
+            signature_cache.put(key, valid)
+
+        for spend_bundle, future in batch:
+            if future.done():
+                # The peer which sent it disconnected
+                continue
+            result: AddResult = (None, MempoolInclusionStatus.FAILED, Err.UNKNOWN)
+            if spend_bundle.name() not in failed:
+                try:
+                    async with self.lock:
+                        result = await self.mempool_manager.add_spendbundle(
+                            spend_bundle
+                        )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.error(f"Error adding transaction {spend_bundle.name()}: {e}")
+            future.set_result(result)
+
+    async def _validate_spend_bundles(
+        self, spend_bundles: List[SpendBundle]
+    ) -> Set[bytes32]:
+        """
+        Runs the bundles which are not in the validation cache, and puts their validations in
+        the cache. Returns the names of the bundles which raised an exception.
+        """
+        validation_cache = self.mempool_manager.validation_cache
+        names: Set[bytes32] = set()
+        to_run: List[SpendBundle] = []
+        for spend_bundle in spend_bundles:
+            name = spend_bundle.name()
+            if name not in names and name not in validation_cache:
+                names.add(name)
+                to_run.append(spend_bundle)
+
+        failed: Set[bytes32] = set()
+        validations: List[Tuple[Optional[BundleValidation], Optional[str]]] = []
+        if self.executor is None:
+            for spend_bundle in to_run:
+                try:
+                    validations.append(
+                        (
+                            validate_spend_bundle(
+                                self.mempool_manager.constants, spend_bundle
+                            ),
+                            None,
+                        )
+                    )
+                except Exception as e:
+                    validations.append((None, f"{type(e).__name__}: {e}"))
+                # Lets the other tasks run between bundles
+                await asyncio.sleep(0)
+        else:
+            validations = [
+                (
+                    None if serialized is None else deserialize_validation(serialized),
+                    error,
+                )
+                for serialized, error in await self._run_jobs(
+                    functools.partial(
+                        validate_spend_bundles, self.mempool_manager.constants
+                    ),
+                    [bytes(spend_bundle) for spend_bundle in to_run],
+                )
+            ]
+        for spend_bundle, (validation, error) in zip(to_run, validations):
+            if validation is None:
+                log.error(f"Error running transaction {spend_bundle.name()}: {error}")
+                failed.add(spend_bundle.name())
+            else:
+                validation_cache.put(spend_bundle.name(), validation)
+        return failed
+
+    async def _run_jobs(self, function: Callable[[List], List], jobs: List) -> List:
+        """
+        Splits the jobs between the workers of the process pool.
+        """
+        if len(jobs) == 0:
+            return []
+        if self.executor is None:
+            return function(jobs)
+        chunk_size = -(-len(jobs) // self.num_workers)
+        chunk_results: List[List] = await asyncio.gather(
+            *[
+                self._run_chunk(function, jobs[i : i + chunk_size])
+                for i in range(0, len(jobs), chunk_size)
+            ]
+        )
+        return [result for chunk_result in chunk_results for result in chunk_result]
+
+    async def _run_chunk(self, function: Callable[[List], List], jobs: List) -> List:
+        """
+        Runs jobs in a worker of the process pool, or in this process if the pool fails.
+        """
+        try:
+            return await asyncio.get_event_loop().run_in_executor(
+                self.executor, function, jobs
+            )
+        except Exception as e:
+            log.warning(f"Running {len(jobs)} jobs in the process pool failed: {e}")
+            return function(jobs)
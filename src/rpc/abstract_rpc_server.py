@@ -10,7 +10,7 @@ import traceback
 from src.types.peer_info import PeerInfo
 from src.util.ints import uint16
 from src.util.byte_types import hexstr_to_bytes
-from src.util.json_util import obj_to_response
+from src.util.json_util import obj_to_streamed_response
 from src.util.ws_message import create_payload, format_response, pong
 
 log = logging.getLogger(__name__)
@@ -64,12 +64,12 @@ class AbstractRpcApiHandler(ABC):
         asyncio.create_task(self._state_changed(change))
 
     def _wrap_http_handler(self, f) -> Callable:
-        async def inner(request) -> aiohttp.web.Response:
+        async def inner(request) -> aiohttp.web.StreamResponse:
             request_data = await request.json()
             res_object = await f(request_data)
             if res_object is None:
                 raise aiohttp.web.HTTPNotFound()
-            return obj_to_response(res_object)
+            return await obj_to_streamed_response(request, res_object)
 
         return inner
 
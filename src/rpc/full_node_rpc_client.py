@@ -1,7 +1,7 @@
 import aiohttp
 import asyncio
 
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from src.util.byte_types import hexstr_to_bytes
 from src.types.full_block import FullBlock
 from src.types.header import Header
@@ -125,6 +125,43 @@ class FullNodeRpcClient:
             for coin in ((await self.fetch("get_unspent_coins", d))["coin_records"])
         ]
 
+    async def get_coin_records_by_puzzle_hashes(
+        self,
+        puzzle_hashes: List[bytes32],
+        header_hash: Optional[bytes32] = None,
+        include_spent_coins: bool = True,
+        start_height: Optional[uint32] = None,
+        end_height: Optional[uint32] = None,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[uint32, bytes32]] = None,
+    ) -> Tuple[List, Optional[Tuple[uint32, bytes32]]]:
+        d: Dict = {
+            "puzzle_hashes": [ph.hex() for ph in puzzle_hashes],
+            "include_spent_coins": include_spent_coins,
+        }
+        if header_hash is not None:
+            d["header_hash"] = header_hash.hex()
+        if start_height is not None:
+            d["start_height"] = start_height
+        if end_height is not None:
+            d["end_height"] = end_height
+        if limit is not None:
+            d["limit"] = limit
+        if start_after is not None:
+            d["start_after"] = [start_after[0], start_after[1].hex()]
+        response = await self.fetch("get_unspent_coins", d)
+        cursor = response["cursor"]
+        return (
+            [CoinRecord.from_json_dict(coin) for coin in response["coin_records"]],
+            None
+            if cursor is None
+            else (uint32(cursor[0]), bytes32(hexstr_to_bytes(cursor[1]))),
+        )
+
+    async def get_coin_cache_stats(self) -> Dict:
+        response = await self.fetch("get_coin_cache_stats", {})
+        return response["coin_cache_stats"]
+
     async def get_heaviest_block_seen(self) -> Header:
         response = await self.fetch("get_heaviest_block_seen", {})
         return Header.from_json_dict(response["tip"])
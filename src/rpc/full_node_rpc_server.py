@@ -1,7 +1,7 @@
 from src.full_node.full_node import FullNode
 from src.util.ints import uint16
 from src.rpc.abstract_rpc_server import AbstractRpcApiHandler, start_rpc_server
-from typing import Callable, List, Optional, Dict
+from typing import Any, Callable, List, Optional, Dict
 
 from aiohttp import web
 
@@ -55,7 +55,9 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
         lca: Header = self.service.blockchain.lca_block
         sync_mode: bool = self.service.sync_store.get_sync_mode()
         difficulty: uint64 = self.service.blockchain.get_next_difficulty(lca)
-        lca_block = await self.service.block_store.get_block(lca.header_hash)
+        lca_block = await self.service.block_store.get_block(
+            lca.header_hash, use_reader=True
+        )
         if lca_block is None:
             return None
         min_iters: uint64 = self.service.blockchain.get_next_min_iters(lca_block)
@@ -114,7 +116,7 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
         header_hash = hexstr_to_bytes(request["header_hash"])
 
         block: Optional[FullBlock] = await self.service.block_store.get_block(
-            header_hash
+            header_hash, use_reader=True
         )
         if block is None:
             return None
@@ -244,7 +246,7 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
         old and up to and including new_block, but not including old_block.
         """
         older_block_parent = await self.service.block_store.get_block(
-            older_block.prev_header_hash
+            older_block.prev_header_hash, use_reader=True
         )
         if older_block_parent is None:
             return None
@@ -266,12 +268,12 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
                 if curr_b_header_hash is None:
                     return None
                 curr_b_block = await self.service.block_store.get_block(
-                    curr_b_header_hash
+                    curr_b_header_hash, use_reader=True
                 )
                 if curr_b_block is None or curr_b_block.proof_of_time is None:
                     return None
                 curr_parent = await self.service.block_store.get_block(
-                    curr_b_block.prev_header_hash
+                    curr_b_block.prev_header_hash, use_reader=True
                 )
                 if curr_parent is None:
                     return None
@@ -303,10 +305,14 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
         newer_block_bytes = hexstr_to_bytes(newer_block_hex)
         older_block_bytes = hexstr_to_bytes(older_block_hex)
 
-        newer_block = await self.service.block_store.get_block(newer_block_bytes)
+        newer_block = await self.service.block_store.get_block(
+            newer_block_bytes, use_reader=True
+        )
         if newer_block is None:
             raise web.HTTPNotFound()
-        older_block = await self.service.block_store.get_block(older_block_bytes)
+        older_block = await self.service.block_store.get_block(
+            older_block_bytes, use_reader=True
+        )
         if older_block is None:
             raise web.HTTPNotFound()
         delta_weight = newer_block.header.data.weight - older_block.header.data.weight
@@ -327,11 +333,20 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
 
     async def get_unspent_coins(self, request: Dict) -> Optional[Dict]:
         """
-        Retrieves the unspent coins for a given puzzlehash.
+        Retrieves the coins for a given puzzlehash, or for a list of puzzlehashes. Spent coins
+        are only excluded if include_spent_coins is false, and start_height and end_height can
+        be used to restrict the results, which are ordered by height and coin name. At most
+        limit records are returned, and the returned cursor, [height, coin name], is passed as
+        start_after to get the next page. It is None if there are no more records.
         """
-        if "puzzle_hash" not in request:
+        if "puzzle_hashes" in request:
+            puzzle_hashes = [
+                bytes32(hexstr_to_bytes(ph)) for ph in request["puzzle_hashes"]
+            ]
+        elif "puzzle_hash" in request:
+            puzzle_hashes = [bytes32(hexstr_to_bytes(request["puzzle_hash"]))]
+        else:
             return None
-        puzzle_hash = hexstr_to_bytes(request["puzzle_hash"])
         header_hash = request.get("header_hash", None)
 
         if header_hash is not None:
@@ -340,11 +355,39 @@ class FullNodeRpcApiHandler(AbstractRpcApiHandler):
         else:
             header = None
 
-        coin_records = await self.service.blockchain.coin_store.get_coin_records_by_puzzle_hash(
-            puzzle_hash, header
+        kwargs: Dict[str, Any] = {}
+        if "include_spent_coins" in request:
+            kwargs["include_spent_coins"] = bool(request["include_spent_coins"])
+        if "start_height" in request:
+            kwargs["start_height"] = uint32(request["start_height"])
+        if "end_height" in request:
+            kwargs["end_height"] = uint32(request["end_height"])
+        if "limit" in request:
+            kwargs["limit"] = int(request["limit"])
+            if kwargs["limit"] < 1:
+                raise web.HTTPBadRequest()
+        if request.get("start_after") is not None:
+            height, name = request["start_after"]
+            kwargs["start_after"] = (uint32(height), bytes32(hexstr_to_bytes(name)))
+        (
+            coin_records,
+            cursor,
+        ) = await self.service.blockchain.coin_store.get_coin_records_by_puzzle_hashes(
+            puzzle_hashes, header, **kwargs
         )
 
-        return {"success": True, "coin_records": coin_records}
+        return {
+            "success": True,
+            "coin_records": coin_records,
+            "cursor": None if cursor is None else [cursor[0], cursor[1].hex()],
+        }
+
+    async def get_coin_cache_stats(self, request: Dict) -> Optional[Dict]:
+        """
+        Returns the size and the hit, miss and eviction counters of the coin record cache.
+        """
+        stats = self.service.coin_store.lca_coin_records.get_stats()
+        return {"success": True, "coin_cache_stats": stats}
 
     async def get_heaviest_block_seen(self, request: Dict) -> Optional[Dict]:
         tips: List[Header] = self.service.blockchain.get_current_tips()
@@ -371,6 +414,7 @@ async def start_full_node_rpc_server(
         "/get_unfinished_block_headers": handler.get_unfinished_block_headers,
         "/get_network_space": handler.get_network_space,
         "/get_unspent_coins": handler.get_unspent_coins,
+        "/get_coin_cache_stats": handler.get_coin_cache_stats,
         "/get_heaviest_block_seen": handler.get_heaviest_block_seen,
     }
     cleanup = await start_rpc_server(handler, rpc_port, routes)
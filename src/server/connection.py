@@ -4,14 +4,23 @@ import time
 from asyncio import StreamReader, StreamWriter
 from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
 
+from src.server.message_codec import (
+    BINARY_CODEC,
+    decode_binary,
+    encode_binary,
+    is_binary,
+)
 from src.server.outbound_message import Message, NodeType, OutboundMessage
 from src.types.peer_info import PeerInfo
 from src.types.sized_bytes import bytes32
 from src.util import cbor
+from src.util.errors import Err, ProtocolError
 from src.util.ints import uint16, uint64
 
 # Each message is prepended with LENGTH_BYTES bytes specifying the length
 LENGTH_BYTES: int = 4
+# Message encodings that we can decode, advertised to peers in the handshake
+SUPPORTED_CODECS: List[str] = [BINARY_CODEC]
 log = logging.getLogger(__name__)
 
 OnConnectFunc = Optional[Callable[[], AsyncGenerator[OutboundMessage, None]]]
@@ -47,6 +56,10 @@ class Connection:
         self.node_id = None
         self.on_connect = on_connect
         self.log = log
+        # Codecs advertised by the peer in its handshake, and whether we use the binary codec
+        # for sending. This is decided after the handshake, until then everything is CBOR.
+        self.peer_codecs: List[str] = []
+        self.binary_codec = False
 
         # Connection metrics
         self.creation_time = time.time()
@@ -73,7 +86,15 @@ class Connection:
         return self.writer.is_closing()
 
     async def send(self, message: Message):
-        encoded: bytes = cbor.dumps({"f": message.function, "d": message.data})
+        encoded: Optional[bytes] = None
+        if self.binary_codec:
+            encoded = encode_binary(message)
+        if encoded is None:
+            to_encode: Dict[str, Any] = {"f": message.function, "d": message.data}
+            if message.function == "handshake":
+                # Older peers ignore this key, so they keep receiving CBOR
+                to_encode["c"] = SUPPORTED_CODECS
+            encoded = cbor.dumps(to_encode)
         assert len(encoded) < (2 ** (LENGTH_BYTES * 8))
         self.writer.write(len(encoded).to_bytes(LENGTH_BYTES, "big") + encoded)
         await self.writer.drain()
@@ -83,9 +104,22 @@ class Connection:
         size = await self.reader.readexactly(LENGTH_BYTES)
         full_message_length = int.from_bytes(size, "big")
         full_message: bytes = await self.reader.readexactly(full_message_length)
-        full_message_loaded: Any = cbor.loads(full_message)
         self.bytes_read += LENGTH_BYTES + full_message_length
         self.last_message_time = time.time()
+        if is_binary(full_message):
+            if not self.binary_codec:
+                # The peer can only use the binary codec once both sides advertised it in the
+                # handshake
+                raise ProtocolError(Err.INVALID_PROTOCOL_MESSAGE, [full_message[:2]])
+            return decode_binary(full_message)
+        full_message_loaded: Any = cbor.loads(full_message)
+        if full_message_loaded["f"] == "handshake":
+            peer_codecs: Any = full_message_loaded.get("c", [])
+            if not isinstance(peer_codecs, list) or not all(
+                isinstance(codec, str) for codec in peer_codecs
+            ):
+                raise ProtocolError(Err.INVALID_HANDSHAKE, [peer_codecs])
+            self.peer_codecs = peer_codecs
         return Message(full_message_loaded["f"], full_message_loaded["d"])
 
     def close(self):
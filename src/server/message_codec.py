@@ -0,0 +1,97 @@
+import io
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, get_type_hints
+
+from src.protocols import full_node_protocol, wallet_protocol
+from src.server.outbound_message import Message
+from src.util.byte_types import BlobReader
+from src.util.errors import Err, ProtocolError
+from src.util.streamable import (
+    function_to_parse_one_item,
+    function_to_stream_one_item,
+)
+
+"""
+Native encoding of peer messages, which is used instead of CBOR between peers that both
+advertise BINARY_CODEC in their handshake. Older peers do not advertise it, so they only
+ever receive CBOR.
+
+A binary message is BINARY_MESSAGE_MARKER, a one byte message id, and then the fields of
+the message, serialized in the same format as the fields of a Streamable. This avoids
+converting each field to bytes for CBOR, and then parsing and type checking them again
+on the receiving side. A CBOR message is always a map, so it never starts with the marker.
+Messages which are not in BINARY_MESSAGES are always sent as CBOR.
+"""
+
+BINARY_CODEC = "streamable"
+BINARY_MESSAGE_MARKER = 0x00
+
+# The position in this list is the message id, so new messages must be added at the end
+BINARY_MESSAGES: List[Tuple[str, Type]] = [
+    ("respond_block", full_node_protocol.RespondBlock),
+    ("respond_unfinished_block", full_node_protocol.RespondUnfinishedBlock),
+    ("respond_header_block", full_node_protocol.RespondHeaderBlock),
+    ("respond_transaction", full_node_protocol.RespondTransaction),
+    ("all_header_hashes", full_node_protocol.AllHeaderHashes),
+    ("new_tip", full_node_protocol.NewTip),
+    ("respond_all_header_hashes_after", wallet_protocol.RespondAllHeaderHashesAfter),
+    ("respond_header", wallet_protocol.RespondHeader),
+]
+
+FieldPlan = Tuple[Tuple[str, Callable, Callable], ...]
+
+
+def fields_for_message(cls: Type) -> FieldPlan:
+    return tuple(
+        (
+            f_name,
+            function_to_parse_one_item(f_type),
+            function_to_stream_one_item(f_type),
+        )
+        for f_name, f_type in get_type_hints(cls).items()
+    )
+
+
+_encoders: Dict[str, Tuple[bytes, Type, FieldPlan]] = {}
+_decoders: List[Tuple[str, Type, FieldPlan]] = []
+for message_id, (function, cls) in enumerate(BINARY_MESSAGES):
+    plan = fields_for_message(cls)
+    _encoders[function] = (bytes([BINARY_MESSAGE_MARKER, message_id]), cls, plan)
+    _decoders.append((function, cls, plan))
+
+
+def encode_binary(message: Message) -> Optional[bytes]:
+    """
+    Returns the binary encoding of the message, or None if the message can only be sent
+    as CBOR.
+    """
+    encoder = _encoders.get(message.function)
+    if encoder is None:
+        return None
+    prefix, cls, plan = encoder
+    if type(message.data) is not cls:
+        return None
+    f = io.BytesIO()
+    f.write(prefix)
+    for f_name, _, stream_f in plan:
+        stream_f(getattr(message.data, f_name), f)
+    return f.getvalue()
+
+
+def is_binary(encoded: bytes) -> bool:
+    return len(encoded) > 0 and encoded[0] == BINARY_MESSAGE_MARKER
+
+
+def decode_binary(encoded: bytes) -> Message:
+    if len(encoded) < 2 or encoded[1] >= len(_decoders):
+        raise ProtocolError(Err.INVALID_PROTOCOL_MESSAGE, [encoded[:2]])
+    function, cls, plan = _decoders[encoded[1]]
+    f = BlobReader(encoded)
+    f.offset = 2
+    try:
+        values: List[Any] = [parse_f(f) for _, parse_f, _ in plan]
+    except Exception as e:
+        raise ProtocolError(Err.INVALID_PROTOCOL_MESSAGE, [function, str(e)])
+    if f.offset != len(encoded):
+        raise ProtocolError(Err.INVALID_PROTOCOL_MESSAGE, [function])
+    # Parsed values always have the exact field types, so type checking is skipped
+    return Message(function, cls.construct_trusted(*values))
@@ -15,6 +15,7 @@ from src.protocols.shared_protocol import (
     protocol_version,
 )
 from src.server.connection import Connection, OnConnectFunc, PeerConnections
+from src.server.message_codec import BINARY_CODEC
 from src.server.outbound_message import Delivery, Message, NodeType, OutboundMessage
 from src.types.sized_bytes import bytes32
 from src.util import partial_func
@@ -108,7 +109,7 @@ async def initialize_pipeline(
     )
 
     # This will run forever. Sends each message through the TCP connection, using the
-    # length encoding and CBOR serialization
+    # length encoding and CBOR (or binary, if negotiated in the handshake) serialization
     async for connection, message in expanded_messages_aiter:
         if message is None:
             # Does not ban the peer, this is just a graceful close of connection.
@@ -214,11 +215,14 @@ async def perform_handshake(
                 [protocol_version, inbound_handshake.version],
             )
 
+        # Both sides support the binary codec, otherwise we keep using CBOR
+        connection.binary_codec = BINARY_CODEC in connection.peer_codecs
+
         connection.log.info(
             (
                 f"Handshake with {NodeType(connection.connection_type).name} {connection.get_peername()} "
                 f"{connection.node_id}"
-                f" established"
+                f" established, binary codec: {connection.binary_codec}"
             )
         )
         # Only yield a connection if the handshake is succesful and the connection is not a duplicate.
@@ -258,6 +262,10 @@ async def connection_to_message(
         connection.log.warning(
             f"AttributeError {e} in connection with peer {connection.get_peername()}."
         )
+    except ProtocolError as e:
+        connection.log.warning(
+            f"Invalid message {e} {e.errors} from peer {connection.get_peername()}, closing connection."
+        )
     except ssl.SSLError as e:
         connection.log.warning(
             f"SSLError {e} in connection with peer {connection.get_peername()}."
@@ -30,9 +30,10 @@ class Coin(Streamable):
 
     @classmethod
     def from_bytes(cls, blob):
-        parent_coin_info = blob[:32]
-        puzzle_hash = blob[32:64]
-        amount = int_from_bytes(blob[64:])
+        view = memoryview(blob)
+        parent_coin_info = bytes32(view[:32])
+        puzzle_hash = bytes32(view[32:64])
+        amount = int_from_bytes(view[64:])
         return Coin(parent_coin_info, puzzle_hash, uint64(amount))
 
     def __bytes__(self):
@@ -6,7 +6,7 @@ from src.types.program import Program
 from src.types.coin import Coin
 from src.types.header import Header
 from src.types.sized_bytes import bytes32
-from src.util.mempool_check_conditions import get_name_puzzle_conditions
+from src.util.npc_cache import get_name_puzzle_conditions_cached
 from src.util.condition_tools import created_outputs_for_conditions_dict
 from src.util.ints import uint32, uint128
 from src.util.streamable import Streamable, streamable
@@ -56,7 +56,7 @@ class FullBlock(Streamable):
 
         if self.transactions_generator is not None:
             # This should never throw here, block must be valid if it comes to here
-            err, npc_list, cost = get_name_puzzle_conditions(
+            err, npc_list, cost = get_name_puzzle_conditions_cached(
                 self.transactions_generator
             )
             # created coins
@@ -79,7 +79,7 @@ class FullBlock(Streamable):
 
         if self.transactions_generator is not None:
             # This should never throw here, block must be valid if it comes to here
-            err, npc_list, cost = get_name_puzzle_conditions(
+            err, npc_list, cost = get_name_puzzle_conditions_cached(
                 self.transactions_generator
             )
             # build removals list
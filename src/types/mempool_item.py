@@ -1,5 +1,8 @@
 from dataclasses import dataclass
+from typing import List
 
+from src.types.coin import Coin
+from src.types.name_puzzle_condition import NPC
 from src.types.spend_bundle import SpendBundle
 from src.types.sized_bytes import bytes32
 from src.util.ints import uint64
@@ -11,6 +14,11 @@ class MempoolItem:
     fee_per_cost: float
     fee: uint64
     cost: uint64
+    # The results of the validation which do not depend on the tip, so that adding the item to
+    # the mempool of another tip does not run the bundle again
+    npc_list: List[NPC]
+    additions: List[Coin]
+    removal_names: List[bytes32]
 
     def __lt__(self, other):
         # TODO test to see if it's < or >
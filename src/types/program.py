@@ -1,15 +1,172 @@
+import hashlib
 import io
-from typing import Any
+from typing import Any, Callable, Dict, List, Tuple
 
 from clvm import to_sexp_f
 from clvm.serialize import sexp_from_stream, sexp_to_stream
 from clvm.subclass_sexp import BaseSExp
 
 from src.types.sized_bytes import bytes32
-from src.util.hash import std_hash
+from src.util.byte_types import BlobReader
 
 SExp = to_sexp_f(1).__class__
 
+MAX_SINGLE_BYTE = 0x7F
+CONS_BOX_MARKER = 0xFF
+
+
+def sexp_from_view(view: memoryview, offset: int, to_sexp: Callable) -> Tuple[Any, int]:
+    """
+    Deserializes like clvm.serialize.sexp_from_stream, but indexes directly into a memoryview
+    instead of doing a read call for every byte. Returns the s-expression and the offset
+    after it. Iterative, so deeply nested programs do not hit the recursion limit.
+    """
+    values: List[Any] = []
+    # None means parse one item, True means cons the last two parsed values
+    todo: List[Any] = [None]
+    view_size = len(view)
+    while todo:
+        if todo.pop():
+            right = values.pop()
+            left = values.pop()
+            values.append(to_sexp((left, right)))
+            continue
+        if offset >= view_size:
+            raise ValueError("bad encoding")
+        b = view[offset]
+        offset += 1
+        if b == CONS_BOX_MARKER:
+            todo.extend([True, None, None])
+            continue
+        if b == 0x80:
+            values.append(to_sexp(b""))
+            continue
+        if b <= MAX_SINGLE_BYTE:
+            values.append(to_sexp(bytes([b])))
+            continue
+        bit_count = 0
+        bit_mask = 0x80
+        while b & bit_mask:
+            bit_count += 1
+            b &= 0xFF ^ bit_mask
+            bit_mask >>= 1
+        size = b
+        for _ in range(bit_count - 1):
+            if offset >= view_size:
+                raise ValueError("bad encoding")
+            size = (size << 8) | view[offset]
+            offset += 1
+        end = offset + size
+        if end > view_size:
+            raise ValueError("bad encoding")
+        values.append(to_sexp(bytes(view[offset:end])))
+        offset = end
+    return values[0], offset
+
+
+def sexp_length_from_view(view: memoryview, offset: int) -> int:
+    """
+    Returns the offset after the serialized s-expression which starts at offset, without
+    deserializing it. This is used to skip over programs in serialized objects.
+    """
+    # The number of s-expressions that still have to be skipped
+    todo = 1
+    view_size = len(view)
+    while todo:
+        if offset >= view_size:
+            raise ValueError("bad encoding")
+        b = view[offset]
+        offset += 1
+        if b == CONS_BOX_MARKER:
+            todo += 1
+            continue
+        todo -= 1
+        if b <= MAX_SINGLE_BYTE or b == 0x80:
+            continue
+        bit_count = 0
+        bit_mask = 0x80
+        while b & bit_mask:
+            bit_count += 1
+            b &= 0xFF ^ bit_mask
+            bit_mask >>= 1
+        size = b
+        for _ in range(bit_count - 1):
+            if offset >= view_size:
+                raise ValueError("bad encoding")
+            size = (size << 8) | view[offset]
+            offset += 1
+        offset += size
+        if offset > view_size:
+            raise ValueError("bad encoding")
+    return offset
+
+
+def _hash_atom(atom: bytes) -> bytes32:
+    return bytes.__new__(bytes32, hashlib.sha256(b"\1" + atom).digest())  # type: ignore
+
+
+# Precomputed tree hashes of the empty atom and all single byte atoms, which includes all
+# opcodes and small integers, so they make up most of the atoms in puzzles and generators
+ATOM_TREE_HASHES: Dict[bytes, bytes32] = {
+    atom: _hash_atom(atom) for atom in [b""] + [bytes([b]) for b in range(256)]
+}
+
+
+def sha256_treehash(sexp: Any) -> bytes32:
+    """
+    Computes the tree hash of an s-expression: sha256(1 + atom) for atoms, and
+    sha256(2 + left hash + right hash) for cons boxes. Iterative, so deeply nested programs
+    do not hit the recursion limit. Since s-expressions are immutable, the hash of each cons
+    box is cached on the node, so hashing a tree which shares subtrees with an already hashed
+    tree (for example a puzzle built from a template) only hashes the new nodes.
+    """
+    hashes: List[bytes32] = []
+    # A cons box is visited twice: first to hash its children, then (wrapped in a tuple) to
+    # combine the hashes of the children
+    todo: List[Any] = [sexp]
+    while todo:
+        node = todo.pop()
+        if type(node) is tuple:
+            node = node[0]
+            right = hashes.pop()
+            left = hashes.pop()
+            h = bytes.__new__(bytes32, hashlib.sha256(b"\2" + left + right).digest())  # type: ignore
+            node._tree_hash = h
+            hashes.append(h)
+            continue
+        v = node.v
+        if type(v) is tuple:
+            cached = node.__dict__.get("_tree_hash")
+            if cached is not None:
+                hashes.append(cached)
+                continue
+            todo.append((node,))
+            todo.append(v[1])
+            todo.append(v[0])
+            continue
+        h = ATOM_TREE_HASHES.get(v)
+        if h is None:
+            h = _hash_atom(v)
+        hashes.append(h)
+    return hashes[0]
+
+
+def substitute_atom(sexp: Any, old: bytes, new: bytes) -> Any:
+    """
+    Returns a Program with every occurrence of the atom old replaced by new. Subtrees which do
+    not contain old are shared with sexp, not copied, so their cached tree hashes are reused.
+    """
+    v = sexp.v
+    if type(v) is tuple:
+        left = substitute_atom(v[0], old, new)
+        right = substitute_atom(v[1], old, new)
+        if left is v[0] and right is v[1]:
+            return sexp
+        return Program.to((left, right))
+    if v == old:
+        return Program.to(new)
+    return sexp
+
 
 class Program(SExp):  # type: ignore # noqa
     """
@@ -25,6 +182,9 @@ class Program(SExp):  # type: ignore # noqa
 
     @classmethod
     def parse(cls, f):
+        if isinstance(f, BlobReader):
+            sexp, f.offset = sexp_from_view(f.view, f.offset, cls.to)
+            return sexp
         return sexp_from_stream(f, cls.to)
 
     def stream(self, f):
@@ -32,8 +192,7 @@ class Program(SExp):  # type: ignore # noqa
 
     @classmethod
     def from_bytes(cls, blob: bytes) -> Any:
-        f = io.BytesIO(blob)
-        return cls.parse(f)  # type: ignore # noqa
+        return cls.parse(BlobReader(blob))  # type: ignore # noqa
 
     def __bytes__(self) -> bytes:
         f = io.BytesIO()
@@ -44,14 +203,7 @@ class Program(SExp):  # type: ignore # noqa
         return bytes(self).hex()
 
     def get_tree_hash(self) -> bytes32:
-        if self.listp():
-            left = self.to(self.first()).get_tree_hash()
-            right = self.to(self.rest()).get_tree_hash()
-            s = b"\2" + left + right
-        else:
-            atom = self.as_atom()
-            s = b"\1" + atom
-        return bytes32(std_hash(s))
+        return sha256_treehash(self)
 
     def __deepcopy__(self, memo):
         return type(self).from_bytes(bytes(self))
@@ -11,6 +11,25 @@ def hexstr_to_bytes(input_str: str) -> bytes:
     return bytes.fromhex(input_str)
 
 
+class BlobReader:
+    """
+    Used instead of io.BytesIO for parsing. Reads return memoryview slices of the blob,
+    so the bytes are only copied once, when the parsed value is constructed.
+    """
+
+    __slots__ = ("view", "offset")
+
+    def __init__(self, blob: bytes):
+        self.view = memoryview(blob)
+        self.offset = 0
+
+    def read(self, size: int) -> memoryview:
+        start = self.offset
+        self.offset = end = start + size
+        # Like io.BytesIO, reading past the end returns a short (possibly empty) slice
+        return self.view[start:end]
+
+
 def make_sized_bytes(size):
     """
     Create a streamable type that subclasses "bytes" but requires instances
@@ -28,15 +47,15 @@ def make_sized_bytes(size):
     def parse(cls, f: BinaryIO) -> Any:
         b = f.read(size)
         assert len(b) == size
-        return cls(b)
+        # The size is already checked, so the validation in __new__ can be skipped
+        return bytes.__new__(cls, b)  # type: ignore
 
     def stream(self, f):
         f.write(self)
 
     @classmethod  # type: ignore
     def from_bytes(cls: Any, blob: bytes) -> Any:
-        f = io.BytesIO(blob)
-        return cls.parse(f)
+        return cls.parse(BlobReader(blob))
 
     def __bytes__(self: Any) -> bytes:
         f = io.BytesIO()
@@ -50,6 +69,7 @@ def make_sized_bytes(size):
         return "<%s: %s>" % (self.__class__.__name__, str(self))
 
     namespace = dict(
+        SIZE=size,
         __new__=__new__,
         parse=parse,
         stream=stream,
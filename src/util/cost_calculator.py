@@ -8,18 +8,24 @@ from src.types.name_puzzle_condition import NPC
 from src.util.errors import Err
 from src.util.ints import uint64
 from src.util.mempool_check_conditions import get_name_puzzle_conditions
+from src.util.npc_cache import get_name_puzzle_conditions_cached
 
 
 def calculate_cost_of_program(
-    program: Program,
+    program: Program, cache: bool = False
 ) -> Tuple[Optional[Err], List[NPC], uint64]:
     """
-    This function calculates the total cost of either block or a spendbundle
+    This function calculates the total cost of either block or a spendbundle. Block generators
+    should set cache, so that they are only run once. If the program fails, the error is
+    returned with no NPCs and a cost of 0.
     """
     total_clvm_cost = 0
-    error, npc_list, cost = get_name_puzzle_conditions(program)
+    if cache:
+        error, npc_list, cost = get_name_puzzle_conditions_cached(program)
+    else:
+        error, npc_list, cost = get_name_puzzle_conditions(program)
     if error:
-        raise
+        return error, [], uint64(0)
     total_clvm_cost += cost
 
     # Add cost of conditions
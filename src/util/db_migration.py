@@ -0,0 +1,70 @@
+import logging
+from typing import List
+
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 10000
+
+
+async def get_column_types(connection: aiosqlite.Connection, table: str) -> List[str]:
+    """
+    Returns the declared types of the columns of a table, in order, or an empty list if the
+    table does not exist.
+    """
+    cursor = await connection.execute(f"PRAGMA table_info({table})")
+    rows = await cursor.fetchall()
+    await cursor.close()
+    return [row[2].lower() for row in rows]
+
+
+async def migrate_hex_columns_to_blob(
+    connection: aiosqlite.Connection,
+    table: str,
+    create_table_sql: str,
+    hex_columns: List[int],
+) -> bool:
+    """
+    Migrates a table which stores hashes as hex text to a new schema which stores them as blobs,
+    in place. The new table must have the same columns in the same order, and hex_columns are the
+    positions of the columns which are converted. The indexes of the old table are dropped, so
+    they have to be created again afterwards. Everything happens in one transaction, so if the
+    node stops during the migration, the old table is unchanged, and it is migrated again on the
+    next start. Returns True if the table was migrated.
+    """
+    column_types = await get_column_types(connection, table)
+    if len(column_types) == 0 or all(column_types[i] != "text" for i in hex_columns):
+        return False
+    log.info(f"Migrating the {table} table to the binary schema")
+    old_table = f"{table}_old"
+    # DDL statements do not start a transaction implicitly, so it is started here
+    await connection.execute("BEGIN")
+    try:
+        await connection.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+        await connection.execute(create_table_sql)
+        insert_sql = (
+            f"INSERT INTO {table} VALUES({', '.join(['?'] * len(column_types))})"
+        )
+        cursor = await connection.execute(f"SELECT * from {old_table}")
+        migrated = 0
+        while True:
+            rows = await cursor.fetchmany(MIGRATION_BATCH_SIZE)
+            if len(rows) == 0:
+                break
+            new_rows = []
+            for row in rows:
+                new_row = list(row)
+                for i in hex_columns:
+                    new_row[i] = bytes.fromhex(row[i])
+                new_rows.append(new_row)
+            await connection.executemany(insert_sql, new_rows)
+            migrated += len(rows)
+        await cursor.close()
+        await connection.execute(f"DROP TABLE {old_table}")
+        await connection.commit()
+    except BaseException:
+        await connection.rollback()
+        raise
+    log.info(f"Migrated {migrated} rows of the {table} table")
+    return True
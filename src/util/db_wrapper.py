@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List
+
+import aiosqlite
+
+
+async def set_pragmas(
+    connection: aiosqlite.Connection,
+    synchronous: str = "NORMAL",
+    cache_size_mb: int = 64,
+    mmap_size_mb: int = 256,
+) -> None:
+    """
+    With WAL, readers do not block the writer and the writer does not block readers, and
+    synchronous=NORMAL only syncs at checkpoints, which is still safe against corruption.
+    """
+    await connection.execute("PRAGMA journal_mode=WAL")
+    await connection.execute(f"PRAGMA synchronous={synchronous}")
+    # A negative cache_size is in KiB rather than in pages
+    await connection.execute(f"PRAGMA cache_size={-cache_size_mb * 1024}")
+    await connection.execute(f"PRAGMA mmap_size={mmap_size_mb * 1024 * 1024}")
+
+
+class DBWrapper:
+    """
+    One connection which writes to the database, and a pool of read only connections, used by the
+    RPC and by the requests of peers, so that these reads do not wait behind the queries of block
+    validation on the single thread of the writer connection.
+    """
+
+    db: aiosqlite.Connection
+    readers: List[aiosqlite.Connection]
+    available: asyncio.Queue
+
+    @classmethod
+    async def create(
+        cls,
+        db_path: Path,
+        num_readers: int = 0,
+        synchronous: str = "NORMAL",
+        cache_size_mb: int = 64,
+        mmap_size_mb: int = 256,
+    ):
+        self = cls()
+        self.db = await aiosqlite.connect(db_path)
+        await set_pragmas(self.db, synchronous, cache_size_mb, mmap_size_mb)
+        self.readers = []
+        self.available = asyncio.Queue()
+        for _ in range(num_readers):
+            reader = await aiosqlite.connect(
+                f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True
+            )
+            await set_pragmas(reader, synchronous, cache_size_mb, mmap_size_mb)
+            self.readers.append(reader)
+            self.available.put_nowait(reader)
+        return self
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Waits for a free read only connection. Without readers, this is the writer connection.
+        Readers only see the transactions which the writer has committed.
+        """
+        if len(self.readers) == 0:
+            yield self.db
+            return
+        connection = await self.available.get()
+        try:
+            yield connection
+        finally:
+            self.available.put_nowait(connection)
+
+    async def close(self) -> None:
+        for reader in self.readers:
+            await reader.close()
+        self.readers = []
+        await self.db.close()
@@ -70,6 +70,7 @@ class Err(Enum):
     INVALID_COINBASE_PARENT = 45
     INVALID_FEES_COIN_PARENT = 46
     ASSERT_FEE_CONDITION_FAILED = 47
+    MEMPOOL_PACKAGE_TOO_LARGE = 48
 
 
 class ConsensusError(Exception):
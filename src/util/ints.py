@@ -36,6 +36,8 @@ class uint64(StructStream):
 
 
 class uint128(int):
+    SIZE = 16
+
     @classmethod
     def parse(cls, f: BinaryIO) -> Any:
         n = int.from_bytes(f.read(16), "big", signed=False)
@@ -43,12 +45,17 @@ class uint128(int):
         return cls(n)
 
     def stream(self, f):
+        f.write(bytes(self))
+
+    def __bytes__(self) -> bytes:
         assert self <= (2 ** 128) - 1 and self >= 0
-        f.write(self.to_bytes(16, "big", signed=False))
+        return self.to_bytes(16, "big", signed=False)
 
 
 class int512(int):
     # Uses 65 bytes to fit in the sign bit
+    SIZE = 65
+
     @classmethod
     def parse(cls, f: BinaryIO) -> Any:
         n = int.from_bytes(f.read(65), "big", signed=True)
@@ -56,5 +63,8 @@ class int512(int):
         return cls(n)
 
     def stream(self, f):
+        f.write(bytes(self))
+
+    def __bytes__(self) -> bytes:
         assert self <= (2 ** 512) - 1 and self >= -(2 ** 512)
-        f.write(self.to_bytes(65, "big", signed=True))
+        return self.to_bytes(65, "big", signed=True)
@@ -1,6 +1,6 @@
 import dataclasses
 import json
-from typing import Any
+from typing import Any, Iterator, Set
 from aiohttp import web
 
 from src.wallet.util.wallet_types import WalletType
@@ -23,6 +23,10 @@ class EnhancedJSONEncoder(json.JSONEncoder):
         return super().default(o)
 
 
+# Lists with more items than this are encoded and sent in batches of this size
+STREAMING_LIST_SIZE = 100
+
+
 def dict_to_json_str(o: Any) -> str:
     """
     Converts a python object into json.
@@ -37,3 +41,90 @@ def obj_to_response(o: Any) -> web.Response:
     """
     json_str = dict_to_json_str(o)
     return web.Response(body=json_str, content_type="application/json")
+
+
+def _is_encodable(o: Any) -> bool:
+    """
+    Returns whether EnhancedJSONEncoder can encode the object, without encoding it: all the
+    values have types which the encoder supports.
+    """
+    stack = [o]
+    # Types of the values which are encoded through EnhancedJSONEncoder.default
+    checked_types: Set[type] = set()
+    while len(stack) > 0:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type in checked_types or value is None:
+            continue
+        if isinstance(value, (str, int, float)):
+            continue
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif (
+            dataclasses.is_dataclass(value)
+            or isinstance(value, (bytes, WalletType))
+            or hasattr(value_type, "__bytes__")
+        ):
+            checked_types.add(value_type)
+        else:
+            return False
+    return True
+
+
+def dict_to_json_chunks(o: Any) -> Iterator[str]:
+    """
+    Converts a python object into json, like dict_to_json_str, but yields it in chunks. Large
+    lists at the top level of a dict are encoded in batches, so the json string of the whole
+    object is never built in memory. The object is checked before the first chunk, so that
+    encoding does not fail once a response is partly sent, and objects which are not
+    encodable, or which have keys that are not strings, are encoded in one chunk.
+    """
+    if (
+        not isinstance(o, dict)
+        or not any(
+            isinstance(value, list) and len(value) > STREAMING_LIST_SIZE
+            for value in o.values()
+        )
+        # The keys are encoded separately below, so they are only encoded like json.dumps
+        # does if they are strings
+        or not all(isinstance(key, str) for key in o.keys())
+        or not _is_encodable(o)
+    ):
+        yield dict_to_json_str(o)
+        return
+    encoder = EnhancedJSONEncoder(sort_keys=True)
+    yield "{"
+    for i, key in enumerate(sorted(o.keys())):
+        separator = ", " if i > 0 else ""
+        value = o[key]
+        if not isinstance(value, list) or len(value) == 0:
+            yield f"{separator}{encoder.encode(key)}: {encoder.encode(value)}"
+            continue
+        yield f"{separator}{encoder.encode(key)}: ["
+        for start in range(0, len(value), STREAMING_LIST_SIZE):
+            # Removes the brackets, since the batch is part of a larger list
+            batch = encoder.encode(value[start : start + STREAMING_LIST_SIZE])[1:-1]
+            yield batch if start == 0 else f", {batch}"
+        yield "]"
+    yield "}"
+
+
+async def obj_to_streamed_response(request: web.Request, o: Any) -> web.StreamResponse:
+    """
+    Like obj_to_response, but writes the json to the client in chunks, if it contains large lists.
+    """
+    chunks = dict_to_json_chunks(o)
+    first_chunk = next(chunks)
+    if first_chunk != "{":
+        # Small enough to be sent in one response
+        return web.Response(body=first_chunk, content_type="application/json")
+    response = web.StreamResponse()
+    response.content_type = "application/json"
+    await response.prepare(request)
+    await response.write(first_chunk.encode())
+    for chunk in chunks:
+        await response.write(chunk.encode())
+    await response.write_eof()
+    return response
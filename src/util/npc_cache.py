@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+from src.types.condition_opcodes import ConditionOpcode
+from src.types.condition_var_pair import ConditionVarPair
+from src.types.name_puzzle_condition import NPC
+from src.types.program import Program
+from src.types.sized_bytes import bytes32
+from src.util.condition_tools import conditions_by_opcode
+from src.util.errors import Err
+from src.util.ints import uint64
+from src.util.mempool_check_conditions import get_name_puzzle_conditions
+
+"""
+Running the transactions generator of a block is by far the most expensive part of reading its
+removals and additions, and the same block is evaluated during validation, when it is added to
+the coin store, and when peers request its removals and additions. The NPC (name, puzzle hash,
+conditions) results are therefore cached, keyed by the tree hash of the generator. The BlockStore
+also persists the results of validated blocks, and adds them to this cache when a block is read.
+"""
+
+NPC_CACHE_SIZE = 1000
+
+NPCResult = Tuple[Optional[Err], List[NPC], uint64]
+
+
+class NPCCache:
+    """
+    A bounded LRU cache of get_name_puzzle_conditions results. Entries which were read from the
+    database are stored serialized, and only deserialized when they are used. Cached results are
+    shared, so they must not be modified.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, generator_hash: bytes32) -> Optional[NPCResult]:
+        entry: Optional[Union[NPCResult, Tuple[bytes, uint64]]] = self.cache.get(
+            generator_hash
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.cache.move_to_end(generator_hash)
+        if isinstance(entry[0], bytes):
+            result: NPCResult = (None, npc_list_from_bytes(entry[0]), entry[1])
+            self.cache[generator_hash] = result
+            return result
+        return entry  # type: ignore
+
+    def put(self, generator_hash: bytes32, result: NPCResult) -> None:
+        self._add(generator_hash, result)
+
+    def put_serialized(
+        self, generator_hash: bytes32, npc_list_bytes: bytes, cost: uint64
+    ) -> None:
+        if generator_hash not in self.cache:
+            self._add(generator_hash, (npc_list_bytes, cost))
+
+    def _add(self, generator_hash: bytes32, entry: Tuple) -> None:
+        self.cache[generator_hash] = entry
+        self.cache.move_to_end(generator_hash)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+npc_cache = NPCCache(NPC_CACHE_SIZE)
+
+
+def get_name_puzzle_conditions_cached(generator: Program) -> NPCResult:
+    """
+    Same as get_name_puzzle_conditions, but only runs each valid block generator once. Invalid
+    generators are not cached, since they do not end up in blocks.
+    """
+    generator_hash = generator.get_tree_hash()
+    result = npc_cache.get(generator_hash)
+    if result is None:
+        result = get_name_puzzle_conditions(generator)
+        if result[0] is None:
+            npc_cache.put(generator_hash, result)
+    return result
+
+
+def npc_list_to_bytes(npc_list: List[NPC]) -> bytes:
+    """
+    Serializes an NPC list as a CLVM program, which represents the condition variables exactly,
+    since they were also read from a CLVM program.
+    """
+    items = []
+    for npc in npc_list:
+        conditions = []
+        for cvp_list in npc.condition_dict.values():
+            for cvp in cvp_list:
+                if cvp.var2 is None:
+                    conditions.append([cvp.opcode.value, cvp.var1])
+                else:
+                    conditions.append([cvp.opcode.value, cvp.var1, cvp.var2])
+        items.append([npc.coin_name, npc.puzzle_hash, conditions])
+    return bytes(Program(Program.to(items)))
+
+
+def npc_list_from_bytes(blob: bytes) -> List[NPC]:
+    npc_list: List[NPC] = []
+    for coin_name, puzzle_hash, conditions in Program.from_bytes(blob).as_python():
+        cvps = [
+            ConditionVarPair(ConditionOpcode(c[0]), c[1], c[2] if len(c) == 3 else None)
+            for c in conditions
+        ]
+        npc_list.append(
+            NPC(bytes32(coin_name), bytes32(puzzle_hash), conditions_by_opcode(cvps))
+        )
+    return npc_list
@@ -6,9 +6,22 @@ import io
 import pprint
 import json
 from enum import Enum
-from typing import Any, BinaryIO, List, Type, get_type_hints, Union, Dict
-from src.util.byte_types import hexstr_to_bytes
-from src.types.program import Program
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Type,
+    TypeVar,
+    Union,
+    get_type_hints,
+)
+from src.util.byte_types import BlobReader, hexstr_to_bytes
+from src.types.program import Program, sexp_length_from_view
 from src.util.hash import std_hash
 
 from blspy import (
@@ -104,6 +117,8 @@ def streamable(cls: Any):
     whereas uint32 can be.
 
     Furthermore, a get_hash() member is added, which performs a serialization and a sha256.
+    Since the classes are frozen, the results of __bytes__ and get_hash are computed at most
+    once per object, and stored on the instance.
 
     This class is used for deterministic serialization and hashing, for consensus critical
     objects such as the block header.
@@ -115,117 +130,439 @@ def streamable(cls: Any):
     """
 
     cls1 = strictdataclass(cls)
-    return type(cls.__name__, (cls1, Streamable), {})
+    t = type(cls.__name__, (cls1, Streamable), {})
 
+    # The field layout is resolved once per class, so that parse and stream do not have to
+    # call get_type_hints and dispatch on the field types for every object.
+    t._streamable_fields = tuple(  # type: ignore
+        (
+            f_name,
+            function_to_parse_one_item(f_type),
+            function_to_stream_one_item(f_type),
+        )
+        for f_name, f_type in get_type_hints(t).items()
+    )
+    t._json_fields = tuple(  # type: ignore
+        (f_name, function_to_jsonify_one_item(f_type))
+        for f_name, f_type in get_type_hints(t).items()
+    )
+    # Used by from_bytes_lazy, to find and decode single fields of a serialized object
+    t._field_indexes = {  # type: ignore
+        f_name: index for index, f_name in enumerate(get_type_hints(t).keys())
+    }
+    t._streamable_skips = tuple(  # type: ignore
+        function_to_skip_one_item(f_type) for f_type in get_type_hints(t).values()
+    )
+    # Fields which are Streamables with the default serialization are also decoded lazily
+    t._lazy_field_types = tuple(  # type: ignore
+        f_type
+        if isinstance(f_type, type)
+        and issubclass(f_type, Streamable)
+        and f_type.__bytes__ is Streamable.__bytes__
+        else None
+        for f_type in get_type_hints(t).values()
+    )
+    field_sizes = [fixed_size_of(f_type) for f_type in get_type_hints(t).values()]
+    t._streamable_size = (  # type: ignore
+        None if None in field_sizes else sum(field_sizes)  # type: ignore
+    )
+    return t
 
-class Streamable:
-    @classmethod
-    def parse_one_item(cls: Type[cls.__name__], f_type: Type, f: BinaryIO):  # type: ignore
-        inner_type: Type
-        if is_type_List(f_type):
-            inner_type = f_type.__args__[0]
-            full_list: List[inner_type] = []  # type: ignore
-            assert inner_type != List.__args__[0]  # type: ignore
-            list_size: uint32 = uint32(int.from_bytes(f.read(4), "big"))
-            for list_index in range(list_size):
-                full_list.append(cls.parse_one_item(inner_type, f))  # type: ignore
-            return full_list
-        if is_type_SpecificOptional(f_type):
-            inner_type = f_type.__args__[0]
+
+def parse_bool(f: BinaryIO) -> bool:
+    return bool(int.from_bytes(f.read(4), "big"))
+
+
+def parse_bytes(f: BinaryIO) -> bytes:
+    list_size = uint32(int.from_bytes(f.read(4), "big"))
+    return bytes(f.read(list_size))
+
+
+def parse_str(f: BinaryIO) -> str:
+    str_size = uint32(int.from_bytes(f.read(4), "big"))
+    return str(f.read(str_size), "utf-8")
+
+
+def function_to_parse_one_item(f_type: Type) -> Callable[[BinaryIO], Any]:
+    """
+    Returns a function which parses one item of type f_type from a stream. Inner types of
+    Lists, Optionals and Tuples are resolved here, instead of on every parse.
+    """
+    inner_type: Type
+    if is_type_List(f_type):
+        inner_type = f_type.__args__[0]
+        assert not isinstance(inner_type, TypeVar)  # type: ignore
+        parse_inner_type_f = function_to_parse_one_item(inner_type)
+
+        def parse_list(f: BinaryIO) -> List:
+            list_size = uint32(int.from_bytes(f.read(4), "big"))
+            return [parse_inner_type_f(f) for _ in range(list_size)]
+
+        return parse_list
+    if is_type_SpecificOptional(f_type):
+        parse_inner_type_f = function_to_parse_one_item(f_type.__args__[0])
+
+        def parse_optional(f: BinaryIO) -> Optional[Any]:
             is_present: bool = f.read(1) == bytes([1])
             if is_present:
-                return cls.parse_one_item(inner_type, f)  # type: ignore
-            else:
-                return None
-        if is_type_Tuple(f_type):
-            inner_types = f_type.__args__
-            full_list = []
-            for inner_type in inner_types:
-                full_list.append(cls.parse_one_item(inner_type, f))  # type: ignore
-            return tuple(full_list)
-        if f_type is bool:
-            return bool.from_bytes(f.read(4), "big")
-        if f_type == bytes:
-            list_size = uint32(int.from_bytes(f.read(4), "big"))
-            return f.read(list_size)
-        if hasattr(f_type, "parse"):
-            return f_type.parse(f)
-        if hasattr(f_type, "from_bytes") and size_hints[f_type.__name__]:
-            return f_type.from_bytes(f.read(size_hints[f_type.__name__]))
-        if f_type is str:
-            str_size: uint32 = uint32(int.from_bytes(f.read(4), "big"))
-            return bytes.decode(f.read(str_size), "utf-8")
-        else:
-            raise RuntimeError(f"Type {f_type} does not have parse")
+                return parse_inner_type_f(f)
+            return None
 
-    @classmethod
-    def parse(cls: Type[cls.__name__], f: BinaryIO) -> cls.__name__:  # type: ignore
-        values = []
-        for _, f_type in get_type_hints(cls).items():
-            values.append(cls.parse_one_item(f_type, f))  # type: ignore
-        return cls(*values)
-
-    def stream_one_item(self, f_type: Type, item, f: BinaryIO) -> None:
-        inner_type: Type
-        if is_type_List(f_type):
+        return parse_optional
+    if is_type_Tuple(f_type):
+        parse_inner_types_f = [function_to_parse_one_item(t) for t in f_type.__args__]
+
+        def parse_tuple(f: BinaryIO) -> Tuple:
+            return tuple(parse_f(f) for parse_f in parse_inner_types_f)
+
+        return parse_tuple
+    if f_type is bool:
+        return parse_bool
+    if f_type == bytes:
+        return parse_bytes
+    if hasattr(f_type, "parse"):
+        return f_type.parse
+    if hasattr(f_type, "from_bytes") and f_type.__name__ in size_hints:
+        size = size_hints[f_type.__name__]
+        return lambda f: f_type.from_bytes(bytes(f.read(size)))
+    if f_type is str:
+        return parse_str
+
+    def parse_unsupported(f: BinaryIO) -> Any:
+        raise RuntimeError(f"Type {f_type} does not have parse")
+
+    return parse_unsupported
+
+
+def stream_bool(item: Any, f: BinaryIO) -> None:
+    f.write(int(item).to_bytes(4, "big"))
+
+
+def stream_bytes(item: Any, f: BinaryIO) -> None:
+    f.write(uint32(len(item)).to_bytes(4, "big"))
+    f.write(item)
+
+
+def stream_str(item: Any, f: BinaryIO) -> None:
+    f.write(uint32(len(item)).to_bytes(4, "big"))
+    f.write(item.encode("utf-8"))
+
+
+def function_to_stream_one_item(f_type: Type) -> Callable[[Any, BinaryIO], Any]:
+    """
+    Returns a function which streams one item of type f_type. This is the counterpart of
+    function_to_parse_one_item.
+    """
+    inner_type: Type
+    if is_type_List(f_type):
+        inner_type = f_type.__args__[0]
+        assert not isinstance(inner_type, TypeVar)  # type: ignore
+        stream_inner_type_f = function_to_stream_one_item(inner_type)
+
+        def stream_list(item: Any, f: BinaryIO) -> None:
             assert is_type_List(type(item))
             f.write(uint32(len(item)).to_bytes(4, "big"))
-            inner_type = f_type.__args__[0]
-            assert inner_type != List.__args__[0]  # type: ignore
             for element in item:
-                self.stream_one_item(inner_type, element, f)
-        elif is_type_SpecificOptional(f_type):
-            inner_type = f_type.__args__[0]
+                stream_inner_type_f(element, f)
+
+        return stream_list
+    if is_type_SpecificOptional(f_type):
+        stream_inner_type_f = function_to_stream_one_item(f_type.__args__[0])
+
+        def stream_optional(item: Any, f: BinaryIO) -> None:
             if item is None:
                 f.write(bytes([0]))
             else:
                 f.write(bytes([1]))
-                self.stream_one_item(inner_type, item, f)
-        elif is_type_Tuple(f_type):
-            inner_types = f_type.__args__
-            assert len(item) == len(inner_types)
-            for i in range(len(item)):
-                self.stream_one_item(inner_types[i], item[i], f)
-        elif f_type == bytes:
-            f.write(uint32(len(item)).to_bytes(4, "big"))
-            f.write(item)
-        elif hasattr(f_type, "stream"):
-            item.stream(f)
-        elif hasattr(f_type, "__bytes__"):
-            f.write(bytes(item))
-        elif f_type is str:
-            f.write(uint32(len(item)).to_bytes(4, "big"))
-            f.write(item.encode("utf-8"))
-        elif f_type is bool:
-            f.write(int(item).to_bytes(4, "big"))
+                stream_inner_type_f(item, f)
+
+        return stream_optional
+    if is_type_Tuple(f_type):
+        stream_inner_types_f = [function_to_stream_one_item(t) for t in f_type.__args__]
+
+        def stream_tuple(item: Any, f: BinaryIO) -> None:
+            assert len(item) == len(stream_inner_types_f)
+            for stream_f, element in zip(stream_inner_types_f, item):
+                stream_f(element, f)
+
+        return stream_tuple
+    if f_type == bytes:
+        return stream_bytes
+    if hasattr(f_type, "stream"):
+        return lambda item, f: item.stream(f)
+    if hasattr(f_type, "__bytes__"):
+        return lambda item, f: f.write(bytes(item))
+    if f_type is str:
+        return stream_str
+    if f_type is bool:
+        return stream_bool
+
+    def stream_unsupported(item: Any, f: BinaryIO) -> None:
+        raise NotImplementedError(f"can't stream {item}, {f_type}")
+
+    return stream_unsupported
+
+
+def fixed_size_of(f_type: Type) -> Optional[int]:
+    """
+    Returns the size of the serialization of f_type, or None if it is not the same for all values.
+    """
+    if is_type_List(f_type) or is_type_SpecificOptional(f_type):
+        return None
+    if is_type_Tuple(f_type):
+        sizes = [fixed_size_of(t) for t in f_type.__args__]
+        return None if None in sizes else sum(sizes)  # type: ignore
+    if f_type is bool:
+        return 4
+    size = getattr(f_type, "SIZE", None)
+    if isinstance(size, int):
+        return size
+    if hasattr(f_type, "_streamable_size"):
+        return f_type._streamable_size
+    if hasattr(f_type, "from_bytes") and f_type.__name__ in size_hints:
+        return size_hints[f_type.__name__]
+    return None
+
+
+def skip_bytes(view: memoryview, offset: int) -> int:
+    return offset + 4 + int.from_bytes(view[offset : offset + 4], "big")
+
+
+def function_to_skip_one_item(f_type: Type) -> Callable[[memoryview, int], int]:
+    """
+    Returns a function which takes a serialized item of type f_type, at an offset in a memoryview,
+    and returns the offset after the item. Where possible, this does not deserialize the item.
+    """
+    size = fixed_size_of(f_type)
+    if size is not None:
+        return lambda view, offset: offset + size  # type: ignore
+    if is_type_List(f_type):
+        inner_size = fixed_size_of(f_type.__args__[0])
+        skip_inner_type_f = function_to_skip_one_item(f_type.__args__[0])
+
+        def skip_list(view: memoryview, offset: int) -> int:
+            list_size = int.from_bytes(view[offset : offset + 4], "big")
+            offset += 4
+            if inner_size is not None:
+                return offset + list_size * inner_size
+            for _ in range(list_size):
+                offset = skip_inner_type_f(view, offset)
+            return offset
+
+        return skip_list
+    if is_type_SpecificOptional(f_type):
+        skip_inner_type_f = function_to_skip_one_item(f_type.__args__[0])
+
+        def skip_optional(view: memoryview, offset: int) -> int:
+            if view[offset] == 1:
+                return skip_inner_type_f(view, offset + 1)
+            return offset + 1
+
+        return skip_optional
+    if is_type_Tuple(f_type) or hasattr(f_type, "_streamable_skips"):
+        if is_type_Tuple(f_type):
+            skip_inner_types_f = [function_to_skip_one_item(t) for t in f_type.__args__]
         else:
-            raise NotImplementedError(f"can't stream {item}, {f_type}")
+            skip_inner_types_f = list(f_type._streamable_skips)
+
+        def skip_all(view: memoryview, offset: int) -> int:
+            for skip_f in skip_inner_types_f:
+                offset = skip_f(view, offset)
+            return offset
+
+        return skip_all
+    if f_type == bytes or f_type is str:
+        return skip_bytes
+    if f_type is Program:
+        return sexp_length_from_view
+    parse_f = function_to_parse_one_item(f_type)
+
+    def skip_by_parsing(view: memoryview, offset: int) -> int:
+        f = BlobReader(view)
+        f.offset = offset
+        parse_f(f)  # type: ignore
+        return f.offset
+
+    return skip_by_parsing
+
+
+# Hit and miss counters for the per-object bytes and hash caches of all Streamables
+cache_stats: Dict[str, int] = {
+    "bytes_hits": 0,
+    "bytes_misses": 0,
+    "hash_hits": 0,
+    "hash_misses": 0,
+}
+
+
+def cache_hit_rates() -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for name in ["bytes", "hash"]:
+        hits = cache_stats[f"{name}_hits"]
+        total = hits + cache_stats[f"{name}_misses"]
+        rates[name] = hits / total if total > 0 else 0.0
+    return rates
+
+
+def reset_cache_stats() -> None:
+    for key in cache_stats.keys():
+        cache_stats[key] = 0
+
+
+def jsonify_raw(item: Any) -> Any:
+    """
+    Copies an item the way dataclasses.asdict does, without converting any values.
+    """
+    if dataclasses.is_dataclass(item):
+        return dataclasses.asdict(item)
+    if isinstance(item, (list, tuple)):
+        return type(item)(jsonify_raw(element) for element in item)
+    return item
+
+
+def function_to_jsonify_one_item(
+    f_type: Type, in_list: bool = False
+) -> Callable[[Any], Any]:
+    """
+    Returns a function which converts a field value into its to_json_dict form in a single pass,
+    without the deep copy of dataclasses.asdict. The output is the same as recurse_jsonify on the
+    dataclasses.asdict of the object: field values are converted (bytes to hex, enums to names,
+    big ints to strings), while list items are only converted if they are objects or lists
+    themselves, and tuples are never converted.
+    """
+    if is_type_SpecificOptional(f_type):
+        inner_f = function_to_jsonify_one_item(f_type.__args__[0], in_list)
+        return lambda item: None if item is None else inner_f(item)
+    if is_type_List(f_type):
+        list_item_f = function_to_jsonify_one_item(f_type.__args__[0], True)
+        return lambda item: [list_item_f(element) for element in item]
+    if dataclasses.is_dataclass(f_type):
+        return lambda item: item.to_json_dict()
+    if in_list or not isinstance(f_type, type):
+        return jsonify_raw
+    if f_type in unhashable_types or issubclass(f_type, bytes):
+        return lambda item: f"0x{bytes(item).hex()}"
+    if issubclass(f_type, Enum):
+        return lambda item: item.name
+    if f_type in big_ints:
+        return str
+    if issubclass(f_type, (int, str)):
+        return lambda item: item
+    return jsonify_raw
+
+
+class Streamable:
+    if TYPE_CHECKING:
+        # Provided at runtime by strictdataclass, which comes after Streamable in the MRO
+
+        @classmethod
+        def construct_trusted(cls, *values: Any) -> Any:
+            ...
+
+    @classmethod
+    def parse(cls: Type[cls.__name__], f: BinaryIO) -> cls.__name__:  # type: ignore
+        values = [parse_f(f) for _, parse_f, _ in cls._streamable_fields]  # type: ignore
+        # Parsed values always have the exact field types, so type checking is skipped
+        return cls.construct_trusted(*values)
 
     def stream(self, f: BinaryIO) -> None:
-        for f_name, f_type in get_type_hints(self).items():  # type: ignore
-            self.stream_one_item(f_type, getattr(self, f_name), f)
+        cached: Optional[bytes] = self.__dict__.get("_cached_bytes")
+        if cached is not None:
+            f.write(cached)
+            return
+        for f_name, _, stream_f in self._streamable_fields:  # type: ignore
+            stream_f(getattr(self, f_name), f)
 
     def get_hash(self) -> bytes32:
-        return bytes32(std_hash(bytes(self)))
+        # The object is frozen, so the hash (and serialization) can never change after construction.
+        # The cache lives in the instance __dict__, which is not part of the dataclass fields.
+        cached: Optional[bytes32] = self.__dict__.get("_cached_hash")
+        if cached is not None:
+            cache_stats["hash_hits"] += 1
+            return cached
+        cache_stats["hash_misses"] += 1
+        h = bytes32(std_hash(bytes(self)))
+        self.__dict__["_cached_hash"] = h
+        return h
 
     @classmethod
     def from_bytes(cls: Any, blob: bytes) -> Any:
-        f = io.BytesIO(blob)
-        return cls.parse(f)
+        return cls.parse(BlobReader(blob))
+
+    @classmethod
+    def from_bytes_lazy(cls: Any, blob: bytes) -> Any:
+        """
+        Returns an object which only decodes each field from blob when it is first accessed, so
+        objects read from the database are cheap when only a few fields are used. The blob is
+        used as the serialization of the object without being checked, so it must be canonical,
+        for example a blob that was created with bytes() and stored in the database.
+        """
+        self = object.__new__(cls)
+        self.__dict__["_cached_bytes"] = bytes(blob)
+        # The offsets of the fields that have been found so far, starting with the first one
+        self.__dict__["_lazy_offsets"] = [0]
+        return self
+
+    if not TYPE_CHECKING:
+        # Hidden from type checkers, so that they still report access to unknown attributes
+
+        def __getattr__(self, name: str) -> Any:
+            # Only called for attributes which are not in the instance __dict__. For lazy
+            # objects, this includes the fields which have not been decoded yet.
+            lazy_offsets: Optional[List[int]] = self.__dict__.get("_lazy_offsets")
+            index: Optional[int] = None
+            if lazy_offsets is not None:
+                index = type(self)._field_indexes.get(name)
+            if index is None:
+                raise AttributeError(
+                    f"'{type(self).__name__}' object has no attribute '{name}'"
+                )
+            blob: bytes = self.__dict__["_cached_bytes"]
+            lazy_type = self._lazy_field_types[index]
+            # A lazy field needs its end offset, other fields are parsed from the start
+            last_index = index + 1 if lazy_type is not None else index
+            if len(lazy_offsets) <= last_index:
+                view = memoryview(blob)
+                for skip_f in self._streamable_skips[
+                    len(lazy_offsets) - 1 : last_index
+                ]:
+                    lazy_offsets.append(skip_f(view, lazy_offsets[-1]))
+            if lazy_type is not None:
+                value = lazy_type.from_bytes_lazy(
+                    blob[lazy_offsets[index] : lazy_offsets[index + 1]]
+                )
+            else:
+                f = BlobReader(blob)
+                f.offset = lazy_offsets[index]
+                value = self._streamable_fields[index][1](f)
+                if len(lazy_offsets) == index + 1:
+                    lazy_offsets.append(f.offset)
+            self.__dict__[name] = value
+            return value
 
     def __bytes__(self: Any) -> bytes:
+        cached: Optional[bytes] = self.__dict__.get("_cached_bytes")
+        if cached is not None:
+            cache_stats["bytes_hits"] += 1
+            return cached
+        cache_stats["bytes_misses"] += 1
         f = io.BytesIO()
         self.stream(f)
-        return bytes(f.getvalue())
+        blob = bytes(f.getvalue())
+        self.__dict__["_cached_bytes"] = blob
+        return blob
 
     def __str__(self: Any) -> str:
-        return pp.pformat(self.recurse_jsonify(dataclasses.asdict(self)))
+        return pp.pformat(self.to_json_dict())
 
     def __repr__(self: Any) -> str:
-        return pp.pformat(self.recurse_jsonify(dataclasses.asdict(self)))
+        return pp.pformat(self.to_json_dict())
 
     def to_json_dict(self) -> Dict:
-        return self.recurse_jsonify(dataclasses.asdict(self))
+        return {
+            f_name: jsonify_f(getattr(self, f_name))
+            for f_name, jsonify_f in self._json_fields  # type: ignore
+        }
 
     @classmethod
     def from_json_dict(cls: Any, json_dict: Dict) -> Any:
@@ -1,38 +1,48 @@
-import io
 import struct
 from typing import Any, BinaryIO
 
 
 class StructStream(int):
     PACK = ""
+    STRUCT: struct.Struct
+    SIZE: int
+    BITS: int
+    LIMIT: int
 
     """
     Create a class that can parse and stream itself based on a struct.pack template string.
     """
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        # The struct is compiled once per class, instead of on every parse and stream
+        super().__init_subclass__(**kwargs)  # type: ignore
+        cls.STRUCT = struct.Struct(cls.PACK)
+        cls.SIZE = cls.STRUCT.size
+        cls.BITS = cls.SIZE * 8
+        # Values with a bit_length larger than BITS are rejected, which is the same as
+        # requiring -LIMIT < value < LIMIT, but cheaper to check
+        cls.LIMIT = 1 << cls.BITS
+
     def __new__(cls: Any, value: int):
-        bits = struct.calcsize(cls.PACK) * 8
         value = int(value)
-        if value.bit_length() > bits:
+        if not -cls.LIMIT < value < cls.LIMIT:
             raise ValueError(
                 f"Value {value} of size {value.bit_length()} does not fit into "
-                f"{cls.__name__} of size {bits}"
+                f"{cls.__name__} of size {cls.BITS}"
             )
         return int.__new__(cls, value)  # type: ignore
 
     @classmethod
     def parse(cls: Any, f: BinaryIO) -> Any:
-        return cls(*struct.unpack(cls.PACK, f.read(struct.calcsize(cls.PACK))))
+        # Unpacked values always fit, so the bounds check in __new__ is skipped
+        return int.__new__(cls, cls.STRUCT.unpack(f.read(cls.SIZE))[0])  # type: ignore
 
     def stream(self, f):
-        f.write(struct.pack(self.PACK, self))
+        f.write(self.STRUCT.pack(self))
 
     @classmethod
     def from_bytes(cls: Any, blob: bytes) -> Any:  # type: ignore
-        f = io.BytesIO(blob)
-        return cls.parse(f)
+        return int.__new__(cls, cls.STRUCT.unpack_from(blob)[0])  # type: ignore
 
     def __bytes__(self: Any) -> bytes:
-        f = io.BytesIO()
-        self.stream(f)
-        return bytes(f.getvalue())
+        return self.STRUCT.pack(self)
@@ -1,5 +1,5 @@
 import dataclasses
-from typing import Any, List, Type, Union, get_type_hints
+from typing import Any, Dict, List, Tuple, Type, TypeVar, Union, get_type_hints
 
 
 def is_type_List(f_type: Type) -> bool:
@@ -38,7 +38,7 @@ def strictdataclass(cls: Any):
             if is_type_List(f_type):
                 collected_list: List = []
                 inner_type: Type = f_type.__args__[0]
-                assert inner_type != List.__args__[0]  # type: ignore
+                assert not isinstance(inner_type, TypeVar)  # type: ignore
                 if not is_type_List(type(item)):
                     raise ValueError(f"Wrong type for {f_name}, need a list.")
                 for el in item:
@@ -73,7 +73,6 @@ def strictdataclass(cls: Any):
             return item
 
         def __post_init__(self):
-            fields = get_type_hints(self)
             data = self.__dict__
             for (f_name, f_type) in fields.items():
                 if f_name not in data:
@@ -82,10 +81,25 @@ def strictdataclass(cls: Any):
                     self, f_name, self.parse_item(data[f_name], f_name, f_type)
                 )
 
+        @classmethod
+        def construct_trusted(cls, *values: Any) -> Any:
+            """
+            Creates an instance from positional field values, without any type checking or
+            conversion. Only use this when every value is already of the exact field type, for
+            example when it was just parsed from bytes.
+            """
+            assert len(values) == len(field_names)
+            obj = object.__new__(cls)
+            obj.__dict__.update(zip(field_names, values))
+            return obj
+
     class NoTypeChecking:
         __no_type_check__ = True
 
     cls1 = dataclasses.dataclass(cls, init=False, frozen=True)  # type: ignore
+    # Type hints are resolved once per class, instead of on every construction
+    fields: Dict[str, Type] = get_type_hints(cls1)
+    field_names: Tuple[str, ...] = tuple(fields.keys())
     if dataclasses.fields(cls1) == ():
         return type(cls.__name__, (cls1, _Local, NoTypeChecking), {})
     return type(cls.__name__, (cls1, _Local), {})
@@ -17,18 +17,33 @@ from typing import List
 from clvm_tools import binutils
 
 from src.types.condition_opcodes import ConditionOpcode
-from src.types.program import Program
+from src.types.program import Program, substitute_atom
 
 from . import p2_conditions
 
+# Not a valid public key, so it can not occur in the template itself
+PUBLIC_KEY_PLACEHOLDER = bytes([0xFF] * 48)
 
-def puzzle_for_pk(public_key) -> Program:
+
+def make_puzzle_template() -> Program:
     aggsig = ConditionOpcode.AGG_SIG[0]
     TEMPLATE = (
         f"(c (c (q {aggsig}) (c (q 0x%s) (c (sha256tree (f (a))) (q ())))) "
         f"((c (f (a)) (f (r (a))))))"
     )
-    return Program.to(binutils.assemble(TEMPLATE % public_key.hex()))
+    template = Program.to(binutils.assemble(TEMPLATE % PUBLIC_KEY_PLACEHOLDER.hex()))
+    # Caches the tree hashes of all the subtrees which do not depend on the public key
+    template.get_tree_hash()
+    return template
+
+
+PUZZLE_TEMPLATE = make_puzzle_template()
+
+
+def puzzle_for_pk(public_key) -> Program:
+    # Shares everything except the path to the public key with the template, so the puzzle
+    # is not reassembled, and its tree hash only hashes the few new nodes
+    return substitute_atom(PUZZLE_TEMPLATE, PUBLIC_KEY_PLACEHOLDER, bytes(public_key))
 
 
 def solution_for_conditions(puzzle_reveal, conditions):
@@ -3,18 +3,35 @@ import aiosqlite
 from src.types.coin import Coin
 from src.wallet.block_record import BlockRecord
 from src.types.sized_bytes import bytes32
+from src.util.db_migration import migrate_hex_columns_to_blob
 from src.util.ints import uint32
 from src.wallet.util.wallet_types import WalletType
 from src.wallet.wallet_coin_record import WalletCoinRecord
 
 
+# Hashes are stored as 32 byte blobs, and the table is clustered by coin name
+COIN_RECORD_TABLE = (
+    "CREATE TABLE IF NOT EXISTS coin_record("
+    "coin_name blob PRIMARY KEY,"
+    " confirmed_index bigint,"
+    " spent_index bigint,"
+    " spent tinyint,"
+    " coinbase tinyint,"
+    " puzzle_hash blob,"
+    " coin_parent blob,"
+    " amount bigint,"
+    " wallet_type int,"
+    " wallet_id int) WITHOUT ROWID"
+)
+
+
 class WalletStore:
     """
     This object handles CoinRecords in DB used by wallet.
     """
 
     db_connection: aiosqlite.Connection
-    coin_record_cache: Dict[str, WalletCoinRecord]
+    coin_record_cache: Dict[bytes32, WalletCoinRecord]
     cache_size: uint32
 
     @classmethod
@@ -26,21 +43,11 @@ class WalletStore:
         self.cache_size = cache_size
 
         self.db_connection = connection
-        await self.db_connection.execute(
-            (
-                "CREATE TABLE IF NOT EXISTS coin_record("
-                "coin_name text PRIMARY KEY,"
-                " confirmed_index bigint,"
-                " spent_index bigint,"
-                " spent int,"
-                " coinbase int,"
-                " puzzle_hash text,"
-                " coin_parent text,"
-                " amount bigint,"
-                " wallet_type int,"
-                " wallet_id int)"
-            )
+        # Databases from before the binary schema are migrated in place
+        await migrate_hex_columns_to_blob(
+            self.db_connection, "coin_record", COIN_RECORD_TABLE, [0, 5, 6]
         )
+        await self.db_connection.execute(COIN_RECORD_TABLE)
         await self.db_connection.execute(
             "CREATE TABLE IF NOT EXISTS block_records(header_hash text PRIMARY KEY, height int,"
             " in_lca_path tinyint, block blob)"
@@ -87,13 +94,13 @@ class WalletStore:
         cursor = await self.db_connection.execute(
             "INSERT OR REPLACE INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (
-                record.coin.name().hex(),
+                record.coin.name(),
                 record.confirmed_block_index,
                 record.spent_block_index,
                 int(record.spent),
                 int(record.coinbase),
-                str(record.coin.puzzle_hash.hex()),
-                str(record.coin.parent_coin_info.hex()),
+                record.coin.puzzle_hash,
+                record.coin.parent_coin_info,
                 record.coin.amount,
                 record.wallet_type.value,
                 record.wallet_id,
@@ -102,7 +109,7 @@ class WalletStore:
         await cursor.close()
         await self.db_connection.commit()
 
-        self.coin_record_cache[record.coin.name().hex()] = record
+        self.coin_record_cache[record.coin.name()] = record
         if len(self.coin_record_cache) > self.cache_size:
             while len(self.coin_record_cache) > self.cache_size:
                 first_in = list(self.coin_record_cache.keys())[0]
@@ -127,20 +134,15 @@ class WalletStore:
 
     async def get_coin_record(self, coin_name: bytes32) -> Optional[WalletCoinRecord]:
         """ Returns CoinRecord with specified coin id. """
-        if coin_name.hex() in self.coin_record_cache:
-            return self.coin_record_cache[coin_name.hex()]
+        if coin_name in self.coin_record_cache:
+            return self.coin_record_cache[coin_name]
         cursor = await self.db_connection.execute(
-            "SELECT * from coin_record WHERE coin_name=?", (coin_name.hex(),)
+            "SELECT * from coin_record WHERE coin_name=?", (coin_name,)
         )
         row = await cursor.fetchone()
         await cursor.close()
         if row is not None:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-            )
-            return WalletCoinRecord(
-                coin, row[1], row[2], row[3], row[4], WalletType(row[8]), row[9]
-            )
+            return self.row_to_coin_record(row)
         return None
 
     async def get_unspent_coins_at_height(
@@ -164,14 +166,7 @@ class WalletStore:
         rows = await cursor.fetchall()
         await cursor.close()
         for row in rows:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-            )
-            coins.add(
-                WalletCoinRecord(
-                    coin, row[1], row[2], row[3], row[4], WalletType(row[8]), row[9]
-                )
-            )
+            coins.add(self.row_to_coin_record(row))
         return coins
 
     async def get_unspent_coins_for_wallet(
@@ -186,14 +181,7 @@ class WalletStore:
         rows = await cursor.fetchall()
         await cursor.close()
         for row in rows:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-            )
-            coins.add(
-                WalletCoinRecord(
-                    coin, row[1], row[2], row[3], row[4], WalletType(row[8]), row[9]
-                )
-            )
+            coins.add(self.row_to_coin_record(row))
         return coins
 
     async def get_spendable_for_index(
@@ -222,14 +210,7 @@ class WalletStore:
         await cursor_regular_coins.close()
 
         for row in coinbase_rows + regular_rows:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-            )
-            coins.add(
-                WalletCoinRecord(
-                    coin, row[1], row[2], row[3], row[4], WalletType(row[8]), row[9]
-                )
-            )
+            coins.add(self.row_to_coin_record(row))
         return coins
 
     # Checks DB and DiffStores for CoinRecords with puzzle_hash and returns them
@@ -239,19 +220,12 @@ class WalletStore:
         """Returns a list of all coin records with the given puzzle hash"""
         coins = set()
         cursor = await self.db_connection.execute(
-            "SELECT * from coin_record WHERE puzzle_hash=?", (puzzle_hash.hex(),)
+            "SELECT * from coin_record WHERE puzzle_hash=?", (puzzle_hash,)
         )
         rows = await cursor.fetchall()
         await cursor.close()
         for row in rows:
-            coin = Coin(
-                bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-            )
-            coins.add(
-                WalletCoinRecord(
-                    coin, row[1], row[2], row[3], row[4], WalletType(row[8]), row[9]
-                )
-            )
+            coins.add(self.row_to_coin_record(row))
         return list(coins)
 
     async def get_coin_record_by_coin_id(
@@ -259,20 +233,20 @@ class WalletStore:
     ) -> Optional[WalletCoinRecord]:
         """Returns a coin records with the given name, if it exists"""
         cursor = await self.db_connection.execute(
-            "SELECT * from coin_record WHERE coin_name=?", (coin_id.hex(),)
+            "SELECT * from coin_record WHERE coin_name=?", (coin_id,)
         )
         row = await cursor.fetchone()
         await cursor.close()
         if row is None:
             return None
+        return self.row_to_coin_record(row)
 
-        coin = Coin(
-            bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), row[7]
-        )
-        coin_record = WalletCoinRecord(
+    @staticmethod
+    def row_to_coin_record(row) -> WalletCoinRecord:
+        coin = Coin(bytes32(row[6]), bytes32(row[5]), row[7])
+        return WalletCoinRecord(
             coin, row[1], row[2], row[3], row[4], WalletType(row[8]), row[9]
         )
-        return coin_record
 
     async def rollback_lca_to_block(self, block_index):
         """
@@ -293,7 +267,7 @@ class WalletStore:
                     coin_record.wallet_type,
                     coin_record.wallet_id,
                 )
-                self.coin_record_cache[coin_record.coin.name().hex()] = new_record
+                self.coin_record_cache[coin_name] = new_record
             if coin_record.confirmed_block_index > block_index:
                 delete_queue.append(coin_name)
 
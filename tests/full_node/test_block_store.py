@@ -13,7 +13,11 @@ from src.full_node.blockchain import Blockchain
 from src.types.full_block import FullBlock
 from src.types.sized_bytes import bytes32
 from src.util.ints import uint32, uint64
+from src.util.bundle_tools import best_solution_program
+from src.util.db_wrapper import DBWrapper
+from src.util.npc_cache import get_name_puzzle_conditions_cached, npc_cache
 from tests.block_tools import BlockTools
+from tests.wallet_tools import WalletTool
 
 bt = BlockTools()
 
@@ -68,6 +72,11 @@ class TestBlockStore:
             for block in blocks:
                 await db.add_block(block)
                 assert block == await db.get_block(block.header_hash)
+                # Blocks are read lazily, but serialize to the same bytes
+                lazy_block = await db.get_block(block.header_hash)
+                assert lazy_block is not None
+                assert lazy_block.height == block.height
+                assert bytes(lazy_block) == bytes(block)
 
             await db.add_block(blocks_alt[2])
             assert len(await db.get_blocks_at([1, 2])) == 3
@@ -142,3 +151,219 @@ class TestBlockStore:
         await asyncio.gather(*tasks)
         await connection.close()
         db_filename.unlink()
+
+    @pytest.mark.asyncio
+    async def test_npc_results(self):
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+        blocks = bt.get_consecutive_blocks(
+            test_constants, 3, [], 10, b"", coinbase_puzzlehash
+        )
+        spend_bundle = wallet_a.generate_signed_transaction(
+            1000, WalletTool().get_new_puzzlehash(), blocks[1].header.data.coinbase
+        )
+        assert spend_bundle is not None
+        program = best_solution_program(spend_bundle)
+        dic_h = {4: (program, spend_bundle.aggregated_signature)}
+        blocks = bt.get_consecutive_blocks(
+            test_constants, 1, blocks, 10, b"", coinbase_puzzlehash, dic_h
+        )
+
+        db_filename = Path("blockchain_test.db")
+        if db_filename.exists():
+            db_filename.unlink()
+        connection = await aiosqlite.connect(db_filename)
+        db = await BlockStore.create(connection)
+        coin_store = await CoinStore.create(connection)
+        b: Blockchain = await Blockchain.create(
+            coin_store, db, {**test_constants, "COINBASE_FREEZE_PERIOD": 0}
+        )
+        try:
+            npc_cache.clear()
+            for block in blocks:
+                result, _, error = await b.receive_block(block)
+                assert error is None
+            # The generator was run once, during validation
+            misses = npc_cache.misses
+            removals, additions = await blocks[4].tx_removals_and_additions()
+            assert removals == [spend_bundle.coin_solutions[0].coin.name()]
+            assert npc_cache.misses == misses
+
+            # The result of the validated block was stored along with it
+            npc_cache.clear()
+            block_4 = await db.get_block(blocks[4].header_hash)
+            assert block_4 is not None and block_4.transactions_generator is not None
+            misses = npc_cache.misses
+            _, npc_list, _ = get_name_puzzle_conditions_cached(
+                block_4.transactions_generator
+            )
+            assert npc_cache.misses == misses
+            assert [npc.coin_name for npc in npc_list] == removals
+            assert block_4.additions() == blocks[4].additions()
+        finally:
+            npc_cache.clear()
+            await connection.close()
+            db_filename.unlink()
+            b.shut_down()
+
+    @pytest.mark.asyncio
+    async def test_read_connections(self):
+        blocks = bt.get_consecutive_blocks(test_constants, 5, [], 9, b"0")
+        db_filename = Path("blockchain_test.db")
+        if db_filename.exists():
+            db_filename.unlink()
+
+        db_wrapper = await DBWrapper.create(db_filename, 2, "NORMAL", 1, 1)
+        try:
+            cursor = await db_wrapper.db.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "wal"
+            await cursor.close()
+            db = await BlockStore.create(db_wrapper.db, db_wrapper)
+            for block in blocks:
+                await db.add_block(block)
+
+            # The readers see the committed blocks, and are shared by concurrent requests
+            results = await asyncio.gather(
+                *[db.get_block(b.header_hash, use_reader=True) for b in blocks * 4]
+            )
+            assert results == blocks * 4
+            assert db_wrapper.available.qsize() == 2
+            assert (await db.get_block(bytes([1] * 32), use_reader=True)) is None
+            assert (
+                await db.get_blocks_at([uint32(1), uint32(2)], use_reader=True)
+            ) == blocks[1:3]
+
+            # Readers can not write
+            async with db_wrapper.reader() as reader:
+                with pytest.raises(sqlite3.OperationalError):
+                    await reader.execute("DELETE FROM blocks")
+        finally:
+            await db_wrapper.close()
+            for suffix in ["", "-wal", "-shm"]:
+                path = Path(f"{db_filename}{suffix}")
+                if path.exists():
+                    path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_split_tables(self):
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+        blocks = bt.get_consecutive_blocks(
+            test_constants, 3, [], 10, b"", coinbase_puzzlehash
+        )
+        spend_bundle = wallet_a.generate_signed_transaction(
+            1000, WalletTool().get_new_puzzlehash(), blocks[1].header.data.coinbase
+        )
+        assert spend_bundle is not None
+        program = best_solution_program(spend_bundle)
+        dic_h = {4: (program, spend_bundle.aggregated_signature)}
+        blocks = bt.get_consecutive_blocks(
+            test_constants, 2, blocks, 10, b"", coinbase_puzzlehash, dic_h
+        )
+        assert blocks[4].transactions_generator is not None
+
+        db_filename = Path("blockchain_test.db")
+        if db_filename.exists():
+            db_filename.unlink()
+        connection = await aiosqlite.connect(db_filename)
+        try:
+            db = await BlockStore.create(connection)
+            for block in blocks:
+                await db.add_block(block)
+            await db.set_lca(blocks[4].header_hash)
+            await db.set_tips([blocks[4].header_hash])
+            cursor = await connection.execute("SELECT count(*) from generators")
+            assert (await cursor.fetchone())[0] == 1
+            await cursor.close()
+
+            # Converts the database to the schema in which blocks are stored in one blob
+            await connection.execute("DROP TABLE blocks")
+            await connection.execute("DROP TABLE generators")
+            await connection.execute(
+                "CREATE TABLE blocks(height bigint, header_hash text PRIMARY KEY, block blob)"
+            )
+            await connection.executemany(
+                "INSERT INTO blocks VALUES(?, ?, ?)",
+                [(b.height, b.header_hash.hex(), bytes(b)) for b in blocks],
+            )
+            await connection.commit()
+            db = await BlockStore.create(connection)
+            cursor = await connection.execute("SELECT count(*) from generators")
+            assert (await cursor.fetchone())[0] == 1
+            await cursor.close()
+
+            for block in blocks:
+                stored = await db.get_block(block.header_hash)
+                assert stored is not None and bytes(stored) == bytes(block)
+            assert (await db.get_blocks_at([uint32(4)])) == [blocks[4]]
+
+            parts = await db.get_header_block_parts(blocks[4].header_hash)
+            assert parts == (
+                blocks[4].proof_of_space,
+                blocks[4].proof_of_time,
+                blocks[4].header,
+                blocks[4].transactions_filter,
+            )
+            assert (await db.get_header_block_parts(bytes([1] * 32))) is None
+
+            # Blocks of a fork at heights 3 and 4
+            fork = bt.get_consecutive_blocks(test_constants, 2, blocks[:3], 9, b"1")
+            for block in fork[3:]:
+                await db.add_block(block)
+            # From height 1 to 4 included, by height and header hash, in pages of 2
+            in_range = [
+                parts
+                async for parts in db.get_header_blocks_in_range(
+                    uint32(1), uint32(4), page_size=2
+                )
+            ]
+            assert [(p[2].height, p[2].header_hash.hex()) for p in in_range] == sorted(
+                (block.height, block.header_hash.hex())
+                for block in blocks[1:5] + fork[3:5]
+            )
+            assert (
+                blocks[4].proof_of_space,
+                blocks[4].proof_of_time,
+                blocks[4].header,
+                blocks[4].transactions_filter,
+            ) in in_range
+            for start, end, count in [(4, 4, 2), (0, 0, 1), (6, 10, 0), (3, 2, 0)]:
+                assert (
+                    len(
+                        [
+                            parts
+                            async for parts in db.get_header_blocks_in_range(
+                                uint32(start), uint32(end), page_size=1
+                            )
+                        ]
+                    )
+                    == count
+                )
+
+            b: Blockchain = await Blockchain.create(
+                await CoinStore.create(connection),
+                db,
+                {**test_constants, "COINBASE_FREEZE_PERIOD": 0},
+            )
+            try:
+                # Only the blocks of the chain of the LCA
+                header_blocks = [
+                    header_block
+                    async for header_block in b.get_header_blocks_in_range(
+                        uint32(0), uint32(4)
+                    )
+                ]
+                assert header_blocks == [
+                    b.get_header_block(block) for block in blocks[:5]
+                ]
+                for block in blocks[:4]:
+                    parts = await db.get_header_block_parts(block.header_hash)
+                    assert parts is not None
+                    assert b.get_header_block_from_parts(
+                        parts[0], parts[1], parts[2]
+                    ) == b.get_header_block(block)
+            finally:
+                b.shut_down()
+        finally:
+            await connection.close()
+            db_filename.unlink()
@@ -8,6 +8,11 @@ import pytest
 from blspy import PrivateKey
 
 from src.full_node.blockchain import Blockchain, ReceiveBlockResult
+from src.full_node.chain_snapshot import (
+    SnapshotRecords,
+    read_chain_snapshot,
+    write_chain_snapshot,
+)
 from src.types.full_block import FullBlock
 from src.types.header import Header, HeaderData
 from src.types.proof_of_space import ProofOfSpace
@@ -698,3 +703,135 @@ class TestReorgs:
 
         await connection.close()
         b.shut_down()
+
+
+class TestChainSnapshot:
+    def test_snapshot_records(self):
+        records = [
+            (bytes32([i] * 32), bytes32([i + 1] * 32), uint64(i * 1000))
+            for i in range(5)
+        ]
+        packed = SnapshotRecords(records[:3])
+        packed.extend(records[3:])
+        assert len(packed) == 5 and list(packed) == records and packed == records
+        assert packed[-1] == records[4] and isinstance(packed[2][0], bytes32)
+        assert packed[1:3] == records[1:3] and len(packed[4:2]) == 0
+        with pytest.raises(IndexError):
+            packed[5]
+        copy = packed.copy()
+        packed.truncate(2)
+        packed.append(records[4])
+        assert packed == [records[0], records[1], records[4]]
+        assert copy == SnapshotRecords(records)
+
+    @pytest.mark.asyncio
+    async def test_snapshot(self):
+        blocks = bt.get_consecutive_blocks(test_constants, 20, [], 9, b"0")
+        db_path = Path("blockchain_test.db")
+        snapshot_path = Path("blockchain_test.snapshot")
+        for path in [db_path, snapshot_path]:
+            if path.exists():
+                path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        b: Blockchain = await Blockchain.create(
+            await CoinStore.create(connection),
+            await BlockStore.create(connection),
+            test_constants,
+            snapshot_path,
+            5,
+        )
+        for i in range(1, 20):
+            await b.receive_block(blocks[i])
+            if b._snapshot_task is not None:
+                await b._snapshot_task
+        b.shut_down()
+        # The LCA is at 17, since the three tips are 17, 18 and 19
+        assert b.lca_block.height == 17 and b.snapshot_height == 15
+        assert read_chain_snapshot(snapshot_path, blocks[0].header_hash) is not None
+
+        async def create(with_snapshot: bool) -> Blockchain:
+            return await Blockchain.create(
+                await CoinStore.create(connection),
+                await BlockStore.create(connection),
+                test_constants,
+                snapshot_path if with_snapshot else None,
+            )
+
+        def assert_same(b_1: Blockchain, b_2: Blockchain):
+            assert b_1.lca_block == b_2.lca_block
+            assert b_1.tips == b_2.tips
+            assert b_1.headers == b_2.headers
+            assert b_1.height_to_hash == b_2.height_to_hash
+            assert (
+                b_1.block_store.proof_of_time_heights
+                == b_2.block_store.proof_of_time_heights
+            )
+            assert b_1.snapshot_records == b_2.snapshot_records
+
+        reference = await create(False)
+        reference.shut_down()
+        assert len(reference.snapshot_records) == 18
+        # The blocks above the snapshot are loaded from the database
+        loaded = await create(True)
+        assert_same(loaded, reference)
+        for i in range(20, 21):
+            result, _, error_code = await loaded.receive_block(blocks[i])
+            assert result == ReceiveBlockResult.ADDED_TO_HEAD
+
+        # After a reorg below the snapshot, the challenge hashes of the blocks, which are not
+        # loaded from the database, are read when the snapshot is written
+        assert blocks[3].header_hash not in loaded.block_store.challenge_hash_dict
+        loaded.snapshot_records.truncate(3)
+        loaded.snapshot_interval = 1
+        await loaded._maybe_write_snapshot()
+        assert loaded._snapshot_task is not None
+        await loaded._snapshot_task
+        assert loaded.lca_block.height == 18
+        assert loaded.snapshot_records[:18] == reference.snapshot_records
+        assert loaded.snapshot_records[18][0] == blocks[18].header_hash
+        snapshot = read_chain_snapshot(snapshot_path, blocks[0].header_hash)
+        assert snapshot is not None and snapshot[0] == loaded.snapshot_records
+        loaded.shut_down()
+
+        snapshot = read_chain_snapshot(snapshot_path, blocks[0].header_hash)
+        assert snapshot is not None
+        records, headers = snapshot
+
+        # The proofs of time below the snapshot are not read from the database
+        challenge_hash = bytes32([2] * 32)
+        write_chain_snapshot(
+            snapshot_path,
+            blocks[0].header_hash,
+            records[:3]
+            + [(records[3][0], challenge_hash, records[3][2])]
+            + records[4:],
+            headers,
+        )
+        loaded = await create(True)
+        loaded.shut_down()
+        assert (
+            loaded.block_store.get_height_proof_of_time(challenge_hash, records[3][2])
+            == 3
+        )
+
+        # A snapshot of a chain which is not the chain of the LCA is not used
+        records[-1] = (bytes32([1] * 32), records[-1][1], records[-1][2])
+        write_chain_snapshot(snapshot_path, blocks[0].header_hash, records, headers)
+        reference = await create(False)
+        reference.shut_down()
+        loaded = await create(True)
+        loaded.shut_down()
+        assert_same(loaded, reference)
+
+        # Neither is a corrupted snapshot
+        data = bytearray(snapshot_path.read_bytes())
+        data[-1] ^= 1
+        snapshot_path.write_bytes(bytes(data))
+        assert read_chain_snapshot(snapshot_path, blocks[0].header_hash) is None
+        loaded = await create(True)
+        loaded.shut_down()
+        assert_same(loaded, reference)
+
+        await connection.close()
+        db_path.unlink()
+        snapshot_path.unlink()
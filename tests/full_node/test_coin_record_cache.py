@@ -0,0 +1,67 @@
+import unittest
+
+from src.full_node.coin_record_cache import CoinRecordCache
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32, uint64
+
+
+def make_record(i: int, confirmed: int, spent: int = 0) -> CoinRecord:
+    coin = Coin(bytes32([i] * 32), bytes32([0] * 32), uint64(i))
+    return CoinRecord(coin, uint32(confirmed), uint32(spent), spent > 0, False)
+
+
+class TestCoinRecordCache(unittest.TestCase):
+    def test_lru(self):
+        cache = CoinRecordCache(2)
+        records = [make_record(i, i) for i in range(3)]
+        cache.put(records[0].name, records[0])
+        cache.put(records[1].name, records[1])
+        # Using the first record makes the second one the least recently used
+        assert cache.get(records[0].name) == (True, records[0])
+        cache.put(records[2].name, records[2])
+        assert cache.get(records[1].name) == (False, None)
+        assert cache.get(records[2].name) == (True, records[2])
+        assert len(cache) == 2 and cache.evictions == 1
+        # Evicted records are also removed from the height index
+        assert 1 not in cache.confirmed_at
+
+    def test_negative_entries(self):
+        cache = CoinRecordCache(10)
+        record = make_record(1, 5)
+        cache.put_missing(record.name)
+        assert cache.get(record.name) == (True, None)
+        cache.put(record.name, record)
+        assert cache.get(record.name) == (True, record)
+        stats = cache.get_stats()
+        assert stats["hits"] == 2 and stats["negative_hits"] == 1
+        assert stats["misses"] == 0 and stats["size"] == 1
+
+    def test_rollback(self):
+        cache = CoinRecordCache(10)
+        kept = make_record(1, 3)
+        spent_after = make_record(2, 3, 6)
+        confirmed_after = make_record(3, 6, 7)
+        missing = bytes32([9] * 32)
+        cache.update(
+            {
+                kept.name: kept,
+                spent_after.name: spent_after,
+                confirmed_after.name: confirmed_after,
+            }
+        )
+        cache.put_missing(missing)
+
+        cache.rollback(uint32(5))
+        assert cache.get(kept.name) == (True, kept)
+        assert cache.get(spent_after.name) == (True, make_record(2, 3))
+        assert cache.get(confirmed_after.name) == (False, None)
+        assert cache.get(missing) == (True, None)
+        assert cache.max_height == 5
+        assert set(cache.spent_at.keys()) == set()
+
+        # Records added after the rollback are indexed again
+        cache.put(confirmed_after.name, confirmed_after)
+        cache.rollback(uint32(3))
+        assert cache.get(confirmed_after.name) == (False, None)
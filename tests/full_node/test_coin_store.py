@@ -1,5 +1,6 @@
 import asyncio
-from typing import Any, Dict
+from secrets import token_bytes
+from typing import Any, Dict, List
 from pathlib import Path
 
 import aiosqlite
@@ -8,7 +9,12 @@ import pytest
 from src.full_node.blockchain import Blockchain, ReceiveBlockResult
 from src.full_node.coin_store import CoinStore
 from src.full_node.block_store import BlockStore
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32
+from src.util.bundle_tools import best_solution_program
 from tests.block_tools import BlockTools
+from tests.wallet_tools import WalletTool
 from src.consensus.constants import constants as consensus_constants
 
 bt = BlockTools()
@@ -30,6 +36,26 @@ test_constants["GENESIS_BLOCK"] = bytes(
 )
 
 
+def blocks_with_transaction():
+    """
+    Returns a chain where block 4 spends the coinbase of block 1.
+    """
+    wallet_a = WalletTool()
+    coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+    blocks = bt.get_consecutive_blocks(
+        test_constants, 3, [], 9, b"", coinbase_puzzlehash
+    )
+    spend_bundle = wallet_a.generate_signed_transaction(
+        1000, WalletTool().get_new_puzzlehash(), blocks[1].header.data.coinbase
+    )
+    assert spend_bundle is not None
+    program = best_solution_program(spend_bundle)
+    dic_h = {4: (program, spend_bundle.aggregated_signature)}
+    return bt.get_consecutive_blocks(
+        test_constants, 3, blocks, 9, b"", coinbase_puzzlehash, dic_h
+    )
+
+
 @pytest.fixture(scope="module")
 def event_loop():
     loop = asyncio.get_event_loop()
@@ -86,6 +112,36 @@ class TestCoinStore:
         await connection.close()
         Path("fndb_test.db").unlink()
 
+    @pytest.mark.asyncio
+    async def test_get_coin_records(self):
+        blocks = blocks_with_transaction()
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        db = await CoinStore.create(connection)
+        await db.add_lcas(blocks)
+
+        names = []
+        for block in blocks:
+            names.append(block.header.data.coinbase.name())
+            names.append(block.header.data.fees_coin.name())
+        # Unknown coins, which are read in several batches
+        unknown = [bytes32(token_bytes(32)) for _ in range(2000)]
+        expected = {name: await db.get_coin_record(name) for name in names}
+        assert expected[blocks[1].header.data.coinbase.name()].spent
+
+        # From the DB, and then from the cache, including the unknown coins
+        db.lca_coin_records.clear()
+        for _ in range(2):
+            misses = db.lca_coin_records.misses
+            assert await db.get_coin_records(names + unknown) == expected
+        assert db.lca_coin_records.misses == misses
+        assert db.lca_coin_records.negative_hits == len(unknown)
+
+        await connection.close()
+        db_path.unlink()
+
     @pytest.mark.asyncio
     async def test_rollback(self):
         blocks = bt.get_consecutive_blocks(test_constants, 9, [], 9, b"0")
@@ -127,6 +183,169 @@ class TestCoinStore:
         await connection.close()
         Path("fndb_test.db").unlink()
 
+    @pytest.mark.asyncio
+    async def test_add_lcas(self):
+        blocks = blocks_with_transaction()
+        db_paths = [Path("fndb_test.db"), Path("fndb_test_2.db")]
+        for db_path in db_paths:
+            if db_path.exists():
+                db_path.unlink()
+        connection = await aiosqlite.connect(db_paths[0])
+        connection_2 = await aiosqlite.connect(db_paths[1])
+        db = await CoinStore.create(connection)
+        db_batch = await CoinStore.create(connection_2)
+
+        # One block at a time, and all blocks in one batch
+        for block in blocks:
+            await db.new_lca(block)
+        await db_batch.add_lcas(blocks)
+
+        removals, additions = await blocks[4].tx_removals_and_additions()
+        assert removals == [blocks[1].header.data.coinbase.name()]
+        spent = await db_batch.get_coin_record(removals[0])
+        assert spent is not None and spent.spent and spent.spent_block_index == 4
+        for block in blocks:
+            _, additions = await block.tx_removals_and_additions()
+            coins = additions + [
+                block.header.data.coinbase,
+                block.header.data.fees_coin,
+            ]
+            for coin in coins:
+                record = await db.get_coin_record(coin.name())
+                assert (
+                    record is not None and record.confirmed_block_index == block.height
+                )
+                assert record == await db_batch.get_coin_record(coin.name())
+
+        # The records in the DB are the same as in the ram cache
+        db_batch.lca_coin_records.clear()
+        assert spent == await db_batch.get_coin_record(removals[0])
+
+        await connection.close()
+        await connection_2.close()
+        for db_path in db_paths:
+            db_path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_add_lcas_crash_safety(self):
+        blocks = blocks_with_transaction()
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        db = await CoinStore.create(connection)
+        await db.add_lcas(blocks[:4])
+        commit = connection.commit
+
+        async def failing_commit():
+            raise RuntimeError("Commit failed")
+
+        # A failed batch is rolled back, and not added to the ram cache
+        connection.commit = failing_commit  # type: ignore
+        with pytest.raises(RuntimeError):
+            await db.add_lcas(blocks[4:])
+        connection.commit = commit  # type: ignore
+        spent_coin = blocks[1].header.data.coinbase.name()
+        for coin_store in [db, await CoinStore.create(connection)]:
+            assert (await coin_store.get_coin_record(spent_coin)).spent == 0
+            for block in blocks[4:]:
+                coinbase = block.header.data.coinbase.name()
+                assert await coin_store.get_coin_record(coinbase) is None
+
+        # The node stops after the batch is written, but before it is committed
+        async def no_commit():
+            pass
+
+        connection.commit = no_commit  # type: ignore
+        await db.add_lcas(blocks[4:])
+        await connection.close()
+
+        connection = await aiosqlite.connect(db_path)
+        db = await CoinStore.create(connection)
+        for block in blocks[:4]:
+            coinbase = block.header.data.coinbase.name()
+            assert await db.get_coin_record(coinbase) is not None
+        assert (await db.get_coin_record(spent_coin)).spent == 0
+        for block in blocks[4:]:
+            assert await db.get_coin_record(block.header.data.coinbase.name()) is None
+
+        # Applying the batch again after the restart works
+        await db.add_lcas(blocks[4:])
+        assert (await db.get_coin_record(spent_coin)).spent_block_index == 4
+
+        await connection.close()
+        db_path.unlink()
+
+    @pytest.mark.asyncio
+    async def test_migrate_hex_schema(self):
+        blocks = bt.get_consecutive_blocks(test_constants, 3, [], 9, b"0")
+        db_path = Path("fndb_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        # The schema from before the migration, with hashes as hex text
+        await connection.execute(
+            "CREATE TABLE coin_record(coin_name text PRIMARY KEY, confirmed_index bigint, "
+            "spent_index bigint, spent int, coinbase int, puzzle_hash text, coin_parent text, "
+            "amount bigint)"
+        )
+        await connection.execute(
+            "CREATE INDEX coin_spent_index on coin_record(spent_index)"
+        )
+        for block in blocks:
+            coin = block.header.data.coinbase
+            await connection.execute(
+                "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    coin.name().hex(),
+                    block.height,
+                    block.height + 1,
+                    1,
+                    1,
+                    coin.puzzle_hash.hex(),
+                    coin.parent_coin_info.hex(),
+                    coin.amount,
+                ),
+            )
+        await connection.commit()
+
+        async def failing_executemany(*args):
+            raise RuntimeError("Stopped during migration")
+
+        # A migration which does not finish leaves the old table unchanged
+        executemany = connection.executemany
+        connection.executemany = failing_executemany  # type: ignore
+        with pytest.raises(RuntimeError):
+            await CoinStore.create(connection)
+        connection.executemany = executemany  # type: ignore
+        cursor = await connection.execute("SELECT coin_name from coin_record")
+        assert len(await cursor.fetchall()) == len(blocks)
+        await cursor.close()
+
+        db = await CoinStore.create(connection)
+        cursor = await connection.execute("PRAGMA table_info(coin_record)")
+        column_types = [row[2].lower() for row in await cursor.fetchall()]
+        await cursor.close()
+        assert column_types[0] == "blob" and column_types[5] == "blob"
+        for block in blocks:
+            record = await db.get_coin_record(block.header.data.coinbase.name())
+            assert record is not None
+            assert record.coin == block.header.data.coinbase
+            assert record.spent and record.spent_block_index == block.height + 1
+        records = await db.get_coin_records_by_puzzle_hash(
+            blocks[0].header.data.coinbase.puzzle_hash
+        )
+        assert len(records) == len(blocks)
+
+        # Creating the store again does not migrate again
+        db = await CoinStore.create(connection)
+        assert len(
+            await db.get_coin_records_by_puzzle_hash(records[0].coin.puzzle_hash)
+        ) == len(blocks)
+
+        await connection.close()
+        db_path.unlink()
+
     @pytest.mark.asyncio
     async def test_basic_reorg(self):
         blocks = bt.get_consecutive_blocks(test_constants, 100, [], 9)
@@ -189,6 +408,140 @@ class TestCoinStore:
         Path("blockchain_test.db").unlink()
         b.shut_down()
 
+    @pytest.mark.asyncio
+    async def test_incremental_diffs(self):
+        blocks = blocks_with_transaction()
+        fork = bt.get_consecutive_blocks(test_constants, 3, blocks[:3], 9, b"1")
+        db_path = Path("blockchain_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        coin_store = await CoinStore.create(connection)
+        store = await BlockStore.create(connection)
+        # Block 4 spends the coinbase of block 1
+        constants = {**test_constants, "COINBASE_FREEZE_PERIOD": 0}
+        b: Blockchain = await Blockchain.create(coin_store, store, constants)
+        try:
+            for block in blocks[1:] + fork[3:]:
+                await b.receive_block(block)
+            assert b.lca_block == blocks[2].header
+            tip, fork_tip = blocks[-1].header, fork[-1].header
+            # The coinbase of block 1 is unspent in the fork
+            spent_name = blocks[1].header.data.coinbase.name()
+            assert (await coin_store.get_coin_record(spent_name, tip)).spent
+            assert not (await coin_store.get_coin_record(spent_name, fork_tip)).spent
+            assert set(coin_store.block_diffs.keys()) == set(
+                block.header_hash for block in blocks[3:] + fork[3:]
+            )
+
+            # A child of a tip only adds its own DiffStore. The fork is not a tip anymore,
+            # so the LCA moves forward, and the DiffStores up to it are removed.
+            diff_store = coin_store.head_diffs[tip.header_hash]
+            blocks = bt.get_consecutive_blocks(test_constants, 1, blocks, 9, b"")
+            await b.receive_block(blocks[-1])
+            tip = blocks[-1].header
+            assert b.lca_block == blocks[5].header
+            assert coin_store.head_diffs[tip.header_hash].parent is diff_store
+            assert diff_store.parent is None
+            assert set(coin_store.block_diffs.keys()) == set(
+                block.header_hash for block in blocks[6:]
+            )
+            assert (await coin_store.get_coin_record(spent_name, tip)).spent
+            for block in blocks:
+                coinbase_name = block.header.data.coinbase.name()
+                record = await coin_store.get_coin_record(coinbase_name, tip)
+                assert record.confirmed_block_index == block.height
+
+            # The DiffStores have the same records as when they are created again
+            records = {h: d.get_all() for h, d in coin_store.head_diffs.items()}
+            await b.recreate_diff_stores()
+            assert records == {h: d.get_all() for h, d in coin_store.head_diffs.items()}
+        except Exception as e:
+            await connection.close()
+            Path("blockchain_test.db").unlink()
+            b.shut_down()
+            raise e
+
+        await connection.close()
+        Path("blockchain_test.db").unlink()
+        b.shut_down()
+
+    @pytest.mark.asyncio
+    async def test_get_puzzle_hashes(self):
+        blocks = blocks_with_transaction()
+        fork = bt.get_consecutive_blocks(test_constants, 3, blocks[:3], 9, b"1")
+        db_path = Path("blockchain_test.db")
+        if db_path.exists():
+            db_path.unlink()
+        connection = await aiosqlite.connect(db_path)
+        coin_store = await CoinStore.create(connection)
+        store = await BlockStore.create(connection)
+        constants = {**test_constants, "COINBASE_FREEZE_PERIOD": 0}
+        b: Blockchain = await Blockchain.create(coin_store, store, constants)
+        try:
+            for block in blocks[1:] + fork[3:]:
+                await b.receive_block(block)
+            assert b.lca_block == blocks[2].header
+            tip = blocks[-1].header
+            spent_name = blocks[1].header.data.coinbase.name()
+            puzzle_hash = blocks[1].header.data.coinbase.puzzle_hash
+            # Many puzzle hashes are queried in batches
+            puzzle_hashes = [bytes32(token_bytes(32)) for _ in range(2000)]
+            puzzle_hashes.append(puzzle_hash)
+
+            records, cursor = await coin_store.get_coin_records_by_puzzle_hashes(
+                puzzle_hashes, tip
+            )
+            assert cursor is None
+            # The coinbase and fees coin of blocks 1 to 6, which are unique
+            assert len(records) == 12 == len(set(r.name for r in records))
+            assert records == sorted(
+                records, key=lambda r: (r.confirmed_block_index, r.name)
+            )
+            assert [r.spent for r in records if r.name == spent_name] == [True]
+
+            unspent, _ = await coin_store.get_coin_records_by_puzzle_hashes(
+                puzzle_hashes, tip, include_spent_coins=False
+            )
+            assert unspent == [r for r in records if r.name != spent_name]
+
+            # At the LCA, the coin is not spent yet
+            lca_unspent, _ = await coin_store.get_coin_records_by_puzzle_hashes(
+                [puzzle_hash], include_spent_coins=False
+            )
+            assert spent_name in [r.name for r in lca_unspent]
+            assert all(r.confirmed_block_index <= 2 for r in lca_unspent)
+
+            page, _ = await coin_store.get_coin_records_by_puzzle_hashes(
+                [puzzle_hash], tip, True, uint32(2), uint32(5)
+            )
+            assert page == [r for r in records if 2 <= r.confirmed_block_index < 5]
+
+            # Pages of 5 records, from the DB and from the DiffStores, resume at the cursor
+            pages: List[List[CoinRecord]] = []
+            cursor = None
+            while len(pages) == 0 or cursor is not None:
+                page, cursor = await coin_store.get_coin_records_by_puzzle_hashes(
+                    puzzle_hashes, tip, limit=5, start_after=cursor
+                )
+                pages.append(page)
+            assert [len(page) for page in pages] == [5, 5, 2]
+            assert [r for page in pages for r in page] == records
+            for limit in [0, -1]:
+                with pytest.raises(AssertionError):
+                    await coin_store.get_coin_records_by_puzzle_hashes(
+                        puzzle_hashes, tip, limit=limit
+                    )
+        except Exception as e:
+            await connection.close()
+            Path("blockchain_test.db").unlink()
+            b.shut_down()
+            raise e
+
+        await connection.close()
+        Path("blockchain_test.db").unlink()
+        b.shut_down()
+
     @pytest.mark.asyncio
     async def test_get_puzzle_hash(self):
         num_blocks = 20
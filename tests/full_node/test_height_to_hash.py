@@ -0,0 +1,52 @@
+import unittest
+
+import pytest
+
+from src.full_node.height_to_hash import HeightToHash
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32
+
+
+def make_hash(i: int) -> bytes32:
+    return bytes32([i] * 32)
+
+
+class TestHeightToHash(unittest.TestCase):
+    def test_mapping(self):
+        height_to_hash = HeightToHash(make_hash(i) for i in range(3))
+        height_to_hash[uint32(3)] = make_hash(3)
+        height_to_hash[uint32(1)] = make_hash(10)
+        assert len(height_to_hash) == 4
+        assert height_to_hash[uint32(1)] == make_hash(10)
+        assert isinstance(height_to_hash[uint32(3)], bytes32)
+        assert list(height_to_hash) == [0, 1, 2, 3]
+        assert 3 in height_to_hash and 4 not in height_to_hash
+        assert height_to_hash.get(uint32(4)) is None
+        with pytest.raises(KeyError):
+            height_to_hash[uint32(4)]
+        # Heights are only added at the top
+        with pytest.raises(IndexError):
+            height_to_hash[uint32(5)] = make_hash(5)
+        assert height_to_hash == HeightToHash(
+            [make_hash(0), make_hash(10), make_hash(2), make_hash(3)]
+        )
+        assert dict(height_to_hash) == {
+            0: make_hash(0),
+            1: make_hash(10),
+            2: make_hash(2),
+            3: make_hash(3),
+        }
+
+    def test_truncate_and_range(self):
+        height_to_hash = HeightToHash(make_hash(i) for i in range(10))
+        with height_to_hash.get_range(2, 4) as view:
+            assert bytes(view) == make_hash(2) + make_hash(3)
+        assert height_to_hash.get_hashes(8, 12) == [make_hash(8), make_hash(9)]
+        height_to_hash.truncate(5)
+        height_to_hash.append(make_hash(20))
+        assert len(height_to_hash) == 6
+        assert height_to_hash.get_hashes(3, 6) == [
+            make_hash(3),
+            make_hash(4),
+            make_hash(20),
+        ]
@@ -10,9 +10,11 @@ from clvm_tools import binutils
 from src.server.outbound_message import OutboundMessage
 from src.protocols import full_node_protocol
 from src.types.BLSSignature import BLSSignature
+from src.types.coin import Coin
 from src.types.coin_solution import CoinSolution
 from src.types.condition_var_pair import ConditionVarPair
 from src.types.condition_opcodes import ConditionOpcode
+from src.types.mempool_inclusion_status import MempoolInclusionStatus
 from src.types.program import Program
 from src.types.spend_bundle import SpendBundle
 from src.util.condition_tools import (
@@ -20,7 +22,8 @@ from src.util.condition_tools import (
     conditions_by_opcode,
     hash_key_pairs_for_conditions_dict,
 )
-from src.util.ints import uint64
+from src.util.errors import Err
+from src.util.ints import uint32, uint64
 from tests.setup_nodes import setup_two_nodes, test_constants, bt
 from tests.wallet_tools import WalletTool
 
@@ -76,6 +79,89 @@ class TestMempool:
         sb = full_node_1.mempool_manager.get_spendbundle(spend_bundle.name())
         assert sb is spend_bundle
 
+    @pytest.mark.asyncio
+    async def test_new_tips_reuse_items(self, two_nodes):
+        num_blocks = 3
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+        wallet_receiver = WalletTool()
+        receiver_puzzlehash = wallet_receiver.get_new_puzzlehash()
+
+        blocks = bt.get_consecutive_blocks(
+            test_constants, num_blocks, [], 10, b"", coinbase_puzzlehash
+        )
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+
+        async for _ in full_node_1.respond_block(
+            full_node_protocol.RespondBlock(blocks[1])
+        ):
+            pass
+
+        spend_bundle = wallet_a.generate_signed_transaction(
+            1000, receiver_puzzlehash, blocks[1].header.data.coinbase
+        )
+        assert spend_bundle is not None
+        tx: full_node_protocol.RespondTransaction = full_node_protocol.RespondTransaction(
+            spend_bundle
+        )
+        async for _ in full_node_1.respond_transaction(tx):
+            pass
+        mempool_manager = full_node_1.mempool_manager
+        item = mempool_manager.items[spend_bundle.name()]
+
+        async for _ in full_node_1.respond_block(
+            full_node_protocol.RespondBlock(blocks[2])
+        ):
+            pass
+
+        # The mempool of the new tip shares the item validated for the previous tip
+        pool = mempool_manager.mempools[blocks[2].header_hash]
+        assert pool.spends[spend_bundle.name()] is item
+        assert mempool_manager.items[spend_bundle.name()] is item
+
+    @pytest.mark.asyncio
+    async def test_validation_caches(self, two_nodes):
+        num_blocks = 2
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+        wallet_receiver = WalletTool()
+        receiver_puzzlehash = wallet_receiver.get_new_puzzlehash()
+
+        blocks = bt.get_consecutive_blocks(
+            test_constants, num_blocks, [], 10, b"", coinbase_puzzlehash
+        )
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+
+        block = blocks[1]
+        async for _ in full_node_1.respond_block(
+            full_node_protocol.RespondBlock(block)
+        ):
+            pass
+
+        spend_bundle = wallet_a.generate_signed_transaction(
+            1000, receiver_puzzlehash, block.header.data.coinbase
+        )
+        other_bundle = wallet_a.generate_signed_transaction(
+            2000, receiver_puzzlehash, block.header.data.coinbase
+        )
+        assert spend_bundle is not None and other_bundle is not None
+        bad_bundle = SpendBundle(
+            spend_bundle.coin_solutions, other_bundle.aggregated_signature
+        )
+        mempool_manager = full_node_1.mempool_manager
+
+        # The bundle is only run, and its signature verified, the first time
+        for i in range(2):
+            cost, status, error = await mempool_manager.add_spendbundle(bad_bundle)
+            assert status == MempoolInclusionStatus.FAILED
+            assert error == Err.BAD_AGGREGATE_SIGNATURE
+            assert mempool_manager.validation_cache.hits == i
+            assert mempool_manager.signature_cache.hits == i
+
+        cost, status, error = await mempool_manager.add_spendbundle(spend_bundle)
+        assert status == MempoolInclusionStatus.SUCCESS
+        assert mempool_manager.signature_cache.misses == 2
+
     @pytest.mark.asyncio
     async def test_coinbase_freeze(self, two_nodes_standard_freeze):
         num_blocks = 2
@@ -225,6 +311,126 @@ class TestMempool:
         assert sb1 is None
         assert sb2 == spend_bundle2
 
+    @pytest.mark.asyncio
+    async def test_chained_spends(self, two_nodes):
+        num_blocks = 3
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+
+        blocks = bt.get_consecutive_blocks(
+            test_constants, num_blocks, [], 10, b"", coinbase_puzzlehash
+        )
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+        mempool_manager = full_node_1.mempool_manager
+        max_ancestors = mempool_manager.max_ancestors
+
+        async for _ in full_node_1.respond_block(
+            full_node_protocol.RespondBlock(blocks[1])
+        ):
+            pass
+
+        # Each bundle spends the coin added by the previous one, with a higher fee, so the
+        # children are worth more than their parents
+        coin = blocks[1].header.data.coinbase
+        chain: List[SpendBundle] = []
+        for i in range(max_ancestors + 1):
+            spend_bundle = wallet_a.generate_signed_transaction(
+                coin.amount - i - 1, wallet_a.get_new_puzzlehash(), coin, fee=i + 1
+            )
+            assert spend_bundle is not None
+            chain.append(spend_bundle)
+            coin = spend_bundle.additions()[0]
+
+        pool = mempool_manager.mempools[blocks[1].header_hash]
+        for spend_bundle in chain[:-1]:
+            cost, status, error = await mempool_manager.add_spendbundle(spend_bundle)
+            assert status == MempoolInclusionStatus.SUCCESS
+        cost, status, error = await mempool_manager.add_spendbundle(chain[-1], pool)
+        assert status == MempoolInclusionStatus.FAILED
+        assert error == Err.MEMPOOL_PACKAGE_TOO_LARGE
+
+        assert pool.packages[chain[0].name()].descendant_count == max_ancestors
+        assert pool.packages[chain[-2].name()].ancestor_count == max_ancestors
+
+        # The chain is added again to the mempool of a new tip, parents first
+        async for _ in full_node_1.respond_block(
+            full_node_protocol.RespondBlock(blocks[2])
+        ):
+            pass
+        pool = mempool_manager.mempools[blocks[2].header_hash]
+        assert set(pool.spends) == {spend_bundle.name() for spend_bundle in chain[:-1]}
+
+        block_bundle = await mempool_manager.create_bundle_for_tip(blocks[2].header)
+        assert block_bundle is not None
+        assert block_bundle.removal_names() == [
+            spend_bundle.removal_names()[0] for spend_bundle in chain[:-1]
+        ]
+
+        # A conflicting spend of the first coin with a higher fee removes the whole chain
+        coin = blocks[1].header.data.coinbase
+        conflicting = wallet_a.generate_signed_transaction(
+            coin.amount - 1000, wallet_a.get_new_puzzlehash(), coin, fee=1000
+        )
+        assert conflicting is not None
+        cost, status, error = await mempool_manager.add_spendbundle(conflicting)
+        assert status == MempoolInclusionStatus.SUCCESS
+        assert set(pool.spends) == {conflicting.name()}
+        assert len(pool.additions) == len(pool.packages) == 1
+
+    @pytest.mark.asyncio
+    async def test_eviction_with_ancestors(self, two_nodes):
+        num_blocks = 2
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+
+        blocks = bt.get_consecutive_blocks(
+            test_constants, num_blocks, [], 10, b"", coinbase_puzzlehash
+        )
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+        mempool_manager = full_node_1.mempool_manager
+
+        async for _ in full_node_1.respond_block(
+            full_node_protocol.RespondBlock(blocks[1])
+        ):
+            pass
+        pool = mempool_manager.mempools[blocks[1].header_hash]
+        pool.size = uint32(2)
+
+        def spend(coin: Coin, fee: int) -> SpendBundle:
+            spend_bundle = wallet_a.generate_signed_transaction(
+                coin.amount - fee, wallet_a.get_new_puzzlehash(), coin, fee=fee
+            )
+            assert spend_bundle is not None
+            return spend_bundle
+
+        parent = spend(blocks[1].header.data.coinbase, 10)
+        other = spend(blocks[1].header.data.fees_coin, 50)
+        for spend_bundle in [parent, other]:
+            cost, status, error = await mempool_manager.add_spendbundle(
+                spend_bundle, pool
+            )
+            assert status == MempoolInclusionStatus.SUCCESS
+
+        # The parent has the lowest fee rate, but it is not evicted for its child, so the child
+        # is compared to the other item, which it would evict
+        child = spend(parent.additions()[0], 15)
+        cost, status, error = await mempool_manager.add_spendbundle(child, pool)
+        assert status == MempoolInclusionStatus.FAILED
+        assert error == Err.INVALID_FEE_LOW_FEE
+        assert set(pool.spends) == {parent.name(), other.name()}
+
+        child = spend(parent.additions()[0], 60)
+        cost, status, error = await mempool_manager.add_spendbundle(child, pool)
+        assert status == MempoolInclusionStatus.SUCCESS
+        assert set(pool.spends) == {parent.name(), child.name()}
+
+        # All the items are ancestors of the grandchild, so none can be evicted for it
+        grandchild = spend(child.additions()[0], 1000)
+        cost, status, error = await mempool_manager.add_spendbundle(grandchild, pool)
+        assert status == MempoolInclusionStatus.FAILED
+        assert error == Err.INVALID_FEE_LOW_FEE
+        assert set(pool.spends) == {parent.name(), child.name()}
+
     @pytest.mark.asyncio
     async def test_invalid_block_index(self, two_nodes):
         num_blocks = 2
@@ -0,0 +1,35 @@
+import unittest
+
+from src.full_node.mempool_cache import LRUCache, SignatureCache
+from src.types.BLSSignature import BLSSignature
+from src.types.sized_bytes import bytes32
+from src.util.hash import std_hash
+from src.wallet.BLSPrivateKey import BLSPrivateKey
+
+
+class TestMempoolCache(unittest.TestCase):
+    def test_lru(self):
+        cache = LRUCache(2)
+        keys = [bytes32([i] * 32) for i in range(3)]
+        cache.put(keys[0], 0)
+        cache.put(keys[1], 1)
+        assert cache.get(keys[0]) == 0
+        cache.put(keys[2], 2)
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[2]) == 2 and len(cache) == 2
+        assert cache.get_stats() == {"size": 2, "hits": 2, "misses": 1}
+
+    def test_signature_cache(self):
+        cache = SignatureCache(10)
+        private_key = BLSPrivateKey.from_secret_exponent(1)
+        message_hash = std_hash(b"message")
+        pairs = [BLSSignature.PkMessagePair(private_key.public_key(), message_hash)]
+        signature = private_key.sign(message_hash)
+        assert cache.validate(signature, pairs)
+        assert cache.validate(signature, pairs)
+        assert cache.hits == 1 and cache.misses == 1
+        # Invalid signatures are cached too, and do not match the valid ones
+        other_signature = private_key.sign(std_hash(b"other message"))
+        assert not cache.validate(other_signature, pairs)
+        assert not cache.validate(other_signature, pairs)
+        assert cache.hits == 2 and cache.misses == 2
@@ -0,0 +1,250 @@
+import os
+import unittest
+from typing import List, Optional
+
+from src.full_node.mempool import Mempool
+from src.types.BLSSignature import BLSSignature, ZERO96
+from src.types.coin import Coin
+from src.types.coin_solution import CoinSolution
+from src.types.mempool_item import MempoolItem
+from src.types.program import Program
+from src.types.sized_bytes import bytes32
+from src.types.spend_bundle import SpendBundle
+from src.util.ints import uint32, uint64
+from tests.setup_nodes import bt, test_constants
+
+
+def make_item(
+    fee: int, cost: int, coin: Optional[Coin] = None, num_additions: int = 1
+) -> MempoolItem:
+    """
+    An item spending coin, or a new coin, with the given fee and cost. It is not a valid
+    transaction.
+    """
+    if coin is None:
+        coin = Coin(bytes32(os.urandom(32)), bytes32([0] * 32), uint64(fee + 1))
+    additions = [
+        Coin(coin.name(), bytes32([0] * 32), uint64(i + 1))
+        for i in range(num_additions)
+    ]
+    bundle = SpendBundle([CoinSolution(coin, Program.to(0))], BLSSignature(ZERO96))
+    return MempoolItem(
+        bundle, fee / cost, uint64(fee), uint64(cost), [], additions, [coin.name()],
+    )
+
+
+def add_item(pool: Mempool, item: MempoolItem) -> None:
+    removals = {
+        name: Coin(name, bytes32([0] * 32), uint64(1)) for name in item.removal_names
+    }
+    pool.add_to_pool(item, item.additions, removals)
+
+
+class TestMempoolIndex(unittest.TestCase):
+    def setUp(self):
+        genesis = bt.create_genesis_block(test_constants, bytes([0] * 32), b"0")
+        self.pool = Mempool.create(genesis.header, uint32(3))
+
+    def test_eviction(self):
+        items = [make_item(10, 10), make_item(20, 10), make_item(10, 10)]
+        for item in items:
+            add_item(self.pool, item)
+        assert self.pool.at_full_capacity()
+        assert self.pool.get_min_fee_rate() == 1
+
+        # Of the items with the lowest fee rate, the last one added is evicted
+        new_item = make_item(30, 10)
+        add_item(self.pool, new_item)
+        assert set(self.pool.spends) == {items[0].name, items[1].name, new_item.name}
+        assert items[2].removal_names[0] not in self.pool.removals
+        assert items[2].additions[0].name() not in self.pool.additions
+
+        self.pool.remove_spend(items[0])
+        assert len(self.pool.sorted_spends) == len(self.pool.sorted_costs) == 2
+        assert self.pool.get_min_fee_rate() == 0
+
+    def test_items_for_block(self):
+        self.pool.size = uint32(10)
+        expensive = make_item(1000, 100)
+        cheap = [make_item(30, 10), make_item(20, 10), make_item(10, 10)]
+        for item in [cheap[2], expensive, cheap[0], cheap[1]]:
+            add_item(self.pool, item)
+
+        # The item with the highest fee rate does not fit, but the next ones do
+        assert self.pool.get_items_for_block(25) == [cheap[0], cheap[1]]
+        assert self.pool.get_items_for_block(120) == [expensive, cheap[0], cheap[1]]
+        assert self.pool.get_items_for_block(5) == []
+
+    def test_chain(self):
+        self.pool.size = uint32(100)
+        fees = [10, 0, 30, 5, 20]
+        chain: List[MempoolItem] = []
+        for fee in fees:
+            chain.append(
+                make_item(fee, 10, chain[-1].additions[0] if len(chain) > 0 else None)
+            )
+            add_item(self.pool, chain[-1])
+        other = make_item(15, 10)
+        add_item(self.pool, other)
+
+        first, last = (
+            self.pool.packages[chain[0].name],
+            self.pool.packages[chain[-1].name],
+        )
+        assert first.parents == set() and first.children == {chain[1].name}
+        assert (first.descendant_fee, first.descendant_cost) == (sum(fees), 50)
+        assert (last.ancestor_fee, last.ancestor_count) == (sum(fees), 5)
+        assert self.pool.get_ancestors([chain[2].name]) == {i.name for i in chain[:3]}
+        assert self.pool.get_descendants([chain[2].name]) == {i.name for i in chain[2:]}
+
+        # The item with the lowest fee rate with its descendants is the last but one
+        assert self.pool.sorted_spends.peekitem(index=0)[1] == chain[3]
+
+        # Removing an item removes its descendants, and updates its ancestors
+        removed = self.pool.remove_spend(chain[2])
+        assert removed == [chain[4], chain[3], chain[2]]
+        assert set(self.pool.spends) == {chain[0].name, chain[1].name, other.name}
+        assert chain[2].removal_names[0] not in self.pool.removals
+        assert (first.descendant_fee, first.descendant_count) == (10, 2)
+        assert first.children == {chain[1].name}
+        assert self.pool.packages[chain[1].name].children == set()
+        assert self.pool.sort_keys[chain[0].name][0] == 0.5
+
+    def test_eviction_of_packages(self):
+        self.pool.size = uint32(4)
+        parent = make_item(0, 10)
+        child = make_item(100, 10, parent.additions[0])
+        others = [make_item(20, 10), make_item(30, 10)]
+        for item in [parent, child] + others:
+            add_item(self.pool, item)
+
+        # The parent is kept for the fee of its child
+        assert self.pool.get_min_fee_rate() == 2
+        new_item = make_item(40, 10)
+        add_item(self.pool, new_item)
+        assert set(self.pool.spends) == {
+            parent.name,
+            child.name,
+            others[1].name,
+            new_item.name,
+        }
+
+        # The ancestors of the item which is added are not evicted
+        grandchild = make_item(0, 10, child.additions[0])
+        add_item(self.pool, grandchild)
+        assert set(self.pool.spends) == {
+            parent.name,
+            child.name,
+            grandchild.name,
+            new_item.name,
+        }
+        assert self.pool.get_min_fee_rate() == 0
+
+        # The parent is evicted with its child
+        bigger = [make_item(55, 10), make_item(60, 10), make_item(70, 10)]
+        for item in bigger:
+            add_item(self.pool, item)
+        assert set(self.pool.spends) == {item.name for item in bigger}
+        assert len(self.pool.packages) == len(self.pool.sorted_costs) == 3
+        assert len(self.pool.additions) == len(self.pool.removals) == 3
+
+    def test_eviction_candidate(self):
+        self.pool.size = uint32(2)
+        parent = make_item(10, 10)
+        other = make_item(50, 10)
+        for item in [parent, other]:
+            add_item(self.pool, item)
+
+        # The parent is protected when its child is added, so the other item is evicted
+        protected = self.pool.get_ancestors([parent.name])
+        assert self.pool.get_eviction_candidate(set()) == ((1, -1), parent)
+        assert self.pool.get_eviction_candidate(protected) == ((5, -2), other)
+        child = make_item(60, 10, parent.additions[0])
+        add_item(self.pool, child)
+        assert set(self.pool.spends) == {parent.name, child.name}
+
+        # No item can be evicted for the grandchild
+        assert self.pool.get_eviction_candidate({parent.name, child.name}) is None
+
+    def test_items_for_block_packages(self):
+        self.pool.size = uint32(100)
+        parent = make_item(0, 10, num_additions=2)
+        child = make_item(60, 10, parent.additions[0])
+        others = [make_item(20, 10), make_item(10, 10)]
+        for item in [parent, others[0], child, others[1]]:
+            add_item(self.pool, item)
+
+        # The child pays for its parent, which is included first
+        assert self.pool.get_items_for_block(40) == [
+            parent,
+            child,
+            others[0],
+            others[1],
+        ]
+        assert self.pool.get_items_for_block(30) == [parent, child, others[0]]
+        # The package does not fit, so the next items are included
+        assert self.pool.get_items_for_block(15) == [others[0]]
+
+        # Once the parent is included for the first child, the second one is worth more than
+        # the last item
+        second_child = make_item(15, 10, parent.additions[1])
+        add_item(self.pool, second_child)
+        assert self.pool.get_items_for_block(50) == [
+            parent,
+            child,
+            others[0],
+            second_child,
+            others[1],
+        ]
+
+    def test_long_chains(self):
+        self.pool.size = uint32(1000)
+        chains: List[List[MempoolItem]] = []
+        for i in range(10):
+            chain: List[MempoolItem] = [make_item(i, 10)]
+            for j in range(1, 25):
+                chain.append(make_item((i * j) % 7, 10 + j, chain[-1].additions[0]))
+            chains.append(chain)
+        for j in range(25):
+            for chain in chains:
+                add_item(self.pool, chain[j])
+
+        def check_packages():
+            for name, package in self.pool.packages.items():
+                ancestors = self.pool.get_ancestors([name])
+                descendants = self.pool.get_descendants([name])
+                assert package.ancestor_fee == sum(
+                    self.pool.spends[n].fee for n in ancestors
+                )
+                assert package.ancestor_count == len(ancestors)
+                assert package.descendant_cost == sum(
+                    self.pool.spends[n].cost for n in descendants
+                )
+                assert package.descendant_count == len(descendants)
+                assert (
+                    self.pool.sort_keys[name][0]
+                    == package.descendant_fee / package.descendant_cost
+                )
+
+        check_packages()
+        for i, chain in enumerate(chains[:5]):
+            self.pool.remove_spend(chain[10 + i])
+        assert len(self.pool.spends) == 250 - sum(15 - i for i in range(5))
+        check_packages()
+
+        # Every item is included after its ancestors
+        items = self.pool.get_items_for_block(10 ** 9)
+        assert len(items) == len(self.pool.spends)
+        included = set()
+        for item in items:
+            assert self.pool.packages[item.name].parents <= included
+            included.add(item.name)
+
+        # A block which fits half of the cost
+        max_cost = sum(item.cost for item in items) // 2
+        items = self.pool.get_items_for_block(max_cost)
+        assert 0 < sum(item.cost for item in items) <= max_cost
+        included = set()
+        for item in items:
+            assert self.pool.packages[item.name].parents <= included
+            included.add(item.name)
@@ -0,0 +1,114 @@
+import asyncio
+import concurrent
+
+import pytest
+from clvm_tools import binutils
+
+from src.full_node.mempool_manager import validate_spend_bundle
+from src.full_node.transaction_queue import TransactionQueue
+from src.protocols import full_node_protocol
+from src.types.coin import Coin
+from src.types.coin_solution import CoinSolution
+from src.types.mempool_inclusion_status import MempoolInclusionStatus
+from src.types.program import Program
+from src.types.spend_bundle import SpendBundle
+from src.util.errors import Err
+from src.util.ints import uint64
+from tests.setup_nodes import setup_two_nodes, test_constants, bt
+from tests.wallet_tools import WalletTool
+
+
+@pytest.fixture(scope="module")
+def event_loop():
+    loop = asyncio.get_event_loop()
+    yield loop
+
+
+class BrokenExecutor(concurrent.futures.Executor):
+    def submit(self, fn, *args, **kwargs):
+        raise RuntimeError("broken process pool")
+
+
+class TestTransactionQueue:
+    @pytest.fixture(scope="function")
+    async def two_nodes(self):
+        async for _ in setup_two_nodes({"COINBASE_FREEZE_PERIOD": 0}):
+            yield _
+
+    @pytest.mark.asyncio
+    async def test_batches(self, two_nodes):
+        num_blocks = 5
+        wallet_a = WalletTool()
+        coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+        receiver_puzzlehash = WalletTool().get_new_puzzlehash()
+
+        blocks = bt.get_consecutive_blocks(
+            test_constants, num_blocks, [], 10, b"", coinbase_puzzlehash
+        )
+        full_node_1, full_node_2, server_1, server_2 = two_nodes
+        for block in blocks[1:]:
+            async for _ in full_node_1.respond_block(
+                full_node_protocol.RespondBlock(block)
+            ):
+                pass
+
+        bundles = [
+            wallet_a.generate_signed_transaction(
+                1000, receiver_puzzlehash, block.header.data.coinbase
+            )
+            for block in blocks[1:4]
+        ]
+        other_bundle = wallet_a.generate_signed_transaction(
+            1000, receiver_puzzlehash, blocks[4].header.data.coinbase
+        )
+        assert other_bundle is not None
+        bad_bundle = SpendBundle(
+            other_bundle.coin_solutions, bundles[0].aggregated_signature
+        )
+        # Creating a coin with a puzzle hash of two bytes raises an exception
+        puzzle = binutils.assemble("(q ((51 0xabcd 5)))")
+        coin = Coin(blocks[1].header_hash, Program(puzzle).get_tree_hash(), uint64(5))
+        raising_bundle = SpendBundle(
+            [CoinSolution(coin, Program.to([puzzle, []]))],
+            bundles[0].aggregated_signature,
+        )
+
+        for executor in [full_node_1.blockchain.pool, BrokenExecutor(), None]:
+            full_node_1.mempool_manager.validation_cache.cache.clear()
+            full_node_1.mempool_manager.signature_cache.cache.clear()
+            for pool in full_node_1.mempool_manager.mempools.values():
+                for item in list(pool.spends.values()):
+                    pool.remove_spend(item)
+            queue = TransactionQueue(
+                full_node_1.mempool_manager,
+                full_node_1.blockchain.lock,
+                executor,
+                num_workers=2,
+                batch_size=10,
+                batch_latency=0.1,
+            )
+            # The five bundles are run and verified in one batch, and added in order. The
+            # bundle which raises an exception only fails itself
+            results = await asyncio.gather(
+                *[
+                    queue.add_spendbundle(b)
+                    for b in bundles[:1] + [raising_bundle] + bundles[1:] + [bad_bundle]
+                ]
+            )
+            queue.close()
+            for cost, status, error in results[:1] + results[2:4]:
+                assert status == MempoolInclusionStatus.SUCCESS
+            assert results[1] == (None, MempoolInclusionStatus.FAILED, Err.UNKNOWN)
+            assert results[4][1:] == (
+                MempoolInclusionStatus.FAILED,
+                Err.BAD_AGGREGATE_SIGNATURE,
+            )
+            assert full_node_1.mempool_manager.signature_cache.misses == 0
+            assert full_node_1.mempool_manager.validation_cache.misses == 0
+            # The validations which were run in the process pool are the same
+            for bundle in bundles:
+                assert full_node_1.mempool_manager.validation_cache.get(
+                    bundle.name()
+                ) == validate_spend_bundle(
+                    full_node_1.mempool_manager.constants, bundle
+                )
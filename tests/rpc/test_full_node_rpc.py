@@ -1,11 +1,12 @@
 import asyncio
+import aiohttp
 
 import pytest
 
 from src.rpc.full_node_rpc_server import start_full_node_rpc_server
 from src.protocols import full_node_protocol
 from src.rpc.full_node_rpc_client import FullNodeRpcClient
-from src.util.ints import uint16
+from src.util.ints import uint16, uint32
 from tests.setup_nodes import setup_two_nodes, test_constants, bt
 
 
@@ -79,6 +80,43 @@ class TestRpc:
                 blocks[-1].header.data.coinbase.puzzle_hash
             )
             assert len(coins_lca) == 16
+            coins_range, cursor = await client.get_coin_records_by_puzzle_hashes(
+                [blocks[-1].header.data.coinbase.puzzle_hash],
+                include_spent_coins=False,
+                start_height=uint32(0),
+                end_height=uint32(4),
+            )
+            assert cursor is None
+            assert coins_range == sorted(
+                [c for c in coins_lca if c.confirmed_block_index < 4],
+                key=lambda c: (c.confirmed_block_index, c.name),
+            )
+            first_page, cursor = await client.get_coin_records_by_puzzle_hashes(
+                [blocks[-1].header.data.coinbase.puzzle_hash],
+                include_spent_coins=False,
+                limit=3,
+            )
+            second_page, _ = await client.get_coin_records_by_puzzle_hashes(
+                [blocks[-1].header.data.coinbase.puzzle_hash],
+                include_spent_coins=False,
+                limit=3,
+                start_after=cursor,
+            )
+            assert (
+                first_page + second_page
+                == sorted(coins_lca, key=lambda c: (c.confirmed_block_index, c.name))[
+                    :6
+                ]
+            )
+            for limit in [0, -1]:
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await client.get_coin_records_by_puzzle_hashes(
+                        [blocks[-1].header.data.coinbase.puzzle_hash], limit=limit
+                    )
+
+            stats = await client.get_coin_cache_stats()
+            assert stats["size"] > 0 and stats["size"] <= stats["max_size"]
+            assert stats["evictions"] == 0 and "hits" in stats and "misses" in stats
 
             assert len(await client.get_connections()) == 0
 
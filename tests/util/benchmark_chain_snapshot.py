@@ -0,0 +1,130 @@
+import asyncio
+import dataclasses
+import gc
+import time
+from pathlib import Path
+from typing import List
+
+import aiosqlite
+
+from src.full_node.block_store import BlockStore
+from src.full_node.blockchain import Blockchain
+from src.full_node.chain_snapshot import write_chain_snapshot
+from src.full_node.coin_store import CoinStore
+from src.types.header import Header
+from src.util.ints import uint32, uint64, uint128
+from tests.block_tools import BlockTools
+from tests.util.benchmark_streamable import test_constants
+
+DB_PATH = Path("benchmark_chain_snapshot.db")
+SNAPSHOT_PATH = Path("benchmark_chain_snapshot.snapshot")
+
+
+def make_chain(genesis: Header, num_blocks: int) -> List[Header]:
+    """
+    Headers which only link to each other, since loading the chain does not validate them.
+    """
+    headers = [genesis]
+    for height in range(1, num_blocks + 1):
+        data = dataclasses.replace(
+            genesis.data,
+            height=uint32(height),
+            prev_header_hash=headers[-1].header_hash,
+            weight=uint128(genesis.data.weight + height),
+            total_iters=uint64(genesis.data.total_iters + height * 1000),
+        )
+        headers.append(dataclasses.replace(genesis, data=data))
+    return headers
+
+
+async def add_headers(connection: aiosqlite.Connection, headers: List[Header]):
+    await connection.execute("UPDATE headers SET is_lca=0, is_tip=0")
+    await connection.executemany(
+        "INSERT INTO headers VALUES(?, ?, ?, ?, ?, 0, 0)",
+        [
+            (
+                h.height,
+                h.header_hash.hex(),
+                h.header_hash.hex(),
+                bytes(32).hex(),
+                bytes(h),
+            )
+            for h in headers
+        ],
+    )
+    await connection.execute(
+        "UPDATE headers SET is_lca=1, is_tip=1 WHERE header_hash=?",
+        (headers[-1].header_hash.hex(),),
+    )
+    await connection.commit()
+
+
+async def load(connection: aiosqlite.Connection, constants, snapshot: bool):
+    start = time.time()
+    b = await Blockchain.create(
+        await CoinStore.create(connection),
+        await BlockStore.create(connection),
+        constants,
+        SNAPSHOT_PATH if snapshot else None,
+    )
+    load_time = time.time() - start
+    b.shut_down()
+    return b, load_time
+
+
+async def main(num_blocks: int, num_new_blocks: int):
+    for path in [DB_PATH, SNAPSHOT_PATH]:
+        if path.exists():
+            path.unlink()
+    bt = BlockTools()
+    genesis = bt.create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    constants = {**test_constants, "GENESIS_BLOCK": bytes(genesis)}
+    connection = await aiosqlite.connect(DB_PATH)
+    await BlockStore.create(connection)
+    await connection.execute(
+        "INSERT INTO blocks VALUES(?, ?, ?, ?, ?)", BlockStore._block_row(genesis)
+    )
+    headers = make_chain(genesis.header, num_blocks + num_new_blocks)
+    await add_headers(connection, headers[: num_blocks + 1])
+
+    b, _ = await load(connection, constants, False)
+    start = time.time()
+    write_chain_snapshot(
+        SNAPSHOT_PATH,
+        genesis.header_hash,
+        b.snapshot_records,
+        [b.headers[record[0]] for record in b.snapshot_records],
+    )
+    print(
+        f"Writing the snapshot of {num_blocks} blocks: {time.time() - start:.2f}s, "
+        f"{SNAPSHOT_PATH.stat().st_size / 2 ** 20:.1f} MiB"
+    )
+
+    await add_headers(connection, headers[num_blocks + 1 :])
+    # Like at the start of the node, the other chains are not in memory while loading, which
+    # would make the garbage collection slower
+    del b, headers
+    gc.collect()
+    b_db, db_time = await load(connection, constants, False)
+    height_to_hash = b_db.height_to_hash
+    del b_db
+    gc.collect()
+    b_snapshot, snapshot_time = await load(connection, constants, True)
+    assert b_snapshot.height_to_hash == height_to_hash
+    print(
+        f"Loading {num_blocks + num_new_blocks} blocks: {db_time:.2f}s from the database, "
+        f"{snapshot_time:.2f}s from the snapshot and {num_new_blocks} blocks from the "
+        f"database, {db_time / snapshot_time:.1f}x"
+    )
+
+    await connection.close()
+    DB_PATH.unlink()
+    SNAPSHOT_PATH.unlink()
+
+
+if __name__ == "__main__":
+    """
+    Measures the startup of the blockchain on a chain of 100000 blocks, when the chain is loaded
+    from the headers in the database, and from the snapshot of the first 99000 blocks.
+    """
+    asyncio.get_event_loop().run_until_complete(main(99000, 1000))
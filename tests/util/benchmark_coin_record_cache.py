@@ -0,0 +1,110 @@
+import itertools
+import time
+from typing import Dict, List
+
+from src.full_node.coin_record_cache import CoinRecordCache
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.hash import std_hash
+from src.util.ints import uint32, uint64
+
+CACHE_SIZE = 600000
+RECORDS_PER_BLOCK = 10
+
+
+def make_records(start: int, num_records: int) -> List[CoinRecord]:
+    records = []
+    for i in range(start, start + num_records):
+        coin = Coin(std_hash(uint32(i)), bytes32([0] * 32), uint64(i))
+        height = i // RECORDS_PER_BLOCK
+        # Half of the coins are spent in the next block
+        spent = i % 2 == 0
+        records.append(
+            CoinRecord(
+                coin, uint32(height), uint32(height + 1 if spent else 0), spent, False
+            )
+        )
+    return records
+
+
+def legacy_add(cache: Dict[bytes32, CoinRecord], records: Dict[bytes32, CoinRecord]):
+    """
+    The previous cache, a dict which evicts the records in insertion order.
+    """
+    cache.update(records)
+    excess = len(cache) - CACHE_SIZE
+    if excess > 0:
+        for name in list(itertools.islice(cache, excess)):
+            del cache[name]
+
+
+def legacy_rollback(cache: Dict[bytes32, CoinRecord], block_index: int):
+    """
+    The previous rollback of the cache, which visits every record.
+    """
+    delete_queue: List[bytes32] = []
+    for coin_name, coin_record in cache.items():
+        if coin_record.spent_block_index > block_index:
+            cache[coin_name] = CoinRecord(
+                coin_record.coin,
+                coin_record.confirmed_block_index,
+                uint32(0),
+                False,
+                coin_record.coinbase,
+            )
+        if coin_record.confirmed_block_index > block_index:
+            delete_queue.append(coin_name)
+    for coin_name in delete_queue:
+        del cache[coin_name]
+
+
+def main():
+    records = make_records(0, CACHE_SIZE)
+    blocks = [
+        {r.name: r for r in records[i : i + RECORDS_PER_BLOCK]}
+        for i in range(0, len(records), RECORDS_PER_BLOCK)
+    ]
+    new_blocks = [
+        {r.name: r for r in make_records(CACHE_SIZE + i, RECORDS_PER_BLOCK)}
+        for i in range(0, 100000, RECORDS_PER_BLOCK)
+    ]
+    top = (CACHE_SIZE + 100000) // RECORDS_PER_BLOCK - 1
+
+    legacy: Dict[bytes32, CoinRecord] = {}
+    cache = CoinRecordCache(CACHE_SIZE)
+    for block in blocks:
+        legacy_add(legacy, block)
+        cache.update(block)
+
+    start = time.time()
+    for block in new_blocks:
+        legacy_add(legacy, block)
+    legacy_time = time.time() - start
+    start = time.time()
+    for block in new_blocks:
+        cache.update(block)
+    new_time = time.time() - start
+    print(
+        f"Adding {len(new_blocks)} blocks to a full cache: {legacy_time:.2f}s dict, "
+        f"{new_time:.2f}s LRU, {legacy_time / new_time:.2f}x"
+    )
+
+    start = time.time()
+    legacy_rollback(legacy, top - 3)
+    legacy_time = time.time() - start
+    start = time.time()
+    cache.rollback(uint32(top - 3))
+    new_time = time.time() - start
+    assert len(legacy) == len(cache)
+    print(
+        f"Rolling back 3 blocks: {legacy_time * 1000:.1f}ms dict, "
+        f"{new_time * 1000:.3f}ms LRU, {legacy_time / new_time:.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Measures the coin record cache of the CoinStore when it is full, with 600000 records.
+    """
+    main()
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import random
+import time
+from pathlib import Path
+from typing import List
+
+import aiosqlite
+
+from src.full_node.coin_store import CoinStore
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32, uint64
+
+LEGACY_COIN_RECORD_TABLE = (
+    "CREATE TABLE coin_record(coin_name text PRIMARY KEY, confirmed_index bigint, "
+    "spent_index bigint, spent int, coinbase int, puzzle_hash text, coin_parent text, "
+    "amount bigint)"
+)
+
+
+async def create_legacy_db(db_path: Path, num_records: int) -> List[bytes32]:
+    """
+    Creates a database with the hex schema, and the indexes which were created for it.
+    """
+    connection = await aiosqlite.connect(db_path)
+    await connection.execute(LEGACY_COIN_RECORD_TABLE)
+    await connection.execute(
+        "CREATE INDEX coin_confirmed_index on coin_record(confirmed_index)"
+    )
+    await connection.execute(
+        "CREATE INDEX coin_spent_index on coin_record(spent_index)"
+    )
+    await connection.execute("CREATE INDEX coin_spent on coin_record(spent)")
+    puzzle_hashes = [os.urandom(32) for _ in range(1000)]
+    names: List[bytes32] = []
+    rows = []
+    for i in range(num_records):
+        coin = Coin(
+            bytes32(os.urandom(32)), random.choice(puzzle_hashes), uint64(i + 1)
+        )
+        names.append(coin.name())
+        rows.append(
+            (
+                coin.name().hex(),
+                i // 10,
+                0,
+                0,
+                int(i % 10 == 0),
+                coin.puzzle_hash.hex(),
+                coin.parent_coin_info.hex(),
+                coin.amount,
+            )
+        )
+    await connection.executemany(
+        "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    await connection.commit()
+    await connection.close()
+    return names
+
+
+async def legacy_get_coin_record(connection: aiosqlite.Connection, name: bytes32):
+    """
+    The previous implementation of CoinStore.get_coin_record, without the ram cache.
+    """
+    cursor = await connection.execute(
+        "SELECT * from coin_record WHERE coin_name=?", (name.hex(),)
+    )
+    row = await cursor.fetchone()
+    await cursor.close()
+    coin = Coin(
+        bytes32(bytes.fromhex(row[6])), bytes32(bytes.fromhex(row[5])), uint64(row[7])
+    )
+    return CoinRecord(coin, row[1], row[2], row[3], row[4])
+
+
+async def vacuumed_size(db_path: Path) -> int:
+    connection = await aiosqlite.connect(db_path)
+    await connection.execute("VACUUM")
+    await connection.close()
+    return db_path.stat().st_size
+
+
+async def main(num_records: int, num_lookups: int):
+    db_path = Path("benchmark_coin_record_schema.db")
+    if db_path.exists():
+        db_path.unlink()
+    names = await create_legacy_db(db_path, num_records)
+    lookups = random.sample(names, num_lookups)
+
+    legacy_size = await vacuumed_size(db_path)
+    connection = await aiosqlite.connect(db_path)
+    start = time.time()
+    for name in lookups:
+        await legacy_get_coin_record(connection, name)
+    legacy_time = time.time() - start
+
+    start = time.time()
+    coin_store = await CoinStore.create(connection, uint32(0))
+    migration_time = time.time() - start
+    start = time.time()
+    for name in lookups:
+        assert await coin_store.get_coin_record(name) is not None
+    new_time = time.time() - start
+    await connection.close()
+    new_size = await vacuumed_size(db_path)
+    db_path.unlink()
+
+    print(f"Migrated {num_records} coin records in {migration_time:.2f}s")
+    print(
+        f"DB file size: {legacy_size / 2 ** 20:.1f} MiB hex, "
+        f"{new_size / 2 ** 20:.1f} MiB blob ({new_size / legacy_size:.0%})"
+    )
+    print(
+        f"Lookup latency: {legacy_time / num_lookups * 1e6:.0f}us hex, "
+        f"{new_time / num_lookups * 1e6:.0f}us blob, {legacy_time / new_time:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Measures the size of a database of 500000 coin records and the latency of uncached
+    get_coin_record lookups, before and after the migration to the binary schema.
+    """
+    asyncio.get_event_loop().run_until_complete(main(500000, 20000))
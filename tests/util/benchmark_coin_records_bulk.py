@@ -0,0 +1,68 @@
+import asyncio
+import gc
+import os
+import random
+import time
+from pathlib import Path
+
+import aiosqlite
+
+from src.full_node.coin_store import CoinStore
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32, uint64
+
+
+async def main(num_records: int, spends_per_block: list):
+    db_path = Path("benchmark_coin_records_bulk.db")
+    if db_path.exists():
+        db_path.unlink()
+    connection = await aiosqlite.connect(db_path)
+    coin_store = await CoinStore.create(connection)
+    rows = []
+    names = []
+    for i in range(num_records):
+        coin = Coin(bytes32(os.urandom(32)), bytes32(os.urandom(32)), uint64(i + 1))
+        record = CoinRecord(coin, uint32(i // 100), uint32(0), False, False)
+        names.append(coin.name())
+        rows.append(coin_store.coin_record_to_row(coin.name(), record))
+    await connection.executemany(
+        "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    await connection.commit()
+    del rows
+    gc.collect()
+
+    for num_spends in spends_per_block:
+        removals = random.sample(names, num_spends)
+        for cache in ["cold", "warm"]:
+            if cache == "cold":
+                coin_store.lca_coin_records.clear()
+            start = time.time()
+            one_by_one = {
+                name: await coin_store.get_coin_record(name) for name in removals
+            }
+            single_time = time.time() - start
+            if cache == "cold":
+                coin_store.lca_coin_records.clear()
+            start = time.time()
+            bulk = await coin_store.get_coin_records(removals)
+            bulk_time = time.time() - start
+            assert bulk == one_by_one
+            print(
+                f"{num_spends} spends, {cache} cache: {single_time * 1000:.1f}ms "
+                f"get_coin_record, {bulk_time * 1000:.1f}ms get_coin_records, "
+                f"{single_time / bulk_time:.1f}x"
+            )
+
+    await connection.close()
+    db_path.unlink()
+
+
+if __name__ == "__main__":
+    """
+    Measures reading the coin records of the removals of a block, like block validation and the
+    mempool do, for blocks with 1000 to 5000 spends, in a CoinStore with 200000 coin records.
+    """
+    asyncio.get_event_loop().run_until_complete(main(200000, [1000, 2000, 5000]))
@@ -0,0 +1,127 @@
+import asyncio
+import dataclasses
+import time
+from pathlib import Path
+from typing import List
+
+import aiosqlite
+from clvm_tools import binutils
+
+from src.full_node.coin_store import CoinStore
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.condition_opcodes import ConditionOpcode
+from src.types.full_block import FullBlock
+from src.types.header import Header
+from src.types.program import Program
+from src.types.sized_bytes import bytes32
+from src.util.hash import std_hash
+from src.util.ints import uint32, uint64
+from src.util.npc_cache import npc_cache
+from src.wallet.puzzles.p2_conditions import puzzle_for_conditions
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+
+def make_synthetic_chain(num_blocks: int) -> List[FullBlock]:
+    """
+    Creates blocks which are not valid, but have the coins of valid blocks: a coinbase and a fees
+    coin, and a transaction which spends the coinbase of the previous block and creates a coin.
+    """
+    template = make_benchmark_objects()[0]
+    puzzle_hash = bytes32(std_hash(b"puzzle"))
+    puzzle = puzzle_for_conditions(
+        [
+            [
+                ConditionOpcode.CREATE_COIN.value,
+                puzzle_hash,
+                uint64(1000).to_bytes(8, "big"),
+            ]
+        ]
+    )
+    blocks: List[FullBlock] = []
+    prev_coinbase = None
+    for height in range(num_blocks):
+        coinbase = Coin(std_hash(uint32(height)), puzzle_hash, uint64(14000000000000))
+        fees_coin = Coin(std_hash(std_hash(uint32(height))), puzzle_hash, uint64(0))
+        generator = None
+        if prev_coinbase is not None:
+            solution = Program.to([puzzle, []])
+            generator = Program(
+                Program.to(
+                    [binutils.assemble("#q"), [[prev_coinbase.name(), solution]]]
+                )
+            )
+        data = dataclasses.replace(
+            template.header.data,
+            height=uint32(height),
+            coinbase=coinbase,
+            fees_coin=fees_coin,
+        )
+        header = Header(data, template.header.harvester_signature)
+        blocks.append(
+            FullBlock(
+                template.proof_of_space, template.proof_of_time, header, generator, None
+            )
+        )
+        prev_coinbase = coinbase
+    return blocks
+
+
+async def legacy_add_lcas(coin_store: CoinStore, blocks: List[FullBlock]) -> None:
+    """
+    The previous implementation, which writes and commits every coin record separately.
+    """
+    for block in blocks:
+        removals, additions = await block.tx_removals_and_additions()
+        for coin in additions:
+            await coin_store.add_coin_record(
+                CoinRecord(coin, block.height, uint32(0), False, False)
+            )
+        for coin_name in removals:
+            await coin_store.set_spent(coin_name, block.height)
+        for reward in [block.header.data.coinbase, block.header.data.fees_coin]:
+            await coin_store.add_coin_record(
+                CoinRecord(reward, block.height, uint32(0), False, True)
+            )
+
+
+async def run(blocks: List[FullBlock], batch_size: int, legacy: bool) -> float:
+    db_path = Path("benchmark_coin_store.db")
+    if db_path.exists():
+        db_path.unlink()
+    connection = await aiosqlite.connect(db_path)
+    coin_store = await CoinStore.create(connection)
+    start = time.time()
+    for i in range(0, len(blocks), batch_size):
+        if legacy:
+            await legacy_add_lcas(coin_store, blocks[i : i + batch_size])
+        else:
+            await coin_store.add_lcas(blocks[i : i + batch_size])
+    total = time.time() - start
+    await connection.close()
+    db_path.unlink()
+    return total
+
+
+async def main(num_blocks: int):
+    blocks = make_synthetic_chain(num_blocks)
+    # The generators are run beforehand, so that only the writes are measured
+    npc_cache.max_size = num_blocks
+    for block in blocks:
+        await block.tx_removals_and_additions()
+
+    legacy_time = await run(blocks, 1, True)
+    print(f"One commit per coin record: {legacy_time:.2f}s for {num_blocks} blocks")
+    for batch_size in [1, 100, num_blocks]:
+        batch_time = await run(blocks, batch_size, False)
+        print(
+            f"add_lcas with {batch_size} blocks per batch: {batch_time:.2f}s, "
+            f"{legacy_time / batch_time:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    """
+    Applies a synthetic chain of 5000 blocks to an empty CoinStore, like during sync.
+    """
+    asyncio.get_event_loop().run_until_complete(main(5000))
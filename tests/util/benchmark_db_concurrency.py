@@ -0,0 +1,103 @@
+import asyncio
+import os
+import random
+import time
+from pathlib import Path
+from typing import List
+
+from src.full_node.block_store import BlockStore
+from src.util.db_wrapper import DBWrapper
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+DB_PATH = Path("benchmark_db_concurrency.db")
+
+
+def remove_db() -> None:
+    for suffix in ["", "-wal", "-shm"]:
+        path = Path(f"{DB_PATH}{suffix}")
+        if path.exists():
+            path.unlink()
+
+
+async def write_load(db_wrapper: DBWrapper, done: asyncio.Event) -> int:
+    """
+    Writes batches of rows and commits, like the node does while it syncs.
+    """
+    batches = 0
+    while not done.is_set():
+        rows = [
+            (os.urandom(32).hex(), os.urandom(32).hex(), 0, os.urandom(1000))
+            for _ in range(100)
+        ]
+        await db_wrapper.db.executemany(
+            "INSERT INTO npc_results VALUES(?, ?, ?, ?)", rows
+        )
+        await db_wrapper.db.commit()
+        batches += 1
+    return batches
+
+
+async def run(
+    num_readers: int, hashes: List[bytes], num_peers: int, num_requests: int
+) -> None:
+    db_wrapper = await DBWrapper.create(DB_PATH, num_readers)
+    block_store = await BlockStore.create(db_wrapper.db, db_wrapper)
+    latencies: List[float] = []
+
+    async def peer() -> None:
+        for header_hash in random.choices(hashes, k=num_requests):
+            start = time.time()
+            block = await block_store.get_block(header_hash, use_reader=True)
+            assert block is not None
+            latencies.append(time.time() - start)
+
+    done = asyncio.Event()
+    writer = asyncio.create_task(write_load(db_wrapper, done))
+    start = time.time()
+    await asyncio.gather(*[peer() for _ in range(num_peers)])
+    total_time = time.time() - start
+    done.set()
+    batches = await writer
+    await db_wrapper.close()
+    latencies.sort()
+    print(
+        f"{num_readers} read connections: {len(latencies) / total_time:.0f} blocks/s, "
+        f"median {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms, "
+        f"{batches / total_time:.0f} write batches/s"
+    )
+
+
+async def main(num_blocks: int, num_peers: int, num_requests: int):
+    remove_db()
+    block = make_benchmark_objects()[0]
+    db_wrapper = await DBWrapper.create(DB_PATH)
+    await BlockStore.create(db_wrapper.db)
+    hashes = [os.urandom(32) for _ in range(num_blocks)]
+    row = BlockStore._block_row(block)
+    await db_wrapper.db.executemany(
+        "INSERT INTO blocks VALUES(?, ?, ?, ?, ?)",
+        [(i, h.hex()) + row[2:] for i, h in enumerate(hashes)],
+    )
+    await db_wrapper.db.executemany(
+        "INSERT INTO headers VALUES(?, ?, ?, ?, ?, 0, 0)",
+        [
+            (i, h.hex(), h.hex(), h.hex(), bytes(block.header))
+            for i, h in enumerate(hashes)
+        ],
+    )
+    await db_wrapper.db.commit()
+    await db_wrapper.close()
+
+    for num_readers in [0, 1, 4]:
+        await run(num_readers, hashes, num_peers, num_requests)
+    remove_db()
+
+
+if __name__ == "__main__":
+    """
+    Measures how fast the node serves blocks to 20 peers which request them one after the other,
+    while it writes to the database, when the blocks are read through the writer connection, and
+    through a pool of read only connections.
+    """
+    asyncio.get_event_loop().run_until_complete(main(20000, 20, 250))
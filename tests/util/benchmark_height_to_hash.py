@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from src.full_node.height_to_hash import HeightToHash
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32
+
+
+def measure(num_blocks: int, starting_height: int, num_requests: int) -> None:
+    hashes = [bytes32(os.urandom(32)) for _ in range(num_blocks)]
+
+    tracemalloc.start()
+    height_to_dict: Dict[uint32, bytes32] = {}
+    for height, header_hash in enumerate(hashes):
+        height_to_dict[uint32(height)] = bytes32(header_hash)
+    dict_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    height_to_array = HeightToHash(hashes)
+    array_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(
+        f"{num_blocks} heights: {dict_memory / 2 ** 20:.1f} MiB in a dict, "
+        f"{array_memory / 2 ** 20:.1f} MiB in the array, "
+        f"{sys.getsizeof(height_to_array._data) / 2 ** 20:.1f} MiB of buffer"
+    )
+
+    start = time.time()
+    for _ in range(num_requests):
+        from_dict: List[bytes32] = []
+        for height in range(starting_height, num_blocks):
+            from_dict.append(height_to_dict[uint32(height)])
+    dict_time = (time.time() - start) / num_requests
+    start = time.time()
+    for _ in range(num_requests):
+        from_array = height_to_array.get_hashes(starting_height, num_blocks)
+    array_time = (time.time() - start) / num_requests
+    start = time.time()
+    for _ in range(num_requests):
+        with height_to_array.get_range(starting_height, num_blocks) as view:
+            joined = bytes(view)
+    range_time = (time.time() - start) / num_requests
+    assert from_dict == from_array and joined == b"".join(from_dict)
+    print(
+        f"Hashes after height {starting_height}: {dict_time * 1000:.1f}ms from the dict, "
+        f"{array_time * 1000:.1f}ms from the array, {range_time * 1000:.2f}ms as one buffer"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Measures the memory of height_to_hash for a chain of 1000000 blocks, and the time to build
+    the list of header hashes which the node sends to a wallet syncing from height 0.
+    """
+    measure(1000000, 0, 5)
@@ -0,0 +1,89 @@
+import io
+import struct
+import time
+from typing import Any, BinaryIO, Callable, List, Type
+
+from src.util.ints import int8, uint8, int16, uint16, int32, uint32, int64, uint64
+from src.util.struct_stream import StructStream
+
+
+class LegacyStructStream(int):
+    """
+    The previous implementation, which computes the struct size on every call and streams
+    through a BytesIO. Used as a reference for correctness and speed.
+    """
+
+    PACK = ""
+
+    def __new__(cls: Any, value: int):
+        bits = struct.calcsize(cls.PACK) * 8
+        value = int(value)
+        if value.bit_length() > bits:
+            raise ValueError(f"Value {value} does not fit into {cls.__name__}")
+        return int.__new__(cls, value)  # type: ignore
+
+    @classmethod
+    def parse(cls: Any, f: BinaryIO) -> Any:
+        return cls(*struct.unpack(cls.PACK, f.read(struct.calcsize(cls.PACK))))
+
+    def stream(self, f):
+        f.write(struct.pack(self.PACK, self))
+
+    @classmethod
+    def from_bytes(cls: Any, blob: bytes) -> Any:  # type: ignore
+        return cls(*struct.unpack_from(cls.PACK, blob))
+
+    def __bytes__(self: Any) -> bytes:
+        f = io.BytesIO()
+        self.stream(f)
+        return bytes(f.getvalue())
+
+
+def run_timed(label: str, iterations: int, function: Callable[[], Any]) -> float:
+    start = time.time()
+    for _ in range(iterations):
+        function()
+    total = time.time() - start
+    print(f"{label}: {iterations / total:.0f} per second")
+    return total
+
+
+def benchmark(int_type: Type[StructStream], iterations: int) -> None:
+    legacy_type: Any = type(
+        f"legacy_{int_type.__name__}", (LegacyStructStream,), {"PACK": int_type.PACK}
+    )
+    value = int_type.LIMIT // 2 - 1
+    new_int = int_type(value)
+    legacy_int = legacy_type(value)
+    blob = bytes(new_int)
+    assert blob == bytes(legacy_int)
+    assert int_type.from_bytes(blob) == legacy_type.from_bytes(blob) == value
+    assert int_type.parse(io.BytesIO(blob)) == value
+
+    results: List[str] = []
+    for label, old_f, new_f in [
+        ("construct", lambda: legacy_type(value), lambda: int_type(value)),
+        ("bytes", lambda: bytes(legacy_int), lambda: bytes(new_int)),
+        (
+            "from_bytes",
+            lambda: legacy_type.from_bytes(blob),
+            lambda: int_type.from_bytes(blob),
+        ),
+        (
+            "parse",
+            lambda: legacy_type.parse(io.BytesIO(blob)),
+            lambda: int_type.parse(io.BytesIO(blob)),
+        ),
+    ]:
+        old = run_timed(f"{int_type.__name__} legacy {label}", iterations, old_f)
+        new = run_timed(f"{int_type.__name__} {label}", iterations, new_f)
+        results.append(f"{label} {old / new:.2f}x")
+    print(f"{int_type.__name__} speedup: {', '.join(results)}")
+
+
+if __name__ == "__main__":
+    """
+    Compares the precompiled struct based int serialization with the previous implementation.
+    """
+    for int_type in [int8, uint8, int16, uint16, int32, uint32, int64, uint64]:
+        benchmark(int_type, 300000)
@@ -0,0 +1,85 @@
+import asyncio
+import dataclasses
+import time
+from typing import Any, Callable, Dict
+
+from src.protocols import full_node_protocol
+from src.rpc.full_node_rpc_server import FullNodeRpcApiHandler
+from src.util.json_util import dict_to_json_chunks, dict_to_json_str
+from src.util.streamable import Streamable
+from tests.setup_nodes import setup_two_nodes, test_constants, bt
+
+
+def legacy_to_json_dict(self) -> Dict:
+    """
+    The previous implementation, a deep copy with dataclasses.asdict, which is then mutated.
+    """
+    return self.recurse_jsonify(dataclasses.asdict(self))
+
+
+async def run_timed(label: str, iterations: int, function: Callable) -> float:
+    start = time.time()
+    for _ in range(iterations):
+        dict_to_json_str(await function())
+    total = time.time() - start
+    print(f"{label}: {iterations / total:.1f} requests per second")
+    return total
+
+
+async def main(num_blocks: int, iterations: int):
+    async for full_node_1, _, server_1, _ in setup_two_nodes():
+        blocks = bt.get_consecutive_blocks(test_constants, num_blocks, [], 10)
+        for block in blocks:
+            async for _ in full_node_1.respond_block(
+                full_node_protocol.RespondBlock(block)
+            ):
+                pass
+        handler = FullNodeRpcApiHandler(full_node_1, lambda: None)
+        response = await handler.get_latest_block_headers({})
+        assert response is not None
+        print(f"Headers per response: {len(response['latest_blocks'])}")
+
+        headers = [block.header for block in blocks]
+        headers_response: Dict[str, Any] = {"success": True, "headers": headers}
+
+        new_to_json_dict = Streamable.to_json_dict
+        results = {}
+        for label, to_json_dict in [
+            ("legacy", legacy_to_json_dict),
+            ("single pass", new_to_json_dict),
+        ]:
+            Streamable.to_json_dict = to_json_dict  # type: ignore
+            rpc_time = await run_timed(
+                f"{label} get_latest_block_headers",
+                iterations,
+                lambda: handler.get_latest_block_headers({}),
+            )
+            start = time.time()
+            for _ in range(iterations):
+                dict_to_json_str(headers_response)
+            headers_time = time.time() - start
+            print(
+                f"{label} {len(headers)} headers: {iterations / headers_time:.1f} per second"
+            )
+            results[label] = (rpc_time, headers_time)
+        Streamable.to_json_dict = new_to_json_dict  # type: ignore
+
+        assert "".join(dict_to_json_chunks(headers_response)) == dict_to_json_str(
+            headers_response
+        )
+        rpc_speedup = results["legacy"][0] / results["single pass"][0]
+        headers_speedup = results["legacy"][1] / results["single pass"][1]
+        print(
+            f"Speedup: get_latest_block_headers {rpc_speedup:.2f}x, "
+            f"{len(headers)} headers {headers_speedup:.2f}x"
+        )
+        full_node_1._close()
+        server_1.close_all()
+
+
+if __name__ == "__main__":
+    """
+    Compares the single pass to_json_dict with the previous dataclasses.asdict implementation,
+    on the RPC get_latest_block_headers response, and on a list of headers.
+    """
+    asyncio.get_event_loop().run_until_complete(main(100, 100))
@@ -0,0 +1,43 @@
+import time
+
+from src.types.full_block import FullBlock
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+
+def benchmark(blob: bytes, iterations: int) -> None:
+    start = time.time()
+    for _ in range(iterations):
+        block = FullBlock.from_bytes(blob)
+        block.height, block.prev_header_hash, block.transactions_generator
+    eager_time = time.time() - start
+
+    start = time.time()
+    for _ in range(iterations):
+        block = FullBlock.from_bytes_lazy(blob)
+        block.height, block.prev_header_hash, block.transactions_generator
+    lazy_time = time.time() - start
+
+    start = time.time()
+    for _ in range(iterations):
+        block = FullBlock.from_bytes_lazy(blob)
+        block.height
+    header_only_time = time.time() - start
+
+    print(f"from_bytes: {eager_time * 1000000 / iterations:.1f} us per block")
+    print(
+        f"from_bytes_lazy, header and generator: {lazy_time * 1000000 / iterations:.1f} us "
+        f"per block, {eager_time / lazy_time:.2f}x"
+    )
+    print(
+        f"from_bytes_lazy, header only: {header_only_time * 1000000 / iterations:.1f} us "
+        f"per block, {eager_time / header_only_time:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Compares decoding a block from the database eagerly, with the lazy view used by the
+    BlockStore, for the fields that most callers of get_block use.
+    """
+    full_block = make_benchmark_objects()[0]
+    benchmark(bytes(full_block), 5000)
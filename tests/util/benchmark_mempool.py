@@ -0,0 +1,346 @@
+import asyncio
+import concurrent
+import dataclasses
+import gc
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import aiosqlite
+from sortedcontainers import SortedDict
+
+from src.consensus.constants import constants as consensus_constants
+from src.full_node.coin_store import CoinStore
+from src.full_node.mempool import Mempool
+from src.full_node.mempool_manager import MempoolManager
+from src.full_node.transaction_queue import TransactionQueue, verify_signatures
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.full_block import FullBlock
+from src.types.mempool_item import MempoolItem
+from src.types.sized_bytes import bytes32
+from src.types.spend_bundle import SpendBundle
+from src.util.ints import uint32, uint64
+from tests.block_tools import BlockTools
+from tests.full_node.test_mempool_index import make_item
+from tests.util.benchmark_streamable import test_constants
+from tests.wallet_tools import WalletTool
+
+DB_PATH = Path("benchmark_mempool.db")
+REVALIDATE_SAMPLE_SIZE = 1000
+
+
+def make_tip(block: FullBlock, height: int) -> FullBlock:
+    """
+    A block at height with a different hash, since the mempool only uses its header.
+    """
+    data = dataclasses.replace(
+        block.header.data, height=uint32(height), prev_header_hash=block.header_hash
+    )
+    return dataclasses.replace(
+        block, header=dataclasses.replace(block.header, data=data)
+    )
+
+
+async def make_bundles(
+    connection: aiosqlite.Connection, coin_store: CoinStore, num_bundles: int
+) -> List[SpendBundle]:
+    """
+    Adds num_bundles coins of one wallet to coin_store, and returns a signed bundle spending
+    each of them, with fees from 1 to 1000.
+    """
+    wallet = WalletTool()
+    puzzle_hash = wallet.get_new_puzzlehash()
+    receiver_puzzle_hash = WalletTool().get_new_puzzlehash()
+    coins = [
+        Coin(bytes32(os.urandom(32)), puzzle_hash, uint64(1000000))
+        for _ in range(num_bundles)
+    ]
+    await connection.executemany(
+        "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            coin_store.coin_record_to_row(
+                coin.name(), CoinRecord(coin, uint32(0), uint32(0), False, False)
+            )
+            for coin in coins
+        ],
+    )
+    await connection.commit()
+    bundles: List[SpendBundle] = []
+    for i, coin in enumerate(coins):
+        fee = i % 1000 + 1
+        bundle = wallet.generate_signed_transaction(
+            coin.amount - fee, receiver_puzzle_hash, coin, fee=fee
+        )
+        assert bundle is not None
+        bundles.append(bundle)
+    return bundles
+
+
+async def measure_new_tips(num_bundles: int):
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    connection = await aiosqlite.connect(DB_PATH)
+    coin_store = await CoinStore.create(connection)
+    constants = {**test_constants, "TX_PER_SEC": num_bundles, "MEMPOOL_BLOCK_BUFFER": 1}
+    genesis = BlockTools().create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    bundles = await make_bundles(connection, coin_store, num_bundles)
+
+    mempool_manager = MempoolManager(coin_store, constants)
+    tips = [make_tip(genesis, 1)]
+    await mempool_manager.new_tips(tips)
+    for bundle in bundles:
+        assert (await mempool_manager.add_spendbundle(bundle))[0] is not None
+    gc.collect()
+
+    # Validating every item again for the new tip, like new_tips did before the items were
+    # shared by the mempools. This takes milliseconds per item, so it is measured on a sample
+    pool = Mempool.create(make_tip(tips[0], 2).header, mempool_manager.mempool_size)
+    sample = list(mempool_manager.mempools[tips[0].header_hash].spends.values())[
+        :REVALIDATE_SAMPLE_SIZE
+    ]
+    start = time.time()
+    for item in sample:
+        await mempool_manager._add_spendbundle(item.spend_bundle, [pool], None)
+    revalidate_time = (time.time() - start) * num_bundles / len(sample)
+    assert len(pool.spends) == len(sample)
+
+    # Three tips, like a node with NUMBER_OF_HEADS 3 which receives a new block
+    tips = tips + [make_tip(tips[0], 2), make_tip(tips[0], 3)]
+    start = time.time()
+    await mempool_manager.new_tips(tips)
+    new_tips_time = time.time() - start
+    assert all(len(p.spends) == num_bundles for p in mempool_manager.mempools.values())
+    print(
+        f"{num_bundles} items: {revalidate_time:.2f}s to validate them for one new tip "
+        f"(from {len(sample)} items), "
+        f"{new_tips_time:.2f}s for new_tips with two new tips, "
+        f"{2 * revalidate_time / new_tips_time:.1f}x"
+    )
+
+    await connection.close()
+    DB_PATH.unlink()
+
+
+async def measure_readmission(num_bundles: int):
+    """
+    Adds bundles to an empty mempool, the first time, and again after the mempool was emptied,
+    like after a reorg or for retried potential transactions.
+    """
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    connection = await aiosqlite.connect(DB_PATH)
+    coin_store = await CoinStore.create(connection)
+    constants = {**test_constants, "TX_PER_SEC": num_bundles, "MEMPOOL_BLOCK_BUFFER": 1}
+    genesis = BlockTools().create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    bundles = await make_bundles(connection, coin_store, num_bundles)
+    mempool_manager = MempoolManager(coin_store, constants)
+
+    times: List[float] = []
+    for height in [1, 2]:
+        mempool_manager.mempools = {}
+        mempool_manager.items = {}
+        await mempool_manager.new_tips([make_tip(genesis, height)])
+        start = time.time()
+        for bundle in bundles:
+            assert (await mempool_manager.add_spendbundle(bundle))[0] is not None
+        times.append(time.time() - start)
+    print(
+        f"Adding {num_bundles} bundles: {times[0]:.2f}s the first time, {times[1]:.2f}s "
+        f"again with the validation and signature caches, {times[0] / times[1]:.1f}x"
+    )
+
+    await connection.close()
+    DB_PATH.unlink()
+
+
+async def measure_admission(num_bundles: int, batch_size: int):
+    """
+    Adds bundles which are received at the same time from peers, one after the other, and in
+    batches through the TransactionQueue, which runs them and verifies their signatures in a
+    process pool.
+    """
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    connection = await aiosqlite.connect(DB_PATH)
+    coin_store = await CoinStore.create(connection)
+    constants = {**test_constants, "TX_PER_SEC": num_bundles, "MEMPOOL_BLOCK_BUFFER": 1}
+    genesis = BlockTools().create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    bundles = await make_bundles(connection, coin_store, num_bundles)
+    tips = [make_tip(genesis, 1)]
+    num_workers = max(multiprocessing.cpu_count() - 1, 1)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers)
+    # Starts the workers
+    executor.submit(verify_signatures, []).result()
+
+    mempool_manager = MempoolManager(coin_store, constants)
+    await mempool_manager.new_tips(tips)
+    start = time.time()
+    for bundle in bundles:
+        assert (await mempool_manager.add_spendbundle(bundle))[0] is not None
+    sequential_time = time.time() - start
+
+    mempool_manager = MempoolManager(coin_store, constants)
+    await mempool_manager.new_tips(tips)
+    queue = TransactionQueue(
+        mempool_manager, asyncio.Lock(), executor, num_workers, batch_size
+    )
+    start = time.time()
+    results = await asyncio.gather(*[queue.add_spendbundle(b) for b in bundles])
+    queue_time = time.time() - start
+    assert all(result[0] is not None for result in results)
+    queue.close()
+    executor.shutdown()
+    print(
+        f"Adding {num_bundles} bundles: {num_bundles / sequential_time:.0f} tx/s one after "
+        f"the other, {num_bundles / queue_time:.0f} tx/s in batches of {batch_size} with "
+        f"{num_workers} workers"
+    )
+
+    await connection.close()
+    DB_PATH.unlink()
+
+
+def measure_index(num_items: int, num_fee_rates: int):
+    """
+    Adds synthetic items to a mempool of half their number, so that the second half evicts the
+    items with the lowest fee rate, and builds a block from the mempool. The items have few
+    distinct fee rates, like transactions which pay the minimum fee, and about a tenth of the
+    mempool fits in a block.
+    """
+    genesis = BlockTools().create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    max_block_cost = consensus_constants["MAX_BLOCK_COST_CLVM"]
+    base_cost = max_block_cost // (num_items // 20)
+    items = [
+        make_item((i % num_fee_rates + 1) * base_cost, base_cost * (1 + i % 3))
+        for i in range(num_items)
+    ]
+
+    # Hashes the names, which are cached, and the removed coins beforehand, since only the
+    # indexes are measured
+    removals = []
+    for item in items:
+        assert item.name is not None and item.additions[0].name() is not None
+        removals.append(
+            {
+                name: Coin(name, bytes32([0] * 32), uint64(1))
+                for name in item.removal_names
+            }
+        )
+
+    # The previous index: fee rate -> {name: item}, which evicted the first item of the dict
+    # with the lowest fee rate by copying its values. Only the index is measured
+    sorted_spends: SortedDict = SortedDict()
+    start = time.time()
+    for i, item in enumerate(items):
+        if i >= num_items // 2:
+            fee_per_cost, val = sorted_spends.peekitem(index=0)
+            del val[list(val.values())[0].name]
+            if len(val) == 0:
+                del sorted_spends[fee_per_cost]
+        sorted_spends.setdefault(item.fee_per_cost, {})[item.name] = item
+    dict_time = time.time() - start
+
+    pool = Mempool.create(genesis.header, uint32(num_items // 2))
+    start = time.time()
+    for item, removals_dic in zip(items, removals):
+        pool.add_to_pool(item, item.additions, removals_dic)
+    index_time = time.time() - start
+    assert len(pool.spends) == num_items // 2
+
+    start = time.time()
+    block_items = pool.get_items_for_block(max_block_cost)
+    block_time = time.time() - start
+    print(
+        f"Adding {num_items} items to a mempool of {num_items // 2}: {dict_time:.2f}s "
+        f"with the previous index, {index_time:.2f}s with the new index and the coin indexes "
+        f"({index_time / num_items * 1e6:.1f}us per item). Selecting {len(block_items)} items "
+        f"for a block: {block_time * 1000:.1f}ms"
+    )
+
+
+def measure_packages(num_items: int, chain_length: int):
+    """
+    Adds synthetic items in chains of chain_length, where each item spends the addition of the
+    previous one, to a mempool of num_items. Then adds a tenth more items with a higher fee rate,
+    which evict packages, removes the first item of a tenth of the chains with its descendants,
+    and builds a block. A chain_length of 1 measures the same with independent items.
+    """
+    genesis = BlockTools().create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    max_block_cost = consensus_constants["MAX_BLOCK_COST_CLVM"]
+    base_cost = max_block_cost // (num_items // 10)
+    chains: List[List[MempoolItem]] = []
+    for i in range(num_items // chain_length):
+        chain = [make_item((i % 10) * base_cost, base_cost)]
+        for j in range(1, chain_length):
+            fee = ((i + j) % 10) * base_cost
+            chain.append(make_item(fee, base_cost, chain[-1].additions[0]))
+        chains.append(chain)
+    # Added one level of the chains after the other, like chained payouts which arrive together
+    items = [chain[j] for j in range(chain_length) for chain in chains]
+    items += [make_item(20 * base_cost, base_cost) for _ in range(num_items // 10)]
+
+    removals = []
+    for item in items:
+        assert item.name is not None and item.additions[0].name() is not None
+        removals.append(
+            {
+                name: Coin(name, bytes32([0] * 32), uint64(1))
+                for name in item.removal_names
+            }
+        )
+
+    pool = Mempool.create(genesis.header, uint32(num_items))
+    start = time.time()
+    for item, removals_dic in zip(items[:num_items], removals):
+        pool.add_to_pool(item, item.additions, removals_dic)
+    add_time = time.time() - start
+    assert len(pool.spends) == num_items
+
+    start = time.time()
+    for item, removals_dic in zip(items[num_items:], removals[num_items:]):
+        pool.add_to_pool(item, item.additions, removals_dic)
+    evict_time = time.time() - start
+    num_evicted = num_items + num_items // 10 - len(pool.spends)
+
+    start = time.time()
+    num_removed = 0
+    for chain in chains[: len(chains) // 10]:
+        if chain[0].name in pool.spends:
+            num_removed += len(pool.remove_spend(chain[0]))
+    remove_time = time.time() - start
+
+    start = time.time()
+    block_items = pool.get_items_for_block(max_block_cost)
+    block_time = time.time() - start
+    print(
+        f"{num_items} items in chains of {chain_length}: adding them {add_time:.2f}s "
+        f"({add_time / num_items * 1e6:.1f}us per item), evicting {num_evicted} items for "
+        f"{num_items // 10} new ones {evict_time:.2f}s, removing {num_removed} items of "
+        f"{len(chains) // 10} chains {remove_time:.2f}s, selecting {len(block_items)} items for "
+        f"a block {block_time * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Measures new_tips with a mempool of 10000 items (or the number of items passed as argument,
+    60000 is the default MEMPOOL_SIZE), when the items are validated again for each new tip,
+    and when only their coins and conditions are checked against the new tips. Then measures
+    adding 1000 bundles again to an emptied mempool, and the number of transactions per second
+    which are added when they are received from peers. Then measures the fee rate index of the
+    mempool with 100000 synthetic items, which have 10 fee rates, and all the same fee rate.
+    Then measures the updates of the dependency graph of a mempool of 50000 synthetic items, in
+    chains of 25, and independent.
+    """
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    asyncio.get_event_loop().run_until_complete(measure_new_tips(num))
+    asyncio.get_event_loop().run_until_complete(measure_readmission(1000))
+    asyncio.get_event_loop().run_until_complete(measure_admission(1000, 100))
+    for num_fee_rates in [10, 1]:
+        measure_index(100000, num_fee_rates)
+    for chain_length in [1, 25]:
+        measure_packages(50000, chain_length)
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from typing import List
+
+from src.protocols import full_node_protocol
+from src.server.connection import Connection
+from src.server.outbound_message import Message, NodeType
+from src.types.full_block import FullBlock
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+log = logging.getLogger(__name__)
+
+
+async def relay_blocks(blocks: List[FullBlock], binary_codec: bool, port: int) -> float:
+    """
+    Sends all blocks as RespondBlock messages from one connection to another, over a local
+    TCP socket, and returns the time until the receiver has the RespondBlock objects, like
+    the full node api (api_request) receives them.
+    """
+    done: asyncio.Future = asyncio.get_event_loop().create_future()
+
+    async def on_connect(reader, writer):
+        connection = Connection(NodeType.FULL_NODE, None, reader, writer, 0, None, log)
+        connection.binary_codec = binary_codec
+        for _ in range(len(blocks)):
+            message = await connection.read_one_message()
+            data = message.data
+            if isinstance(data, dict):
+                data = full_node_protocol.RespondBlock(**data)
+            assert data.block.height >= 0
+        done.set_result(None)
+
+    server = await asyncio.start_server(on_connect, "127.0.0.1", port)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    sender = Connection(NodeType.FULL_NODE, None, reader, writer, 0, None, log)
+    sender.binary_codec = binary_codec
+
+    # New objects, so that the cached serialization of the blocks is not reused
+    messages = [
+        Message(
+            "respond_block",
+            full_node_protocol.RespondBlock(FullBlock.from_bytes(bytes(block))),
+        )
+        for block in blocks
+    ]
+    start = time.time()
+    for message in messages:
+        await sender.send(message)
+    await done
+    total = time.time() - start
+
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return total
+
+
+async def main():
+    full_block, _, _ = make_benchmark_objects()
+    blocks = [full_block] * 1000
+    for _ in range(2):
+        cbor_time = await relay_blocks(blocks, False, 21250)
+        binary_time = await relay_blocks(blocks, True, 21251)
+        print(f"CBOR: {len(blocks) / cbor_time:.0f} blocks per second")
+        print(f"Binary: {len(blocks) / binary_time:.0f} blocks per second")
+        print(f"Speedup: {cbor_time / binary_time:.2f}x")
+
+
+if __name__ == "__main__":
+    """
+    Measures block relay throughput between two local connections, with CBOR and with the
+    binary message codec.
+    """
+    asyncio.run(main())
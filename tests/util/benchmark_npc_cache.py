@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from src.types.full_block import FullBlock
+from src.util.mempool_check_conditions import get_name_puzzle_conditions
+from src.util.npc_cache import npc_cache
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+
+async def benchmark(block: FullBlock, iterations: int) -> None:
+    blob = bytes(block)
+    start = time.time()
+    for _ in range(iterations):
+        generator = FullBlock.from_bytes_lazy(blob).transactions_generator
+        assert generator is not None
+        get_name_puzzle_conditions(generator)
+    uncached_time = time.time() - start
+
+    npc_cache.clear()
+    start = time.time()
+    for _ in range(iterations):
+        # A new object each time, like blocks which are read from the BlockStore
+        await FullBlock.from_bytes_lazy(blob).tx_removals_and_additions()
+    cached_time = time.time() - start
+
+    print(
+        f"Without the NPC cache: {uncached_time * 1000 / iterations:.3f} ms per block"
+    )
+    print(
+        f"With the NPC cache: {cached_time * 1000 / iterations:.3f} ms per block, "
+        f"{uncached_time / cached_time:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Compares reading the removals and additions of a block from the database, by running its
+    generator every time, with the NPC cache, which runs it once.
+    """
+    full_block = make_benchmark_objects()[0]
+    asyncio.get_event_loop().run_until_complete(benchmark(full_block, 1000))
@@ -0,0 +1,132 @@
+import asyncio
+import gc
+import os
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import aiosqlite
+
+from src.full_node.coin_store import CoinStore, DiffStore
+from src.types.coin import Coin
+from src.types.coin_record import CoinRecord
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32, uint64
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+
+async def legacy_get_unspent(
+    coin_store: CoinStore, puzzle_hash: bytes32
+) -> List[CoinRecord]:
+    """
+    The previous query, which scans the table, since the puzzle hash index was not created.
+    """
+    cursor = await coin_store.coin_record_db.execute(
+        "SELECT * from coin_record WHERE puzzle_hash=?", (puzzle_hash,)
+    )
+    rows = await cursor.fetchall()
+    await cursor.close()
+    records = [coin_store.row_to_coin_record(row) for row in rows]
+    return [r for r in records if not r.spent]
+
+
+def make_records(
+    puzzle_hash: bytes32, num_records: int, height: int
+) -> Dict[bytes32, CoinRecord]:
+    records = {}
+    for i in range(num_records):
+        coin = Coin(bytes32(os.urandom(32)), puzzle_hash, uint64(i + 1))
+        spent = i % 2 == 0
+        records[coin.name()] = CoinRecord(
+            coin, uint32(height), uint32(height + 1 if spent else 0), spent, False
+        )
+    return records
+
+
+async def main(num_records: int, num_puzzle_hashes: int):
+    db_path = Path("benchmark_puzzle_hash_index.db")
+    if db_path.exists():
+        db_path.unlink()
+    connection = await aiosqlite.connect(db_path)
+    coin_store = await CoinStore.create(connection, uint32(0))
+    puzzle_hashes = [bytes32(os.urandom(32)) for _ in range(num_puzzle_hashes)]
+    per_puzzle_hash = num_records // num_puzzle_hashes
+    rows = []
+    for height, puzzle_hash in enumerate(puzzle_hashes):
+        for name, record in make_records(puzzle_hash, per_puzzle_hash, height).items():
+            rows.append(coin_store.coin_record_to_row(name, record))
+    # One address with many coins
+    hot = bytes32(os.urandom(32))
+    for name, record in make_records(hot, num_records // 10, 0).items():
+        rows.append(coin_store.coin_record_to_row(name, record))
+    await connection.executemany(
+        "INSERT INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    await connection.commit()
+    # Keeping the rows alive makes the garbage collection during the lookups slower
+    del rows
+    gc.collect()
+
+    cursor = await connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * from coin_record WHERE puzzle_hash in (?) "
+        "AND spent=0 AND confirmed_index>=? AND confirmed_index<?",
+        (hot, 0, 2 ** 32 - 1),
+    )
+    print(f"Query plan: {(await cursor.fetchall())[0][-1]}")
+    await cursor.close()
+
+    for name, puzzle_hash in [
+        ("Address with few coins", puzzle_hashes[0]),
+        ("Address with many coins", hot),
+    ]:
+        await connection.execute("DROP INDEX coin_puzzle_hash")
+        start = time.time()
+        legacy = await legacy_get_unspent(coin_store, puzzle_hash)
+        legacy_time = time.time() - start
+        coin_store = await CoinStore.create(connection, uint32(0))
+        start = time.time()
+        new, _ = await coin_store.get_coin_records_by_puzzle_hashes(
+            [puzzle_hash], include_spent_coins=False
+        )
+        new_time = time.time() - start
+        assert len(legacy) == len(new)
+        print(
+            f"{name} ({len(new)} unspent): {legacy_time * 1000:.1f}ms scan, "
+            f"{new_time * 1000:.1f}ms index, {legacy_time / new_time:.1f}x"
+        )
+
+    await connection.close()
+    db_path.unlink()
+
+    # A tip 30 blocks above the LCA, with 1000 coin records per block
+    header = make_benchmark_objects()[0].header
+    diff_store = None
+    for height in range(30):
+        records = make_records(puzzle_hashes[height % 10], 1000, height)
+        diff_store = await DiffStore.create(header, records, diff_store)
+    assert diff_store is not None
+    start = time.time()
+    for _ in range(100):
+        legacy_records = [
+            r
+            for r in diff_store.get_all().values()
+            if r.coin.puzzle_hash == puzzle_hashes[0]
+        ]
+    legacy_time = time.time() - start
+    start = time.time()
+    for _ in range(100):
+        new_records = diff_store.get_by_puzzle_hashes({puzzle_hashes[0]})
+    new_time = time.time() - start
+    assert len(legacy_records) == len(new_records)
+    print(
+        f"DiffStores of a tip: {legacy_time * 10:.2f}ms scan, "
+        f"{new_time * 10:.2f}ms index, {legacy_time / new_time:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Measures the lookup of the unspent coins of an address in a CoinStore with 500000 coin
+    records, and in the DiffStores of a tip.
+    """
+    asyncio.get_event_loop().run_until_complete(main(500000, 5000))
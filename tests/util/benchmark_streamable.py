@@ -0,0 +1,176 @@
+import io
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Tuple, Type, get_type_hints
+
+from src.types.full_block import FullBlock
+from src.types.header import Header
+from src.types.spend_bundle import SpendBundle
+from src.util.bundle_tools import best_solution_program
+from src.util.streamable import size_hints
+from src.util.type_checking import (
+    is_type_List,
+    is_type_SpecificOptional,
+    is_type_Tuple,
+)
+from tests.block_tools import BlockTools
+from tests.wallet_tools import WalletTool
+
+test_constants: Dict[str, Any] = {
+    "DIFFICULTY_STARTING": 1,
+    "DISCRIMINANT_SIZE_BITS": 16,
+    "BLOCK_TIME_TARGET": 10,
+    "MIN_BLOCK_TIME": 2,
+    "DIFFICULTY_EPOCH": 12,  # The number of blocks per epoch
+    "DIFFICULTY_DELAY": 3,  # EPOCH / WARP_FACTOR
+    "MIN_ITERS_STARTING": 50 * 2,
+}
+
+
+def make_benchmark_objects() -> Tuple[FullBlock, Header, SpendBundle]:
+    """
+    Creates a block which includes a transaction, so that the generator and the aggregated
+    signature are also serialized.
+    """
+    bt = BlockTools()
+    test_constants["GENESIS_BLOCK"] = bytes(
+        bt.create_genesis_block(test_constants, bytes([0] * 32), b"0")
+    )
+    wallet_a = WalletTool()
+    wallet_receiver = WalletTool()
+    coinbase_puzzlehash = wallet_a.get_new_puzzlehash()
+    blocks = bt.get_consecutive_blocks(
+        test_constants, 3, [], 10, b"", coinbase_puzzlehash
+    )
+    spend_bundle = wallet_a.generate_signed_transaction(
+        1000, wallet_receiver.get_new_puzzlehash(), blocks[1].header.data.coinbase
+    )
+    assert spend_bundle is not None
+    program = best_solution_program(spend_bundle)
+    dic_h = {4: (program, spend_bundle.aggregated_signature)}
+    blocks = bt.get_consecutive_blocks(
+        test_constants, 1, blocks, 10, b"", coinbase_puzzlehash, dic_h
+    )
+    return blocks[-1], blocks[-1].header, spend_bundle
+
+
+def legacy_parse_one_item(f_type: Type, f: BinaryIO) -> Any:
+    """
+    The dynamic parser which resolves the type of each field on every call.
+    Used as a reference for correctness and speed.
+    """
+    if is_type_List(f_type):
+        list_size = int.from_bytes(f.read(4), "big")
+        return [legacy_parse_one_item(f_type.__args__[0], f) for _ in range(list_size)]
+    if is_type_SpecificOptional(f_type):
+        if f.read(1) == bytes([1]):
+            return legacy_parse_one_item(f_type.__args__[0], f)
+        return None
+    if is_type_Tuple(f_type):
+        return tuple(legacy_parse_one_item(t, f) for t in f_type.__args__)
+    if f_type is bool:
+        return bool.from_bytes(f.read(4), "big")
+    if f_type == bytes:
+        return f.read(int.from_bytes(f.read(4), "big"))
+    if hasattr(f_type, "_streamable_fields"):
+        return legacy_parse(f_type, f)
+    if hasattr(f_type, "parse"):
+        return f_type.parse(f)
+    if hasattr(f_type, "from_bytes") and size_hints[f_type.__name__]:
+        return f_type.from_bytes(f.read(size_hints[f_type.__name__]))
+    return bytes.decode(f.read(int.from_bytes(f.read(4), "big")), "utf-8")
+
+
+def legacy_parse(cls: Any, f: BinaryIO) -> Any:
+    values = []
+    for _, f_type in get_type_hints(cls).items():
+        values.append(legacy_parse_one_item(f_type, f))
+    return cls(*values)
+
+
+def legacy_stream_one_item(f_type: Type, item: Any, f: BinaryIO) -> None:
+    if is_type_List(f_type):
+        f.write(len(item).to_bytes(4, "big"))
+        for element in item:
+            legacy_stream_one_item(f_type.__args__[0], element, f)
+    elif is_type_SpecificOptional(f_type):
+        if item is None:
+            f.write(bytes([0]))
+        else:
+            f.write(bytes([1]))
+            legacy_stream_one_item(f_type.__args__[0], item, f)
+    elif is_type_Tuple(f_type):
+        for inner_type, element in zip(f_type.__args__, item):
+            legacy_stream_one_item(inner_type, element, f)
+    elif f_type == bytes:
+        f.write(len(item).to_bytes(4, "big"))
+        f.write(item)
+    elif hasattr(f_type, "_streamable_fields"):
+        legacy_stream(item, f)
+    elif hasattr(f_type, "stream"):
+        item.stream(f)
+    elif hasattr(f_type, "__bytes__"):
+        f.write(bytes(item))
+    elif f_type is str:
+        f.write(len(item).to_bytes(4, "big"))
+        f.write(item.encode("utf-8"))
+    else:
+        f.write(int(item).to_bytes(4, "big"))
+
+
+def legacy_stream(obj: Any, f: BinaryIO) -> None:
+    for f_name, f_type in get_type_hints(obj).items():
+        legacy_stream_one_item(f_type, getattr(obj, f_name), f)
+
+
+def legacy_to_bytes(obj: Any) -> bytes:
+    f = io.BytesIO()
+    legacy_stream(obj, f)
+    return f.getvalue()
+
+
+def run_timed(label: str, iterations: int, function: Callable[[], Any]) -> float:
+    start = time.time()
+    for _ in range(iterations):
+        function()
+    total = time.time() - start
+    print(f"{label}: {iterations / total:.0f} per second")
+    return total
+
+
+def benchmark(obj: Any, iterations: int) -> None:
+    cls = type(obj)
+    blob = bytes(obj)
+    assert blob == legacy_to_bytes(obj)
+    assert cls.from_bytes(blob) == legacy_parse(cls, io.BytesIO(blob)) == obj
+
+    old_parse = run_timed(
+        f"{cls.__name__} legacy parse",
+        iterations,
+        lambda: legacy_parse(cls, io.BytesIO(blob)),
+    )
+    new_parse = run_timed(
+        f"{cls.__name__} parse", iterations, lambda: cls.from_bytes(blob)
+    )
+    bytes_io_parse = run_timed(
+        f"{cls.__name__} BytesIO parse", iterations, lambda: cls.parse(io.BytesIO(blob))
+    )
+    old_stream = run_timed(
+        f"{cls.__name__} legacy stream", iterations, lambda: legacy_to_bytes(obj)
+    )
+    new_stream = run_timed(f"{cls.__name__} stream", iterations, lambda: bytes(obj))
+    print(
+        f"{cls.__name__} speedup: parse {old_parse / new_parse:.2f}x, "
+        f"memoryview over BytesIO {bytes_io_parse / new_parse:.2f}x, "
+        f"stream {old_stream / new_stream:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    """
+    Compares the precompiled Streamable field plans with the dynamic per-call type dispatch.
+    Serialized bytes must be identical.
+    """
+    full_block, header, spend_bundle = make_benchmark_objects()
+    objects: List[Any] = [full_block, header, spend_bundle]
+    for obj in objects:
+        benchmark(obj, 2000)
@@ -0,0 +1,87 @@
+import time
+from typing import Any, Callable, List
+
+from src.types.challenge import Challenge
+from src.types.coin_record import CoinRecord
+from src.types.header_block import HeaderBlock
+from src.types.sized_bytes import bytes32
+from src.util.ints import uint32, uint64
+from tests.util.benchmark_streamable import make_benchmark_objects
+
+
+def run_timed(label: str, iterations: int, function: Callable[[], Any]) -> float:
+    start = time.time()
+    for _ in range(iterations):
+        function()
+    total = time.time() - start
+    print(f"{label}: {iterations / total:.0f} per second")
+    return total
+
+
+def benchmark(obj: Any, iterations: int) -> None:
+    cls = type(obj)
+    values: List[Any] = [
+        getattr(obj, f_name) for f_name, _, _ in cls._streamable_fields
+    ]
+    assert cls(*values) == cls.construct_trusted(*values) == obj
+
+    strict = run_timed(f"{cls.__name__} strict", iterations, lambda: cls(*values))
+    trusted = run_timed(
+        f"{cls.__name__} trusted", iterations, lambda: cls.construct_trusted(*values),
+    )
+    strict_parse = run_timed(
+        f"{cls.__name__} parse with strict construction",
+        iterations,
+        lambda: strict_from_bytes(cls, bytes(obj)),
+    )
+    trusted_parse = run_timed(
+        f"{cls.__name__} parse", iterations, lambda: cls.from_bytes(bytes(obj))
+    )
+    print(
+        f"{cls.__name__} speedup: construction {strict / trusted:.2f}x, "
+        f"parse {strict_parse / trusted_parse:.2f}x"
+    )
+
+
+def strict_from_bytes(cls: Any, blob: bytes) -> Any:
+    """
+    Parses every nested streamable and then rebuilds it with the type checking constructor,
+    which is what parse did before the trusted construction path.
+    """
+    obj = cls.from_bytes(blob)
+
+    def rebuild(item: Any) -> Any:
+        if hasattr(type(item), "_streamable_fields"):
+            return type(item)(
+                *[rebuild(getattr(item, f)) for f, _, _ in item._streamable_fields]
+            )
+        if isinstance(item, list):
+            return [rebuild(i) for i in item]
+        if isinstance(item, tuple):
+            return tuple(rebuild(i) for i in item)
+        return item
+
+    return rebuild(obj)
+
+
+if __name__ == "__main__":
+    """
+    Compares type checked (strict) construction with construct_trusted, which is used by parse
+    and internal code such as the CoinStore. from_json_dict parses untrusted JSON, so it keeps
+    the type checks.
+    """
+    full_block = make_benchmark_objects()[0]
+    coin_record = CoinRecord(
+        full_block.header.data.coinbase, full_block.height, uint32(0), False, True
+    )
+    challenge = Challenge(bytes32([1] * 32), bytes32([2] * 32), uint64(100))
+    assert full_block.proof_of_time is not None
+    header_block = HeaderBlock(
+        full_block.proof_of_space,
+        full_block.proof_of_time,
+        challenge,
+        full_block.header,
+    )
+    benchmark(full_block, 1000)
+    benchmark(coin_record, 20000)
+    benchmark(header_block, 1000)
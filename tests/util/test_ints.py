@@ -0,0 +1,51 @@
+import io
+import unittest
+
+from src.util.ints import int8, uint8, int16, uint16, int32, uint32, int64, uint64
+from src.util.ints import uint128, int512
+
+
+class TestInts(unittest.TestCase):
+    def test_round_trip(self):
+        for int_type in [int8, int16, int32, int64, uint8, uint16, uint32, uint64]:
+            signed = int_type.PACK.islower()
+            for value in [0, 1, int_type.LIMIT // (2 if signed else 1) - 1]:
+                a = int_type(value)
+                blob = bytes(a)
+                assert len(blob) == int_type.SIZE
+                assert blob == value.to_bytes(int_type.SIZE, "big", signed=signed)
+                for b in [
+                    int_type.from_bytes(blob),
+                    int_type.from_bytes(memoryview(blob)),
+                    int_type.parse(io.BytesIO(blob)),
+                ]:
+                    assert b == a
+                    assert type(b) is int_type
+            if signed:
+                assert int_type.from_bytes(bytes(int_type(-1))) == -1
+
+        for value in [0, 2 ** 128 - 1]:
+            assert uint128.parse(io.BytesIO(bytes(uint128(value)))) == value
+        for value in [-(2 ** 512), 2 ** 512 - 1]:
+            assert int512.parse(io.BytesIO(bytes(int512(value)))) == value
+
+    def test_bounds(self):
+        assert uint8(255) == 255
+        assert uint64(2 ** 64 - 1) == 2 ** 64 - 1
+        for int_type, value in [(uint8, 256), (uint32, 2 ** 32), (int64, -(2 ** 64))]:
+            try:
+                int_type(value)
+                assert False
+            except ValueError:
+                pass
+
+    def test_short_input(self):
+        try:
+            uint32.parse(io.BytesIO(bytes([0, 0, 1])))
+            assert False
+        except Exception:
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+from typing import Any, Dict
+
+import pytest
+
+from src.protocols import full_node_protocol, wallet_protocol
+from src.protocols.shared_protocol import Ping
+from src.server.connection import Connection, LENGTH_BYTES
+from src.server.message_codec import (
+    BINARY_CODEC,
+    decode_binary,
+    encode_binary,
+    is_binary,
+)
+from src.server.outbound_message import Message, NodeType
+from src.types.sized_bytes import bytes32
+from src.util import cbor
+from src.util.errors import Err, ProtocolError
+from src.util.ints import uint32
+from tests.block_tools import BlockTools
+
+test_constants: Dict[str, Any] = {
+    "DIFFICULTY_STARTING": 1,
+    "DISCRIMINANT_SIZE_BITS": 16,
+    "BLOCK_TIME_TARGET": 10,
+    "MIN_BLOCK_TIME": 2,
+    "DIFFICULTY_EPOCH": 12,  # The number of blocks per epoch
+    "DIFFICULTY_DELAY": 3,  # EPOCH / WARP_FACTOR
+}
+
+
+@pytest.fixture(scope="module")
+def event_loop():
+    loop = asyncio.get_event_loop()
+    yield loop
+
+
+class TestMessageCodec:
+    def test_round_trip(self):
+        bt = BlockTools()
+        block = bt.create_genesis_block(test_constants, bytes([0] * 32), b"0")
+        messages = [
+            Message("respond_block", full_node_protocol.RespondBlock(block)),
+            Message(
+                "respond_all_header_hashes_after",
+                wallet_protocol.RespondAllHeaderHashesAfter(
+                    uint32(5), bytes32([1] * 32), [bytes32([2] * 32), block.header_hash]
+                ),
+            ),
+            Message(
+                "new_tip",
+                full_node_protocol.NewTip(
+                    block.height, block.weight, block.header_hash
+                ),
+            ),
+        ]
+        for message in messages:
+            encoded = encode_binary(message)
+            assert encoded is not None and is_binary(encoded)
+            decoded = decode_binary(encoded)
+            assert decoded.function == message.function
+            assert decoded.data == message.data
+            assert isinstance(decoded.data, type(message.data))
+            # CBOR messages are maps, so they are never mistaken for binary ones
+            assert not is_binary(cbor.dumps({"f": message.function, "d": message.data}))
+
+            for invalid in [encoded[:-1], encoded + b"\0", encoded[:1]]:
+                with pytest.raises(ProtocolError):
+                    decode_binary(invalid)
+
+    def test_cbor_fallback(self):
+        # Not in the list of binary messages
+        assert encode_binary(Message("ping", Ping(bytes32([1] * 32)))) is None
+        # Data is not the registered message class
+        assert encode_binary(Message("respond_block", {"block": b""})) is None
+        with pytest.raises(ProtocolError):
+            decode_binary(bytes([0, 255]))
+
+    @pytest.mark.asyncio
+    async def test_connection(self):
+        bt = BlockTools()
+        block = bt.create_genesis_block(test_constants, bytes([0] * 32), b"0")
+        message = Message("respond_block", full_node_protocol.RespondBlock(block))
+        received: asyncio.Queue = asyncio.Queue()
+
+        async def on_connect(reader, writer):
+            connection = Connection(
+                NodeType.FULL_NODE, None, reader, writer, 0, None, None
+            )
+            try:
+                while True:
+                    message = await connection.read_one_message()
+                    if message.function == "handshake":
+                        # Like at the end of the handshake
+                        connection.binary_codec = BINARY_CODEC in connection.peer_codecs
+                    await received.put(message)
+            except ProtocolError as e:
+                await received.put(e)
+            except asyncio.IncompleteReadError:
+                pass
+
+        server = await asyncio.start_server(on_connect, "127.0.0.1", 21240)
+
+        # A binary message before the codec is negotiated in the handshake is rejected
+        reader, writer = await asyncio.open_connection("127.0.0.1", 21240)
+        connection = Connection(NodeType.FULL_NODE, None, reader, writer, 0, None, None)
+        connection.binary_codec = True
+        await connection.send(message)
+        assert isinstance(await received.get(), ProtocolError)
+        writer.close()
+
+        # A handshake whose codecs are not a list of strings is rejected
+        for codecs in [5, [1], "c"]:
+            reader, writer = await asyncio.open_connection("127.0.0.1", 21240)
+            encoded = cbor.dumps({"f": "handshake", "d": {}, "c": codecs})
+            writer.write(len(encoded).to_bytes(LENGTH_BYTES, "big") + encoded)
+            error = await received.get()
+            assert isinstance(error, ProtocolError)
+            assert error.code == Err.INVALID_HANDSHAKE
+            writer.close()
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", 21240)
+        connection = Connection(NodeType.FULL_NODE, None, reader, writer, 0, None, None)
+
+        # CBOR, which also advertises the supported codecs
+        await connection.send(Message("handshake", {"node_id": bytes32([1] * 32)}))
+        handshake = await received.get()
+        assert handshake.function == "handshake"
+
+        await connection.send(message)
+        written = connection.bytes_written
+        connection.binary_codec = True
+        await connection.send(message)
+        assert connection.bytes_written - written < written
+
+        cbor_message = await received.get()
+        binary_message = await received.get()
+        assert type(cbor_message.data) is dict
+        assert binary_message.data == message.data
+
+        writer.close()
+        server.close()
+        await server.wait_closed()
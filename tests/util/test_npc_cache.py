@@ -0,0 +1,73 @@
+import unittest
+
+from src.types.coin import Coin
+from src.types.condition_opcodes import ConditionOpcode
+from src.types.condition_var_pair import ConditionVarPair
+from src.types.program import Program
+from src.types.sized_bytes import bytes32
+from src.util.bundle_tools import best_solution_program
+from src.util.cost_calculator import calculate_cost_of_program
+from src.util.errors import Err
+from src.util.ints import uint64
+from src.util.mempool_check_conditions import get_name_puzzle_conditions
+from src.util.npc_cache import (
+    NPCCache,
+    get_name_puzzle_conditions_cached,
+    npc_cache,
+    npc_list_from_bytes,
+    npc_list_to_bytes,
+)
+from tests.wallet_tools import WalletTool
+
+
+class TestNPCCache(unittest.TestCase):
+    def test_lru(self):
+        cache = NPCCache(2)
+        keys = [bytes32([i] * 32) for i in range(3)]
+        cache.put(keys[0], (None, [], uint64(0)))
+        cache.put(keys[1], (None, [], uint64(1)))
+        # Using the first entry makes the second one the least recently used
+        assert cache.get(keys[0]) == (None, [], uint64(0))
+        cache.put(keys[2], (None, [], uint64(2)))
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+        assert cache.hits == 3 and cache.misses == 1
+
+    def test_invalid_generator(self):
+        # The generator returns a coin name which is not 32 bytes long
+        program = Program.to([1, [[b"ab", [1, 2]]]])
+        npc_cache.clear()
+        error, npc_list, cost = calculate_cost_of_program(program, cache=True)
+        assert error == Err.INVALID_COIN_SOLUTION
+        assert npc_list == [] and cost == 0
+        assert npc_cache.get(program.get_tree_hash()) is None
+        npc_cache.clear()
+
+    def test_serialization(self):
+        wallet_a = WalletTool()
+        wallet_b = WalletTool()
+        coin = Coin(bytes32([1] * 32), wallet_a.get_new_puzzlehash(), uint64(5000))
+        # Conditions with one and with two variables
+        condition_dic = {
+            ConditionOpcode.ASSERT_MY_COIN_ID: [
+                ConditionVarPair(ConditionOpcode.ASSERT_MY_COIN_ID, coin.name(), None)
+            ]
+        }
+        spend_bundle = wallet_a.generate_signed_transaction(
+            1000, wallet_b.get_new_puzzlehash(), coin, condition_dic, 10
+        )
+        assert spend_bundle is not None
+        program = best_solution_program(spend_bundle)
+        error, npc_list, cost = get_name_puzzle_conditions(program)
+        assert error is None and len(npc_list) > 0
+        assert npc_list_from_bytes(npc_list_to_bytes(npc_list)) == npc_list
+
+        # Entries which are added serialized are deserialized on first use
+        npc_cache.clear()
+        npc_cache.put_serialized(
+            program.get_tree_hash(), npc_list_to_bytes(npc_list), cost
+        )
+        misses = npc_cache.misses
+        assert get_name_puzzle_conditions_cached(program) == (None, npc_list, cost)
+        assert npc_cache.misses == misses
+        npc_cache.clear()
@@ -0,0 +1,56 @@
+import unittest
+
+from src.types.program import Program, sexp_length_from_view, sha256_treehash
+from src.util.hash import std_hash
+from src.wallet.puzzles.p2_delegated_puzzle import puzzle_for_pk
+from tests.wallet_tools import WalletTool
+
+
+def recursive_tree_hash(sexp) -> bytes:
+    if sexp.listp():
+        left = recursive_tree_hash(sexp.first())
+        right = recursive_tree_hash(sexp.rest())
+        return std_hash(b"\2" + left + right)
+    return std_hash(b"\1" + sexp.as_atom())
+
+
+class TestProgram(unittest.TestCase):
+    def test_tree_hash(self):
+        for value in [[], b"", 1, 300, [1, [2, 3], [b"chia" * 20, []]], (1, (2, 3))]:
+            program = Program.to(value)
+            assert sha256_treehash(program) == recursive_tree_hash(program)
+            # The second time, the cached hashes of the cons boxes are used
+            assert sha256_treehash(program) == recursive_tree_hash(program)
+
+    def test_deep_tree_hash(self):
+        program = Program.to(b"end")
+        for i in range(50000):
+            program = Program((Program.to(i % 3), program))
+        h = program.get_tree_hash()
+        assert Program((Program.to(1), program)).get_tree_hash() == std_hash(
+            b"\2" + Program.to(1).get_tree_hash() + h
+        )
+
+    def test_sexp_length_from_view(self):
+        for value in [[], b"", 1, 300, [1, [2, 3], [b"chia" * 20, []]], b"x" * 5000]:
+            blob = bytes(Program(Program.to(value)))
+            view = memoryview(b"prefix" + blob + b"suffix")
+            assert sexp_length_from_view(view, 6) == 6 + len(blob)
+        with self.assertRaises(ValueError):
+            sexp_length_from_view(
+                memoryview(bytes(Program(Program.to([1, 2])))[:-1]), 0
+            )
+
+    def test_puzzle_for_pk_template(self):
+        wallet = WalletTool()
+        for _ in range(3):
+            pk = bytes(wallet.get_next_public_key())
+            puzzle = puzzle_for_pk(pk)
+            assert pk in bytes(puzzle)
+            assert puzzle.get_tree_hash() == recursive_tree_hash(
+                Program.from_bytes(bytes(puzzle))
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,20 @@
+import dataclasses
+import json
 import unittest
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
-from src.util.ints import uint32
+from src.util.ints import uint32, uint64
 from src.types.coin import Coin
 from src.types.sized_bytes import bytes32
 from src.types.full_block import FullBlock
-from src.util.streamable import Streamable, streamable
+from src.types.program import Program
+from src.util.streamable import Streamable, streamable, cache_stats, reset_cache_stats
 from tests.block_tools import BlockTools
 from src.protocols.wallet_protocol import RespondRemovals
 from src.util import cbor
+from src.util.json_util import dict_to_json_chunks, dict_to_json_str
+from src.wallet.util.wallet_types import WalletType
 
 
 class TestStreamable(unittest.TestCase):
@@ -52,6 +57,129 @@ class TestStreamable(unittest.TestCase):
         except NotImplementedError:
             pass
 
+    def test_tuple_str_bool(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass4(Streamable):
+            a: Tuple[uint32, str]
+            b: List[Tuple[bool, Optional[bytes32]]]
+            c: bytes
+
+        a = TestClass4(
+            (uint32(5), "chia"),
+            [(True, None), (False, bytes32([3] * 32))],
+            b"\x00\x01",
+        )
+        assert a == TestClass4.from_bytes(bytes(a))
+
+    def test_parse_from_buffer(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass5(Streamable):
+            a: bytes32
+            b: bytes
+            c: List[str]
+            d: Coin
+
+        a = TestClass5(
+            bytes32([1] * 32),
+            b"chia",
+            ["a", "b"],
+            Coin(bytes32([2] * 32), bytes32([3] * 32), uint64(4)),
+        )
+        for blob in [bytes(a), bytearray(bytes(a)), memoryview(bytes(a))]:
+            b = TestClass5.from_bytes(blob)
+            assert b == a
+            # Parsed values must not keep references to the source buffer
+            assert type(b.b) is bytes
+            assert type(b.a) is bytes32
+        assert Coin.from_bytes(memoryview(bytes(a.d))) == a.d
+
+    def test_cached_bytes_and_hash(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass6(Streamable):
+            a: uint32
+            b: List[bytes32]
+
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass7(Streamable):
+            a: TestClass6
+            b: Optional[TestClass6]
+
+        inner = TestClass6(uint32(1), [bytes32([1] * 32)])
+        outer = TestClass7(inner, None)
+        reset_cache_stats()
+
+        blob = bytes(inner)
+        h = inner.get_hash()
+        assert cache_stats["bytes_misses"] == 1 and cache_stats["hash_misses"] == 1
+        assert cache_stats["bytes_hits"] == 1
+
+        assert bytes(inner) is blob
+        assert inner.get_hash() is h
+        assert cache_stats["bytes_hits"] == 2 and cache_stats["hash_hits"] == 1
+
+        # The cache is not part of the fields, so it does not affect equality or json
+        copy = TestClass6.from_bytes(blob)
+        assert copy == inner
+        assert copy.to_json_dict() == inner.to_json_dict()
+        assert "_cached_bytes" not in inner.to_json_dict()
+
+        # Parents reuse the cached serialization of their children
+        assert bytes(outer) == bytes(inner) + bytes([0])
+        assert TestClass7.from_bytes(bytes(outer)) == outer
+
+    def test_from_bytes_lazy(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass9(Streamable):
+            a: uint32
+            b: List[str]
+
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass8(Streamable):
+            a: List[Tuple[uint32, str]]
+            b: Optional[Coin]
+            c: bool
+            d: List[List[bytes]]
+            e: Optional[Program]
+            f: uint64
+            g: TestClass9
+
+        a = TestClass8(
+            [(uint32(1), "one"), (uint32(2), "two")],
+            Coin(bytes32([2] * 32), bytes32([3] * 32), uint64(4)),
+            True,
+            [[b"chia", b""], []],
+            Program.to([1, [2, b"three" * 100]]),
+            uint64(5),
+            TestClass9(uint32(6), ["seven"]),
+        )
+        blob = bytes(a)
+        # Fields can be accessed in any order, and are only decoded once
+        lazy = TestClass8.from_bytes_lazy(blob)
+        assert lazy.f == a.f
+        assert "f" in lazy.__dict__ and "a" not in lazy.__dict__
+        assert lazy.f is lazy.f
+        for f_name in ["c", "a", "e", "b", "d", "g"]:
+            assert getattr(lazy, f_name) == getattr(a, f_name)
+        assert bytes(lazy) == blob
+
+        # Nested Streamables are lazy as well
+        lazy = TestClass8.from_bytes_lazy(blob)
+        assert lazy.g.b == ["seven"]
+        assert "a" not in lazy.g.__dict__
+        assert bytes(lazy.g) == bytes(a.g)
+
+        lazy = TestClass8.from_bytes_lazy(blob)
+        assert bytes(lazy) == blob
+        assert lazy == a and lazy.to_json_dict() == a.to_json_dict()
+        with self.assertRaises(AttributeError):
+            lazy.h
+
     def test_json(self):
         bt = BlockTools()
 
@@ -68,6 +196,76 @@ class TestStreamable(unittest.TestCase):
         dict_block = block.to_json_dict()
         assert FullBlock.from_json_dict(dict_block) == block
 
+    def test_json_untrusted(self):
+        coin = Coin(bytes32([1] * 32), bytes32([2] * 32), uint64(3))
+        assert Coin.from_json_dict(coin.to_json_dict()) == coin
+
+        # JSON comes from RPC clients and wallets, so it is type checked
+        with self.assertRaises(KeyError):
+            Coin.from_json_dict({**coin.to_json_dict(), "bogus": 1})
+        with self.assertRaises(TypeError):
+            Coin.from_json_dict({"parent_coin_info": "01" * 32, "amount": 3})
+        with self.assertRaises(ValueError):
+            Coin.from_json_dict({**coin.to_json_dict(), "amount": 1 << 64})
+
+    def test_json_single_pass(self):
+        @dataclass(frozen=True)
+        @streamable
+        class TestClass8(Streamable):
+            a: uint64
+            b: List[uint64]
+            c: List[Tuple[bytes32, Optional[Coin]]]
+            d: Optional[Coin]
+            e: List[Optional[List[Coin]]]
+            f: WalletType
+            g: bytes
+            h: str
+
+        coin = Coin(bytes32([1] * 32), bytes32([2] * 32), uint64(2 ** 64 - 1))
+        a = TestClass8(
+            uint64(5),
+            [uint64(6)],
+            [(bytes32([3] * 32), coin), (bytes32([4] * 32), None)],
+            coin,
+            [[coin], None, []],
+            WalletType.STANDARD_WALLET,
+            b"\x01",
+            "chia",
+        )
+        legacy = a.recurse_jsonify(dataclasses.asdict(a))
+        assert a.to_json_dict() == legacy
+        assert dict_to_json_str(a.to_json_dict()) == dict_to_json_str(legacy)
+
+        response = {"success": True, "objects": [a] * 250, "empty": []}
+        streamed = "".join(dict_to_json_chunks(response))
+        assert streamed == dict_to_json_str(response)
+        assert json.loads(streamed)["objects"][249] == json.loads(
+            dict_to_json_str(legacy)
+        )
+
+    def test_json_chunks(self):
+        coin = Coin(bytes32([1] * 32), bytes32([2] * 32), uint64(1))
+        many = [{"coin": coin, "data": b"\x01", "nested": {1: [], 2: {}}}] * 250
+        responses = [
+            {"items": many, "empty": [], "none": {}, "bytes": [b"\x02"] * 101},
+            {1: many, 2: "int keys"},
+            {"items": many, "more": [{}, [], ()] * 100},
+        ]
+        for response in responses:
+            chunks = list(dict_to_json_chunks(response))
+            assert "".join(chunks) == dict_to_json_str(response)
+        # Only the responses with string keys are streamed
+        assert len(list(dict_to_json_chunks(responses[0]))) > 1
+        assert len(list(dict_to_json_chunks(responses[1]))) == 1
+        assert json.loads("".join(dict_to_json_chunks(responses[1])))["1"][0][
+            "nested"
+        ] == {"1": [], "2": {}}
+
+        # Encoding fails before the first chunk, so no partial response is sent
+        chunks = dict_to_json_chunks({"items": [coin] * 200 + [object()]})
+        with self.assertRaises(TypeError):
+            next(chunks)
+
     def test_recursive_json(self):
         @dataclass(frozen=True)
         @streamable
@@ -102,6 +102,30 @@ class TestStrictClass(unittest.TestCase):
 
         A()
 
+    def test_StrictDataClassConstructTrusted(self):
+        @dataclass(frozen=True)
+        @strictdataclass
+        class TestClass:
+            a: uint8
+            b: List[uint8]
+
+        trusted = TestClass.construct_trusted(uint8(1), [uint8(2)])
+        assert trusted == TestClass(1, [2])  # type: ignore
+        assert trusted.b == [uint8(2)]
+        try:
+            trusted.a = uint8(2)  # type: ignore
+            assert False
+        except AttributeError:
+            pass
+
+        # The normal constructor still checks and converts types
+        assert type(TestClass(1, [2]).a) is uint8  # type: ignore
+        try:
+            TestClass(1, 2)  # type: ignore
+            assert False
+        except ValueError:
+            pass
+
 
 if __name__ == "__main__":
     unittest.main()